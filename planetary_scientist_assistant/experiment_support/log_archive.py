@@ -0,0 +1,73 @@
+# planetary_scientist_assistant/experiment_support/log_archive.py
+import io
+import os
+import gzip
+import lzma
+
+# Compressed log archives.
+# An archive is a log file with an extra ".gz" (gzip) or ".xz" (xz/LZMA) suffix, e.g.
+# log_20240301.txt.gz for one day or log_202403.jsonl.xz for a monthly rollup. Appending to an
+# archive adds one more compressed member/stream; both formats read concatenated members back
+# as one continuous file, so a monthly rollup can grow a day at a time.
+# Archives are always read as streams: nothing is decompressed to disk or loaded whole.
+
+ARCHIVE_SUFFIXES = {"gzip": ".gz", "xz": ".xz"}
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def validate_method(method):
+    """Raises ValueError for an unknown archive method."""
+    if method not in ARCHIVE_SUFFIXES:
+        raise ValueError(f"Unknown archive method '{method}'. Use one of: {', '.join(ARCHIVE_SUFFIXES)}.")
+
+def archive_method(filename):
+    """Returns the archive method of a filename from its suffix, or None for a plain file."""
+    for method, suffix in ARCHIVE_SUFFIXES.items():
+        if filename.endswith(suffix):
+            return method
+    return None
+
+def strip_archive_suffix(filename):
+    method = archive_method(filename)
+    return filename[:-len(ARCHIVE_SUFFIXES[method])] if method else filename
+
+def _open_archive(path, mode, method):
+    return gzip.open(path, mode) if method == "gzip" else lzma.open(path, mode)
+
+def open_binary(path):
+    """Opens a plain or archived log for reading its (decompressed) bytes as a stream."""
+    method = archive_method(path)
+    return _open_archive(path, 'rb', method) if method else open(path, 'rb')
+
+def open_text(path):
+    """Opens a plain or archived log for reading its text line by line."""
+    return io.TextIOWrapper(open_binary(path), encoding='utf-8', errors='replace')
+
+def append_to_archive(archive_path, source_paths, method):
+    """
+    Compresses the source files, in order, onto the end of archive_path (creating it if needed).
+    The archive is written to a temporary copy and then renamed over the original, so an
+    interrupted run never leaves a truncated archive behind. A source whose last line lacks its
+    newline gets one, so lines of consecutive sources never run together.
+    """
+    validate_method(method)
+    tmp_path = f"{archive_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as tmp:
+        if os.path.exists(archive_path):
+            with open(archive_path, 'rb') as existing:
+                for chunk in iter(lambda: existing.read(COPY_CHUNK_SIZE), b""):
+                    tmp.write(chunk)
+    try:
+        with _open_archive(tmp_path, 'ab', method) as out:
+            for source_path in source_paths:
+                last = b"\n"
+                with open(source_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+                        out.write(chunk)
+                        last = chunk[-1:]
+                if last != b"\n":
+                    out.write(b"\n")
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
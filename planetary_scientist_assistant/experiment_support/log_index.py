@@ -0,0 +1,157 @@
+# planetary_scientist_assistant/experiment_support/log_index.py
+import os
+import json
+
+# Sidecar offset index for structured (JSON Lines) daily logs.
+# A log file log_YYYYMMDD.jsonl holds one record per line:
+#   {"timestamp": "YYYY-MM-DDTHH:MM:SS.mmm", "level": "INFO", "experiment_id": "MSL-42" or null, "text": "..."}
+# and log_YYYYMMDD.jsonl.idx describes it as a list of blocks: consecutive byte ranges of whole
+# lines, cut every BLOCK_MAX_BYTES and whenever the hour changes. Layout of the index:
+#   {"version": LOG_INDEX_VERSION,
+#    "size": bytes of the log covered by the index,
+#    "blocks": [{"start": offset, "end": offset, "first": timestamp, "last": timestamp, "records": n}, ...],
+#    "hours": {"HH": [block number, ...]},
+#    "levels": {level: [block number, ...]},
+#    "experiments": {experiment_id: [block number, ...]}}
+# A query intersects the block lists of its criteria and seeks straight to the surviving blocks.
+# The index is brought up to date incrementally by reading only the bytes appended since "size",
+# so it also catches up after writes from other processes or a crash between the two writes.
+# That also lets a writer save it lazily: it keeps the index in memory and saves it only when a
+# block is started, so the saves do not grow with the number of entries; a reader re-reads at
+# most the last block's worth of lines past the saved "size".
+
+INDEX_SUFFIX = ".idx"
+LOG_INDEX_VERSION = 1
+BLOCK_MAX_BYTES = 64 * 1024
+
+
+def get_index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+def new_index():
+    return {"version": LOG_INDEX_VERSION, "size": 0, "blocks": [], "hours": {}, "levels": {}, "experiments": {}}
+
+def load_index(log_path):
+    """Loads the index of a log. Returns None if it is missing, corrupted or from another version."""
+    try:
+        with open(get_index_path(log_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != LOG_INDEX_VERSION:
+        return None
+    return index
+
+def save_index(log_path, index):
+    index_path = get_index_path(log_path)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(index, separators=(",", ":"))) # dumps uses the C encoder; dump streams through the Python one
+    os.replace(tmp_path, index_path)
+
+def _post(postings, key, block_number):
+    numbers = postings.setdefault(key, [])
+    if not numbers or numbers[-1] != block_number:
+        numbers.append(block_number)
+
+def _add_record(index, record, start, end):
+    timestamp = record.get("timestamp", "")
+    hour = timestamp[11:13]
+    blocks = index["blocks"]
+    last = blocks[-1] if blocks else None
+    if last is None or last["end"] != start or last["last"][11:13] != hour or end - last["start"] > BLOCK_MAX_BYTES:
+        last = {"start": start, "end": end, "first": timestamp, "last": timestamp, "records": 0}
+        blocks.append(last)
+    last["end"], last["last"] = end, max(last["last"], timestamp)
+    last["first"] = min(last["first"], timestamp)
+    last["records"] += 1
+    block_number = len(blocks) - 1
+    _post(index["hours"], hour, block_number)
+    _post(index["levels"], record.get("level"), block_number)
+    if record.get("experiment_id"):
+        _post(index["experiments"], record["experiment_id"], block_number)
+
+def update_index(log_path, index=None, lazy=False):
+    """
+    Indexes the complete lines appended to a log since the index was last saved (all of it if
+    the index is missing or the file shrank), saves the index if it changed and returns it.
+    Lines that are not valid JSON records are skipped.
+
+    Args:
+        index (dict, optional): The index last returned for this log, instead of loading the saved one.
+        lazy (bool, optional): Save only if a new block was started (for writers calling this after
+            every append, with the index kept in memory).
+    """
+    if index is None:
+        index = load_index(log_path)
+    try:
+        size = os.path.getsize(log_path)
+    except FileNotFoundError:
+        return None
+    if index is None or index["size"] > size:
+        index = new_index()
+    if index["size"] == size:
+        return index
+    block_count = len(index["blocks"])
+    with open(log_path, 'rb') as f:
+        f.seek(index["size"])
+        offset = _index_lines(index, f, index["size"])
+    if offset != index["size"]:
+        index["size"] = offset
+        if not lazy or len(index["blocks"]) != block_count:
+            save_index(log_path, index)
+    return index
+
+def _index_lines(index, f, offset):
+    """Indexes the complete lines read from f, which starts at offset. Returns the offset after the last one."""
+    for line in f:
+        if not line.endswith(b"\n"): # A record still being written
+            break
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            _add_record(index, record, offset, offset + len(line))
+        offset += len(line)
+    return offset
+
+def build_index(stream):
+    """Indexes a whole log read from a binary stream (e.g. a decompressing one) and returns the index."""
+    index = new_index()
+    index["size"] = _index_lines(index, stream, 0)
+    return index
+
+def select_blocks(index, hours=None, levels=None, experiment_ids=None, start=None, end=None):
+    """
+    Returns the numbers of the blocks that may hold records matching every given criterion
+    (each one a collection of accepted values; None accepts anything), in file order.
+    start and end (timestamp strings, end exclusive) drop blocks entirely outside that range.
+    """
+    selected = None
+    for postings, wanted in ((index["hours"], hours), (index["levels"], levels), (index["experiments"], experiment_ids)):
+        if wanted is None:
+            continue
+        numbers = set()
+        for value in wanted:
+            numbers.update(postings.get(value, ()))
+        selected = numbers if selected is None else selected & numbers
+    blocks = index["blocks"]
+    return [number for number in sorted(range(len(blocks)) if selected is None else selected)
+            if (start is None or blocks[number]["last"] >= start) and (end is None or blocks[number]["first"] < end)]
+
+def read_block(f, block):
+    """
+    Reads the records of a block from an open (binary) log file. Returns a list of dicts.
+    Decompressing streams work too, as long as blocks are read in file order (forward seeks only).
+    """
+    f.seek(block["start"])
+    records = []
+    for line in f.read(block["end"] - block["start"]).splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
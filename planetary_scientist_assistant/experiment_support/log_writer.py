@@ -0,0 +1,137 @@
+# planetary_scientist_assistant/experiment_support/log_writer.py
+import time
+import queue
+import threading
+
+# Buffered background writer for high-rate logging.
+# Producers put records on a bounded queue and return immediately; one background thread takes
+# them off in batches and hands each batch to a write function, which appends it with a single
+# open() per file. A batch is written once it holds batch_size records or its oldest record has
+# waited flush_interval seconds, whichever comes first.
+# When the queue is full, put() blocks (backpressure) instead of letting memory grow without bound.
+# A batch whose write fails is dropped (its records were already accepted by put()); the error
+# and the number of dropped records are kept until the owner collects them with take_error().
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 0.5 # Seconds a queued record may wait before its batch is written
+DEFAULT_MAX_QUEUE = 10000
+
+_STOP = object() # Queue markers; a flush marker is a threading.Event set once preceding records are written
+
+
+class BufferedLogWriter:
+    """
+    Queues records for a background thread that writes them in batches.
+
+    Args:
+        write_batch (callable): Called from the background thread with a list of records; appends them.
+        batch_size (int): Records written together at most.
+        flush_interval (float): Maximum seconds a record waits before being written.
+        max_queue (int): Records that may be queued before put() blocks.
+    """
+
+    def __init__(self, write_batch, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        if batch_size < 1 or max_queue < 1 or flush_interval <= 0:
+            raise ValueError("batch_size and max_queue must be at least 1 and flush_interval positive.")
+        self._write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.written = 0 # Records written so far
+        self.dropped = 0 # Records lost to failed writes so far
+        self.last_error = None # Last exception raised by write_batch since take_error(), if any
+        self._unreported_drops = 0
+        self._error_lock = threading.Lock()
+        # A daemon thread, so a writer nobody closed cannot keep the interpreter alive; owners
+        # close() it at shutdown (logbook registers an atexit hook) to write what is still queued.
+        self._thread = threading.Thread(target=self._run, name="logbook-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, record, timeout=None):
+        """
+        Queues a record, waiting for room while the queue is full.
+
+        Args:
+            timeout (float, optional): Seconds to wait for room; None waits as long as needed.
+
+        Returns:
+            bool: True if queued, False if the writer is closed or the queue stayed full.
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put(record, timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Waits until every record queued before this call is written. Returns False on timeout."""
+        if self._closed:
+            return not self._thread.is_alive()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Writes the remaining records and stops the background thread. Further puts are refused."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def take_error(self):
+        """
+        Returns (last write error or None, records dropped since the previous call) and clears
+        them, so a failed batch is reported once rather than by every later flush.
+        """
+        with self._error_lock:
+            error, dropped = self.last_error, self._unreported_drops
+            self.last_error, self._unreported_drops = None, 0
+        return error, dropped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            self._write_batch(batch)
+            self.written += len(batch)
+        except Exception as e: # Keep the writer alive; the error is reported through take_error()
+            with self._error_lock:
+                self.last_error = e
+                self.dropped += len(batch)
+                self._unreported_drops += len(batch)
+        batch.clear()
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty: # The oldest record waited flush_interval
+                self._write(batch)
+                deadline = None
+                continue
+            if item is _STOP or isinstance(item, threading.Event):
+                self._write(batch)
+                deadline = None
+                if item is _STOP:
+                    return
+                item.set()
+                continue
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                deadline = None
@@ -1,10 +1,54 @@
 # planetary_scientist_assistant/experiment_support/logbook.py
 import os
-from datetime import datetime
+import re
+import sys
+import json
+import time
+import heapq
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+try:
+    from . import log_archive, log_index, log_writer
+except ImportError: # Running this file directly as a script
+    import log_archive
+    import log_index
+    import log_writer
+try:
+    from knowledge_base import file_lock # Shared advisory locks; the project root is on sys.path
+except ImportError: # Running this file directly as a script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from knowledge_base import file_lock
 
 # Define a directory for experiment logs, relative to project base
 LOG_FILES_SUBDIR = "experiment_logs"
 
+# Format of new entries: "text" (free-text lines in log_YYYYMMDD.txt) or "jsonl" (one JSON record
+# per line in log_YYYYMMDD.jsonl, with a sidecar offset index, see log_index).
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSONL = "jsonl"
+LOG_FORMAT = LOG_FORMAT_TEXT
+LOG_EXTENSIONS = {LOG_FORMAT_TEXT: ".txt", LOG_FORMAT_JSONL: ".jsonl"}
+
+DEFAULT_TAIL_LINES = 50
+TAIL_BLOCK_SIZE = 64 * 1024 # Bytes read at a time, backwards from the end of the file, by tail_log
+FOLLOW_POLL_INTERVAL = 0.1 # Seconds between checks for new entries in follow_log
+
+# Retention: daily logs older than LOG_RETENTION_DAYS days are compressed into gzip or xz archives
+# (log_YYYYMMDD.txt.gz, or with LOG_ARCHIVE_MONTHLY one rollup per month: log_YYYYMM.txt.gz),
+# automatically whenever a new day's log is started. None disables the automatic run;
+# compress_old_logs can always be called directly. Archives stay readable by every function here.
+LOG_RETENTION_DAYS = None
+LOG_ARCHIVE_METHOD = "gzip"
+LOG_ARCHIVE_MONTHLY = False
+
+# Buffered writers started by start_buffered_logging, keyed by absolute project base path.
+# While one is active, add_log_entry queues entries for it instead of opening the log file itself.
+_buffered_writers = {}
+_buffered_writers_lock = threading.Lock()
+
 def get_log_files_dir(project_base_path):
     """Returns the path to the log files directory."""
     return os.path.join(project_base_path, LOG_FILES_SUBDIR)
@@ -15,14 +59,180 @@ def _ensure_log_files_dir_exists(project_base_path):
     os.makedirs(log_dir, exist_ok=True)
     return log_dir
 
-def get_daily_log_filename():
-    """Generates a filename for the current day's log."""
-    return f"log_{datetime.now().strftime('%Y%m%d')}.txt"
+def get_daily_log_filename(moment=None, log_format=None):
+    """Generates a filename for the current day's log (or the day of moment) in LOG_FORMAT (or log_format)."""
+    return f"log_{(moment or datetime.now()).strftime('%Y%m%d')}{LOG_EXTENSIONS[log_format or LOG_FORMAT]}"
+
+def _is_log_filename(filename):
+    return filename.startswith("log_") and \
+           log_archive.strip_archive_suffix(filename).endswith(tuple(LOG_EXTENSIONS.values()))
+
+_LOG_DAYS_PATTERN = re.compile(r"^log_(\d{8}|\d{6})\.")
+
+def _log_file_days(filename):
+    """Returns the (first, last) days "YYYYMMDD" a log file covers (a whole month for a monthly rollup), or None."""
+    match = _LOG_DAYS_PATTERN.match(filename)
+    if not match or not _is_log_filename(filename):
+        return None
+    period = match.group(1)
+    return (period, period) if len(period) == 8 else (period + "01", period + "31")
+
+def _is_structured(filename):
+    return log_archive.strip_archive_suffix(filename).endswith(LOG_EXTENSIONS[LOG_FORMAT_JSONL])
+
+def _resolve_log_filename(log_filename_or_date, log_dir):
+    """
+    Maps a log filename or a "YYYYMMDD" / "YYYY-MM-DD" date to a log filename. A date maps to the
+    day's file in LOG_FORMAT, or to the day's file in the other format if only that one exists.
+    A day that was compressed maps to its archive or to the monthly rollup holding it.
 
-def add_log_entry(entry_text, project_base_path, experiment_id=None, level="INFO"):
+    Returns:
+        str or None: The filename, or None if the identifier is invalid.
+    """
+    if _is_log_filename(log_filename_or_date):
+        days = _log_file_days(log_filename_or_date)
+        if log_archive.archive_method(log_filename_or_date) or not days or days[0] != days[1] or \
+           os.path.exists(os.path.join(log_dir, log_filename_or_date)):
+            return log_filename_or_date
+        monthly = log_filename_or_date.replace(days[0], days[0][:6])
+        candidates = [name + suffix for name in (log_filename_or_date, monthly)
+                      for suffix in log_archive.ARCHIVE_SUFFIXES.values()]
+        return next((name for name in candidates if os.path.exists(os.path.join(log_dir, name))), log_filename_or_date)
+    try:
+        day = datetime.strptime(log_filename_or_date.replace("-", ""), "%Y%m%d") # Validate date format
+    except ValueError:
+        return None
+    plain = [get_daily_log_filename(day)] + [get_daily_log_filename(day, log_format) for log_format in LOG_EXTENSIONS
+                                             if log_format != LOG_FORMAT]
+    # Then the day's archive, then the month's rollup
+    monthly = [name.replace(day.strftime('%Y%m%d'), day.strftime('%Y%m')) for name in plain]
+    candidates = plain + [name + suffix for names in (plain, monthly) for name in names
+                          for suffix in log_archive.ARCHIVE_SUFFIXES.values()]
+    return next((name for name in candidates if os.path.exists(os.path.join(log_dir, name))), candidates[0])
+
+def _format_record(timestamp, level, experiment_id, entry_text):
+    return json.dumps({"timestamp": timestamp.isoformat(timespec='milliseconds'), "level": level.upper(),
+                       "experiment_id": experiment_id or None, "text": entry_text.strip()}, ensure_ascii=False) + "\n"
+
+# Free-text entry line, as written by _format_entry
+_TEXT_ENTRY_PATTERN = re.compile(r"^\[(\d{4}-\d\d-\d\d) (\d\d:\d\d:\d\d\.\d{3})\] \[([^\]]*)\](?: \[ExpID: (.*?)\])?: (.*)$")
+
+def _parse_entry(line):
+    """Parses a free-text entry line into a record dict like the JSONL ones. Returns None if it is not an entry."""
+    match = _TEXT_ENTRY_PATTERN.match(line.rstrip("\n"))
+    if not match:
+        return None
+    day, time_of_day, level, experiment_id, text = match.groups()
+    return {"timestamp": f"{day}T{time_of_day}", "level": level, "experiment_id": experiment_id, "text": text}
+
+def _format_entry(timestamp, level, experiment_id, entry_text):
+    formatted_entry = f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] [{level.upper()}]" # Millisecond precision
+    if experiment_id:
+        formatted_entry += f" [ExpID: {experiment_id}]"
+    return formatted_entry + f": {entry_text.strip()}\n" # Ensure newline
+
+_live_index = None # (log path, index) of the structured log this process writes, kept up to date in memory
+_live_index_lock = threading.Lock()
+
+def _update_live_index(log_filepath):
+    # Indexes just the lines appended since the last call and saves the sidecar only when a block
+    # starts (see log_index), so writing an entry costs the same however large the day's log is.
+    global _live_index
+    with _live_index_lock:
+        index = _live_index[1] if _live_index and _live_index[0] == log_filepath else None
+        index = log_index.update_index(log_filepath, index, lazy=True)
+        _live_index = (log_filepath, index) if index is not None else None
+
+def _write_entries(project_base_path, records):
+    """
+    Appends (timestamp, level, experiment_id, entry_text) records to their daily log files,
+    opening each file once.
+    """
+    log_dir = _ensure_log_files_dir_exists(project_base_path)
+    structured = LOG_FORMAT == LOG_FORMAT_JSONL
+    format_line = _format_record if structured else _format_entry
+    lines_by_file = {}
+    for record in records:
+        lines_by_file.setdefault(get_daily_log_filename(record[0]), []).append(format_line(*record))
+    for log_filename, lines in lines_by_file.items():
+        log_filepath = os.path.join(log_dir, log_filename)
+        new_day = not os.path.exists(log_filepath)
+        with open(log_filepath, 'a', encoding='utf-8') as f: # Append mode
+            f.write("".join(lines))
+        if structured:
+            _update_live_index(log_filepath)
+        if new_day and LOG_RETENTION_DAYS is not None:
+            _start_retention(project_base_path)
+
+def _get_buffered_writer(project_base_path):
+    return _buffered_writers.get(os.path.abspath(project_base_path))
+
+def start_buffered_logging(project_base_path, batch_size=log_writer.DEFAULT_BATCH_SIZE,
+                           flush_interval=log_writer.DEFAULT_FLUSH_INTERVAL, max_queue=log_writer.DEFAULT_MAX_QUEUE):
+    """
+    Switches add_log_entry for this project to a buffered background writer, for high-rate
+    logging (e.g. automated instrument runs). Entries are timestamped when added and written in
+    batches of up to batch_size, at most flush_interval seconds later; once max_queue entries
+    are waiting, add_log_entry blocks until the writer catches up.
+    Call flush_log_entries to wait for queued entries and stop_buffered_logging when done
+    (pending entries are also written at interpreter exit).
+
+    Returns:
+        bool: True if started, False if buffered logging is already active for this project.
+        str: Message.
+    """
+    key = os.path.abspath(project_base_path)
+    with _buffered_writers_lock:
+        if key in _buffered_writers:
+            return False, "Buffered logging is already active."
+        _buffered_writers[key] = log_writer.BufferedLogWriter(
+            lambda records: _write_entries(key, records), batch_size=batch_size,
+            flush_interval=flush_interval, max_queue=max_queue)
+    return True, f"Buffered logging started (batches of {batch_size}, every {flush_interval}s at most)."
+
+def flush_log_entries(project_base_path, timeout=None):
+    """
+    Waits until every entry queued so far by the buffered writer is written.
+    A failed write is reported once, by the next flush or stop, with the number of entries lost.
+
+    Returns:
+        bool: True if flushed (or nothing is buffered), False on timeout or on a write error
+              since the previous flush.
+        str: Message.
+    """
+    writer = _get_buffered_writer(project_base_path)
+    if writer is None:
+        return True, "Buffered logging is not active; entries are written immediately."
+    if not writer.flush(timeout):
+        return False, "Error: Timed out waiting for queued log entries to be written."
+    error, dropped = writer.take_error()
+    if error:
+        return False, f"Error writing queued log entries ({dropped} dropped): {error}"
+    return True, f"{writer.written} log entries written so far."
+
+def stop_buffered_logging(project_base_path, timeout=None):
+    """Writes the queued entries, stops the background writer and returns to direct writes."""
+    with _buffered_writers_lock:
+        writer = _buffered_writers.pop(os.path.abspath(project_base_path), None)
+    if writer is None:
+        return False, "Buffered logging is not active."
+    if not writer.close(timeout):
+        return False, "Error: Timed out waiting for queued log entries to be written."
+    error, dropped = writer.take_error()
+    if error:
+        return False, f"Error writing queued log entries ({dropped} dropped): {error}"
+    return True, f"Buffered logging stopped; {writer.written} log entries written."
+
+@atexit.register
+def _stop_all_buffered_logging():
+    for project_base_path in list(_buffered_writers):
+        stop_buffered_logging(project_base_path)
+
+def add_log_entry(entry_text, project_base_path, experiment_id=None, level="INFO", timeout=None):
     """
     Adds a new entry to the daily log file.
-    Each entry is timestamped.
+    Each entry is timestamped. While buffered logging is active (see start_buffered_logging),
+    the entry is queued for the background writer instead of being written immediately.
 
     Args:
         entry_text (str): The text of the log entry.
@@ -30,6 +240,8 @@ def add_log_entry(entry_text, project_base_path, experiment_id=None, level="INFO
         experiment_id (str, optional): An optional identifier for the experiment
                                        this log entry pertains to.
         level (str, optional): Log level (e.g., INFO, WARNING, ERROR, DEBUG). Defaults to "INFO".
+        timeout (float, optional): With buffered logging, seconds to wait while the queue is full
+                                   (None waits as long as needed).
 
     Returns:
         bool: True if successful, False otherwise.
@@ -38,29 +250,75 @@ def add_log_entry(entry_text, project_base_path, experiment_id=None, level="INFO
     if not entry_text or not isinstance(entry_text, str):
         return False, "Error: Log entry text cannot be empty and must be a string."
 
-    log_dir = _ensure_log_files_dir_exists(project_base_path)
-    log_filename = get_daily_log_filename()
-    log_filepath = os.path.join(log_dir, log_filename)
-
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] # Millisecond precision
-
-    formatted_entry = f"[{timestamp}] [{level.upper()}]"
-    if experiment_id:
-        formatted_entry += f" [ExpID: {experiment_id}]"
-    formatted_entry += f": {entry_text.strip()}\n" # Ensure newline
+    timestamp = datetime.now()
+    log_filename = get_daily_log_filename(timestamp)
+    record = (timestamp, level, experiment_id, entry_text)
 
+    writer = _get_buffered_writer(project_base_path)
+    if writer is not None:
+        if writer.put(record, timeout=timeout):
+            return True, f"Log entry queued for '{log_filename}'."
+        return False, "Error: Log queue is full (or the writer was stopped); entry not added."
     try:
-        with open(log_filepath, 'a', encoding='utf-8') as f: # Append mode
-            f.write(formatted_entry)
+        _write_entries(project_base_path, [record])
         return True, f"Log entry added to '{log_filename}'."
     except Exception as e:
         return False, f"Error adding log entry: {e}"
 
+def _locate_log_file(log_filename_or_date, project_base_path):
+    """
+    Returns (path of an existing log file, day, None) or (None, None, error message).
+    day ("YYYY-MM-DD") is set when a date was asked for and it lives in a monthly rollup.
+    """
+    log_dir = get_log_files_dir(project_base_path) # Does not ensure_exists, as we are reading
+    if not os.path.isdir(log_dir):
+        return None, None, f"Log directory '{log_dir}' does not exist."
+
+    log_filename = _resolve_log_filename(log_filename_or_date, log_dir)
+    if log_filename is None:
+        return None, None, "Error: Invalid date format. Use 'YYYYMMDD', 'YYYY-MM-DD', or full filename."
+
+    log_filepath = os.path.join(log_dir, log_filename)
+
+    if not os.path.exists(log_filepath):
+        return None, None, f"Log file '{log_filename}' not found at '{log_filepath}'."
+    days = _log_file_days(log_filename)
+    if days and days[0] != days[1] and log_filename != log_filename_or_date: # A day of a monthly rollup
+        day = log_filename_or_date[4:12] if _is_log_filename(log_filename_or_date) else log_filename_or_date.replace("-", "")
+        return log_filepath, f"{day[:4]}-{day[4:6]}-{day[6:]}", None
+    return log_filepath, None, None
+
+def _line_day(line):
+    """Returns the day ("YYYY-MM-DD") of an entry line in either format, or None if it has none."""
+    if line.startswith("{"):
+        try:
+            return str(json.loads(line).get("timestamp", ""))[:10] or None
+        except (ValueError, AttributeError):
+            return None
+    match = _TEXT_ENTRY_PATTERN.match(line)
+    return match.group(1) if match else None
+
+def _iter_file_lines(log_filepath, day=None):
+    """
+    Streams the lines of a plain or archived log (decompressing on the fly), keeping only the
+    lines of day if given. Lines without a timestamp belong to the entry before them.
+    """
+    with log_archive.open_text(log_filepath) as f:
+        in_day = day is None
+        for line in f:
+            if day is not None:
+                line_day = _line_day(line)
+                if line_day is not None:
+                    in_day = line_day == day
+            if in_day:
+                yield line
+
 def view_log_file(log_filename_or_date, project_base_path):
     """
     Retrieves the content of a specific log file.
     The identifier can be the full filename (e.g., "log_20231027.txt")
-    or a date string "YYYYMMDD" or "YYYY-MM-DD".
+    or a date string "YYYYMMDD" or "YYYY-MM-DD". Compressed logs are read transparently; a date
+    whose log was rolled up into a monthly archive returns that day's entries.
 
     Args:
         log_filename_or_date (str): The filename or date string for the log.
@@ -70,37 +328,363 @@ def view_log_file(log_filename_or_date, project_base_path):
         str or None: The content of the log file if found, else None.
         str: Message indicating success or status.
     """
-    log_dir = get_log_files_dir(project_base_path) # Does not ensure_exists, as we are reading
-    if not os.path.isdir(log_dir):
-        return None, f"Log directory '{log_dir}' does not exist."
+    log_filepath, day, msg = _locate_log_file(log_filename_or_date, project_base_path)
+    if log_filepath is None:
+        return None, msg
+    log_filename = os.path.basename(log_filepath)
 
-    log_filename = ""
-    if log_filename_or_date.startswith("log_") and log_filename_or_date.endswith(".txt"):
-        log_filename = log_filename_or_date
-    else:
-        try:
-            # Attempt to parse as YYYY-MM-DD or YYYYMMDD
-            date_str = log_filename_or_date.replace("-", "")
-            datetime.strptime(date_str, "%Y%m%d") # Validate date format
-            log_filename = f"log_{date_str}.txt"
-        except ValueError:
-            return None, "Error: Invalid date format. Use 'YYYYMMDD', 'YYYY-MM-DD', or full filename."
+    try:
+        content = "".join(_iter_file_lines(log_filepath, day))
+        return content, f"Content of '{log_filename}'{f' for {day}' if day else ''} retrieved."
+    except Exception as e:
+        return None, f"Error reading log file '{log_filename}': {e}"
 
-    log_filepath = os.path.join(log_dir, log_filename)
+def iter_log_lines(log_filename_or_date, project_base_path):
+    """
+    Yields the lines of a log file one at a time (without newlines), so a large day can be
+    printed or processed without loading it whole. Yields nothing if the log is not found.
+    """
+    log_filepath, day, msg = _locate_log_file(log_filename_or_date, project_base_path)
+    if log_filepath is None:
+        return
+    for line in _iter_file_lines(log_filepath, day):
+        yield line.rstrip("\n")
 
-    if not os.path.exists(log_filepath):
-        return None, f"Log file '{log_filename}' not found at '{log_filepath}'."
+def tail_log(log_filename_or_date, project_base_path, n=DEFAULT_TAIL_LINES):
+    """
+    Retrieves the last n lines of a log file. The file is read backwards from its end in blocks
+    of TAIL_BLOCK_SIZE until n lines are found, so the cost does not depend on the file size.
+    Archived logs cannot be read backwards: they are streamed, keeping only the last n lines.
 
+    Returns:
+        list or None: The last n lines (without newlines), oldest first, or None if not found.
+        str: Message indicating success or status.
+    """
+    log_filepath, day, msg = _locate_log_file(log_filename_or_date, project_base_path)
+    if log_filepath is None:
+        return None, msg
+    log_filename = os.path.basename(log_filepath)
+    if n <= 0:
+        return [], f"No lines requested from '{log_filename}'."
     try:
-        with open(log_filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content, f"Content of '{log_filename}' retrieved."
+        if log_archive.archive_method(log_filename):
+            lines = [line.rstrip("\n") for line in deque(_iter_file_lines(log_filepath, day), maxlen=n)]
+            return lines, f"Last {len(lines)} line(s) of '{log_filename}'."
+        with open(log_filepath, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            data = b""
+            # n complete lines need n + 1 newlines (the one before the first line), or the file start
+            while position > 0 and data.count(b"\n", 0, len(data) - 1) < n:
+                read_size = min(TAIL_BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+        lines = [line.decode('utf-8', errors='replace') for line in data.splitlines()[-n:]]
+        return lines, f"Last {len(lines)} line(s) of '{log_filename}'."
     except Exception as e:
         return None, f"Error reading log file '{log_filename}': {e}"
 
+def follow_log(project_base_path, log_filename_or_date=None, from_start=False, poll_interval=FOLLOW_POLL_INTERVAL,
+               stop_event=None):
+    """
+    Streams lines as they are appended to a log file, like "tail -f". Only new bytes are read;
+    a partially written line is held back until its newline arrives. If the file is truncated
+    or replaced, it is followed again from its start.
+    This is a generator that runs until stop_event is set or the caller stops iterating.
+
+    Args:
+        project_base_path (str): The base path of the project.
+        log_filename_or_date (str, optional): The log to follow. Defaults to today's log, switching
+                                              to the next day's log after midnight.
+        from_start (bool, optional): Also yield the lines already in the file. Defaults to False.
+        poll_interval (float, optional): Seconds to wait for new data between checks.
+        stop_event (threading.Event, optional): Ends the stream when set.
+
+    Yields:
+        str: Each new line, without its newline.
+    """
+    log_dir = get_log_files_dir(project_base_path)
+    follow_today = log_filename_or_date is None
+    if not follow_today:
+        log_filename = _resolve_log_filename(log_filename_or_date, log_dir)
+        if log_filename is None:
+            raise ValueError("Invalid date format. Use 'YYYYMMDD', 'YYYY-MM-DD', or full filename.")
+        if log_archive.archive_method(log_filename):
+            raise ValueError(f"Log '{log_filename}' is archived and no longer written to.")
+    log_filepath, f, pending = None, None, b""
+    try:
+        while stop_event is None or not stop_event.is_set():
+            identifier = datetime.now().strftime('%Y%m%d') if follow_today else log_filename_or_date
+            current_path = os.path.join(log_dir, _resolve_log_filename(identifier, log_dir))
+            if current_path != log_filepath: # First pass, or a new day: the new file is read from its start
+                if f:
+                    f.close()
+                from_start = from_start or log_filepath is not None
+                log_filepath, f, pending = current_path, None, b""
+            try:
+                stat = os.stat(log_filepath)
+            except FileNotFoundError: # Not created yet: all of it will be new
+                stat, from_start = None, True
+            if stat is not None and (f is None or os.fstat(f.fileno()).st_ino != stat.st_ino or stat.st_size < f.tell()):
+                if f: # Replaced or truncated
+                    f.close()
+                    from_start = True
+                f, pending = open(log_filepath, 'rb'), b""
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+            data = f.read(TAIL_BLOCK_SIZE) if f else b""
+            if data:
+                *lines, pending = (pending + data).split(b"\n")
+                for line in lines:
+                    yield line.decode('utf-8', errors='replace')
+                continue # More may be waiting: read again before sleeping
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    finally:
+        if f:
+            f.close()
+
+def render_log_line(line):
+    """Renders a log line for display: structured (JSON) records as free-text entries, other lines as they are."""
+    if line.startswith("{"):
+        try:
+            return format_log_record(json.loads(line))
+        except (ValueError, AttributeError):
+            pass
+    return line
+
+def read_log_records(log_filename_or_date, project_base_path, hours=None, levels=None, experiment_ids=None):
+    """
+    Yields the records of one structured (JSONL) daily log that match the given filters, reading
+    only the blocks the sidecar index lists for them (the index is updated first if needed).
+
+    Args:
+        log_filename_or_date (str): A .jsonl log filename, or a date "YYYYMMDD" / "YYYY-MM-DD".
+        project_base_path (str): The base path of the project.
+        hours (iterable of int, optional): Hours of the day (0-23) to include.
+        levels (iterable of str, optional): Log levels to include (case-insensitive).
+        experiment_ids (iterable of str, optional): Experiment IDs to include.
+
+    Yields:
+        dict: Records {"timestamp", "level", "experiment_id", "text"} in file order.
+    """
+    log_filepath, day, msg = _locate_log_file(log_filename_or_date, project_base_path)
+    if log_filepath is None or not _is_structured(log_filepath):
+        return
+    hours = None if hours is None else {f"{int(hour):02d}" for hour in hours}
+    start = end = None
+    if day: # Only that day of a monthly rollup
+        start = f"{day}T00:00:00.000"
+        end = (datetime.fromisoformat(start) + timedelta(days=1)).isoformat(timespec='milliseconds')
+    yield from _iter_structured_records(log_filepath, _RecordFilter(start, end, levels, experiment_ids, hours))
+
+class _RecordFilter:
+    """Normalized query criteria; None accepts anything. Timestamps are ISO strings, end exclusive."""
+
+    def __init__(self, start=None, end=None, levels=None, experiment_ids=None, hours=None):
+        self.start, self.end, self.hours = start, end, hours
+        self.levels = None if levels is None else {level.upper() for level in levels}
+        self.experiment_ids = None if experiment_ids is None else set(experiment_ids)
+
+    def __call__(self, record):
+        timestamp = record.get("timestamp", "")
+        return (self.start is None or timestamp >= self.start) and (self.end is None or timestamp < self.end) and \
+               (self.hours is None or timestamp[11:13] in self.hours) and \
+               (self.levels is None or record.get("level") in self.levels) and \
+               (self.experiment_ids is None or record.get("experiment_id") in self.experiment_ids)
+
+def _load_archive_index(archive_path):
+    # Archives never change, so a saved index stays valid; one missing is rebuilt by streaming the archive once.
+    index = log_index.load_index(archive_path)
+    if index is None:
+        with log_archive.open_binary(archive_path) as f:
+            index = log_index.build_index(f)
+        log_index.save_index(archive_path, index)
+    return index
+
+def _iter_structured_records(log_filepath, record_filter):
+    if log_archive.archive_method(log_filepath):
+        index = _load_archive_index(log_filepath)
+    else:
+        index = log_index.update_index(log_filepath)
+    if index is None:
+        return
+    blocks = log_index.select_blocks(index, record_filter.hours, record_filter.levels, record_filter.experiment_ids,
+                                     record_filter.start, record_filter.end)
+    if not blocks:
+        return
+    with log_archive.open_binary(log_filepath) as f: # Blocks are read in file order: archives only seek forward
+        for block_number in blocks:
+            for record in log_index.read_block(f, index["blocks"][block_number]):
+                if record_filter(record):
+                    yield record
+
+def _iter_text_records(log_filepath, record_filter):
+    # Free-text logs have no index: the file is streamed line by line, never loaded whole.
+    with log_archive.open_text(log_filepath) as f:
+        for line in f:
+            record = _parse_entry(line)
+            if record and record_filter(record):
+                yield record
+
+def _as_timestamp(moment):
+    if moment is None or isinstance(moment, str):
+        return moment
+    if not isinstance(moment, datetime): # A date: its midnight
+        moment = datetime(moment.year, moment.month, moment.day)
+    return moment.isoformat(timespec='milliseconds')
+
+def query_log_entries(project_base_path, start=None, end=None, levels=None, experiment_ids=None):
+    """
+    Finds log entries across all daily logs (free-text and structured) by time range, level and
+    experiment ID, e.g. all ERRORs of experiment "MSL-42" over the last 90 days.
+    This is a generator: entries are read lazily, one file at a time. Daily files (and monthly
+    archives) outside the time range are never opened, structured logs are read only in the
+    blocks their index lists for the criteria, and archives are decompressed as streams.
+
+    Args:
+        project_base_path (str): The base path of the project.
+        start (datetime or date, optional): Earliest entry time (inclusive).
+        end (datetime or date, optional): Latest entry time (exclusive).
+        levels (iterable of str, optional): Log levels to include (case-insensitive).
+        experiment_ids (iterable of str, optional): Experiment IDs to include.
+
+    Yields:
+        dict: Entries {"timestamp", "level", "experiment_id", "text"} in chronological order,
+              timestamps as "YYYY-MM-DDTHH:MM:SS.mmm" strings.
+    """
+    record_filter = _RecordFilter(_as_timestamp(start), _as_timestamp(end), levels, experiment_ids)
+    first_day = record_filter.start[:10].replace("-", "") if record_filter.start else None
+    last_day = None
+    if record_filter.end: # The day of the last millisecond before end
+        last_day = (datetime.fromisoformat(record_filter.end) - timedelta(milliseconds=1)).strftime("%Y%m%d")
+    for log_filepaths in _iter_log_file_groups(get_log_files_dir(project_base_path), first_day, last_day):
+        streams = [_iter_structured_records(path, record_filter) if _is_structured(path)
+                   else _iter_text_records(path, record_filter) for path in log_filepaths]
+        # Files covering the same days (both formats, a rollup and its month's days) are merged by
+        # time; each stream is already in order.
+        yield from heapq.merge(*streams, key=lambda record: record["timestamp"]) if len(streams) > 1 else streams[0]
+
+def _iter_log_file_groups(log_dir, first_day=None, last_day=None):
+    """
+    Yields lists of log file paths overlapping the days first_day..last_day ("YYYYMMDD", inclusive),
+    oldest first. Files whose days overlap are yielded together.
+    """
+    try:
+        filenames = os.listdir(log_dir)
+    except FileNotFoundError:
+        return
+    spans = []
+    for filename in filenames:
+        days = _log_file_days(filename)
+        if days and (first_day is None or days[1] >= first_day) and (last_day is None or days[0] <= last_day):
+            spans.append((days, os.path.join(log_dir, filename)))
+    group, group_end = [], None
+    for (first, last), path in sorted(spans):
+        if group and first > group_end:
+            yield group
+            group = []
+        group_end = last if not group else max(group_end, last)
+        group.append(path)
+    if group:
+        yield group
+
+def parse_query_time(value):
+    """
+    Parses a query bound: "YYYY-MM-DD", "YYYYMMDD" or an ISO date-time ("YYYY-MM-DDTHH:MM[:SS]").
+
+    Raises:
+        ValueError: If the value is not a valid date or date-time.
+    """
+    value = value.strip()
+    if len(value) == 8 and value.isdigit():
+        return datetime.strptime(value, "%Y%m%d")
+    return datetime.fromisoformat(value)
+
+def format_log_record(record):
+    """Renders a record (from a query or a structured log) as a free-text log line, without newline."""
+    line = f"[{record.get('timestamp', '').replace('T', ' ')}] [{record.get('level')}]"
+    if record.get("experiment_id"):
+        line += f" [ExpID: {record['experiment_id']}]"
+    return f"{line}: {record.get('text', '')}"
+
+def last_days_start(days):
+    """Start of a query over the last `days` days, today included (midnight of the first day)."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=max(days, 1) - 1)
+
+def _start_retention(project_base_path):
+    # Not a daemon thread: the interpreter waits for a compression run to finish before exiting.
+    threading.Thread(target=compress_old_logs, args=(project_base_path,), name="logbook-retention").start()
+
+_retention_lock = threading.Lock() # One compression run at a time within this process (file_lock: across processes)
+
+def compress_old_logs(project_base_path, older_than_days=None, method=None, monthly=None):
+    """
+    Retention policy: compresses the plain daily logs older than older_than_days days into gzip
+    or xz archives, one per day (log_YYYYMMDD.txt.gz) or one rollup per month (log_YYYYMM.txt.gz,
+    grown a day at a time). Structured logs get a new sidecar index for their archive.
+    The plain files are removed only once their archive is complete. Runs in several processes
+    (each starts one when a new day's log appears) are serialized by a file lock on the log directory.
+
+    Args:
+        project_base_path (str): The base path of the project.
+        older_than_days (int, optional): Minimum age in days (at least 1). Defaults to LOG_RETENTION_DAYS.
+        method (str, optional): "gzip" or "xz". Defaults to LOG_ARCHIVE_METHOD.
+        monthly (bool, optional): Roll up per month. Defaults to LOG_ARCHIVE_MONTHLY.
+
+    Returns:
+        bool: True if successful, False otherwise.
+        str: Message indicating success or failure.
+    """
+    older_than_days = LOG_RETENTION_DAYS if older_than_days is None else older_than_days
+    method = method or LOG_ARCHIVE_METHOD
+    monthly = LOG_ARCHIVE_MONTHLY if monthly is None else monthly
+    if older_than_days is None or older_than_days < 1:
+        return False, "Error: Logs must be at least 1 day old to be compressed (today's log is still written)."
+    if method not in log_archive.ARCHIVE_SUFFIXES:
+        return False, f"Error: Unknown archive method '{method}'. Use one of: {', '.join(log_archive.ARCHIVE_SUFFIXES)}."
+    log_dir = get_log_files_dir(project_base_path)
+    if not os.path.isdir(log_dir):
+        return True, "No logs to compress."
+
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y%m%d')
+    with _retention_lock, file_lock.locked(log_dir):
+        targets = {} # Archive filename -> plain log paths, oldest first
+        for filename in sorted(os.listdir(log_dir)):
+            days = _log_file_days(filename)
+            if not days or days[0] != days[1] or days[0] >= cutoff or log_archive.archive_method(filename):
+                continue
+            archive_name = filename.replace(days[0], days[0][:6]) if monthly else filename
+            targets.setdefault(archive_name + log_archive.ARCHIVE_SUFFIXES[method], []).append(os.path.join(log_dir, filename))
+        try:
+            for archive_name, sources in targets.items():
+                sources[:] = [source for source in sources if os.path.exists(source)] # Compressed meanwhile: skip
+                if not sources:
+                    continue
+                archive_path = os.path.join(log_dir, archive_name)
+                log_archive.append_to_archive(archive_path, sources, method)
+                if _is_structured(archive_name):
+                    with log_archive.open_binary(archive_path) as f:
+                        log_index.save_index(archive_path, log_index.build_index(f))
+                for source in sources:
+                    for path in (source, log_index.get_index_path(source)):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+        except Exception as e:
+            return False, f"Error compressing old logs: {e}"
+    compressed = sum(len(sources) for sources in targets.values())
+    archives = sum(1 for sources in targets.values() if sources)
+    return True, f"Compressed {compressed} log file(s) older than {older_than_days} day(s) into {archives} archive(s)."
+
 def list_log_files(project_base_path):
     """
-    Lists all available log files in the log directory.
+    Lists all available log files in the log directory, including compressed archives
+    (e.g. "log_20231027.txt.gz", or "log_202310.txt.xz" for a monthly rollup).
 
     Args:
         project_base_path (str): The base path of the project.
@@ -117,8 +701,7 @@ def list_log_files(project_base_path):
         files = os.listdir(log_dir)
         log_files = sorted([
             f for f in files
-            if os.path.isfile(os.path.join(log_dir, f)) and \
-               f.startswith("log_") and f.endswith(".txt")
+            if os.path.isfile(os.path.join(log_dir, f)) and _is_log_filename(f)
         ], reverse=True) # Most recent first
         return log_files, f"Found {len(log_files)} log file(s)."
     except Exception as e:
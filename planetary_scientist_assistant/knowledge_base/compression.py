@@ -0,0 +1,95 @@
+# planetary_scientist_assistant/knowledge_base/compression.py
+import io
+import lzma
+import zlib
+
+# Optional transparent compression of stored note and document contents.
+# Supported methods: "zlib" (fast, moderate ratio) and "lzma" (slower, best ratio for text).
+# None means "stored as is". Compressed files carry an extra suffix (".zz" / ".xz") after the
+# original extension, and the method is recorded in the metadata of the note or document, so
+# stores can mix compressed and uncompressed contents.
+# Files are compressed and decompressed as streams in fixed-size chunks, so neither direction
+# ever holds a whole large document in memory.
+
+METHOD_SUFFIXES = {"zlib": ".zz", "lzma": ".xz"}
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def validate_method(method):
+    """Raises ValueError for an unknown compression method (None is valid and means no compression)."""
+    if method is not None and method not in METHOD_SUFFIXES:
+        raise ValueError(f"Unknown compression method '{method}'. Use one of: {', '.join(METHOD_SUFFIXES)}.")
+
+def get_suffix(method):
+    """Returns the file suffix of a compression method ("" for None)."""
+    validate_method(method)
+    return METHOD_SUFFIXES.get(method, "")
+
+def _compressor(method):
+    return zlib.compressobj(level=6) if method == "zlib" else lzma.LZMACompressor()
+
+def compress_bytes(data, method):
+    validate_method(method)
+    if method is None:
+        return data
+    compressor = _compressor(method)
+    return compressor.compress(data) + compressor.flush()
+
+def decompress_bytes(data, method):
+    validate_method(method)
+    if method is None:
+        return data
+    return zlib.decompress(data) if method == "zlib" else lzma.decompress(data)
+
+def compress_file(source_path, destination_path, method):
+    """Writes a compressed copy of source_path to destination_path, chunk by chunk."""
+    validate_method(method)
+    compressor = _compressor(method)
+    with open(source_path, 'rb') as fsrc, open(destination_path, 'wb') as fdst:
+        for chunk in iter(lambda: fsrc.read(STREAM_CHUNK_SIZE), b""):
+            fdst.write(compressor.compress(chunk))
+        fdst.write(compressor.flush())
+
+class _ZlibReader(io.RawIOBase):
+    """Read-only stream over a zlib-compressed file, decompressing at most one chunk at a time."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._decompressor = zlib.decompressobj()
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._decompressor.eof:
+                return 0
+            data = self._decompressor.unconsumed_tail or self._file.read(STREAM_CHUNK_SIZE)
+            if not data:
+                self._pending = self._decompressor.flush()
+                if not self._pending:
+                    return 0
+                break
+            self._pending = self._decompressor.decompress(data, STREAM_CHUNK_SIZE)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def open_stream(path, method):
+    """
+    Opens a stored file for reading its original (decompressed) bytes as a stream.
+    The result is a binary file object to be used as a context manager; it is not seekable
+    when the file is compressed.
+    """
+    validate_method(method)
+    if method is None:
+        return open(path, 'rb')
+    if method == "lzma":
+        return lzma.open(path, 'rb')
+    return io.BufferedReader(_ZlibReader(path), buffer_size=STREAM_CHUNK_SIZE)
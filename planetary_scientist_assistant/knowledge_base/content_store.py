@@ -0,0 +1,101 @@
+# planetary_scientist_assistant/knowledge_base/content_store.py
+import os
+import shutil
+import hashlib
+
+try:
+    from . import compression as compression_codecs
+except ImportError: # Running a knowledge_base module directly as a script
+    import compression as compression_codecs
+
+# Content-addressed blob store for knowledge base documents.
+# Every distinct file content is stored exactly once under
+#   <store_dir>/<sha256[:2]>/<sha256><extension>
+# and any number of metadata entries may reference the same blob.
+# Blobs may be stored compressed (<sha256><extension>.xz / .zz); the hash is always that of the
+# original content, so deduplication does not depend on the compression method: content already
+# stored with another method (or none) is reused as it is instead of being stored again.
+
+OBJECTS_DIRNAME = "objects"
+HASH_CHUNK_SIZE = 1024 * 1024 # Read files in 1 MiB chunks so large files are never held in memory
+
+
+def hash_stream(stream):
+    """Returns (SHA-256 hex digest, size in bytes) of everything read from a binary stream."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def compute_file_hash(file_path, compression=None):
+    """Computes the SHA-256 hex digest of a file's (decompressed) content, streaming it in chunks."""
+    with compression_codecs.open_stream(file_path, compression) as f:
+        return hash_stream(f)[0]
+
+def get_object_path(store_dir, content_hash, extension=""):
+    """Returns the path of the blob holding content_hash."""
+    return os.path.join(store_dir, content_hash[:2], f"{content_hash}{extension}")
+
+def find_object(store_dir, content_hash, extension="", compression=None):
+    """
+    Looks for the blob holding content_hash, stored plain or with any compression method
+    (the given one is tried first).
+
+    Returns:
+        tuple: (object_path, compression) of the blob, or None if the content is not stored.
+    """
+    methods = (compression,) + tuple(m for m in (None,) + tuple(compression_codecs.METHOD_SUFFIXES) if m != compression)
+    for method in methods:
+        object_path = get_object_path(store_dir, content_hash, extension + compression_codecs.get_suffix(method))
+        if os.path.exists(object_path):
+            return object_path, method
+    return None
+
+def store_file(store_dir, source_path, extension="", compression=None):
+    """
+    Stores a file in the blob store unless identical content is already there.
+    The file is hashed and (if new) copied or compressed in fixed-size chunks.
+
+    Args:
+        store_dir (str): Root directory of the blob store.
+        source_path (str): File to store.
+        extension (str, optional): File extension kept on the blob (e.g. ".pdf").
+        compression (str, optional): "zlib" or "lzma" to store a new blob compressed.
+
+    Returns:
+        tuple: (content_hash, object_path, created, compression) where created is False for a
+            deduplicated file and compression is the method of the blob actually holding the
+            content (that of the existing blob when deduplicated).
+    """
+    content_hash = compute_file_hash(source_path)
+    existing = find_object(store_dir, content_hash, extension, compression)
+    if existing:
+        object_path, compression = existing
+        return content_hash, object_path, False, compression
+    object_path = get_object_path(store_dir, content_hash, extension + compression_codecs.get_suffix(compression))
+
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    tmp_path = f"{object_path}.{os.getpid()}.tmp" # Unique per process; the rename makes the blob appear atomically
+    try:
+        if compression:
+            compression_codecs.compress_file(source_path, tmp_path, compression)
+        else:
+            with open(source_path, 'rb') as fsrc, open(tmp_path, 'wb') as fdst:
+                shutil.copyfileobj(fsrc, fdst, HASH_CHUNK_SIZE)
+        os.replace(tmp_path, object_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return content_hash, object_path, True, compression
+
+def remove_object(object_path):
+    """Deletes a blob and its fan-out directory once that is empty."""
+    if os.path.exists(object_path):
+        os.remove(object_path)
+    parent = os.path.dirname(object_path)
+    try:
+        os.rmdir(parent)
+    except OSError:
+        pass # Directory still holds other blobs
@@ -0,0 +1,84 @@
+# planetary_scientist_assistant/knowledge_base/derived_db.py
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# SQLite files holding derived data (search indexes and the like) that can always be rebuilt
+# from the primary stores. A change is a small transaction touching only the affected rows,
+# so updating one document or note never rewrites the whole file, and a query reads only the
+# rows it needs.
+# A file records the layout version it was created with (PRAGMA user_version). A file from
+# another version, or one that is not a database at all, is replaced by an empty one, which its
+# owner notices (nothing recorded in the "meta" table yet) and fills again.
+# Readers never take the owning store's file lock: SQLite's own locking gives every transaction
+# a consistent view, and writers hold the store lock on top of it, as for every other store.
+# Files use write-ahead logging (WAL), so readers keep reading the last committed state while a
+# writer's transaction is open, however long that batch takes; only writers wait for each other.
+
+CONNECT_TIMEOUT_SECONDS = 30 # How long a transaction waits for another session's lock
+
+_META_SCHEMA = "CREATE TABLE meta (key TEXT PRIMARY KEY, value)"
+
+
+@contextmanager
+def open_db(path, schema, version):
+    """
+    Opens the database at path (creating or resetting it if needed) as a single transaction:
+    committed when the block exits normally, rolled back if it raises.
+
+    Args:
+        path (str): Database file.
+        schema (tuple): CREATE statements of the owner's tables and indexes.
+        version (int): Layout version (> 0); a file with another version is emptied and recreated.
+    """
+    conn = _connect(path, schema, version)
+    try:
+        conn.execute("BEGIN")
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def _connect(path, schema, version):
+    try:
+        return _prepare(sqlite3.connect(path, timeout=CONNECT_TIMEOUT_SECONDS, isolation_level=None), schema, version)
+    except sqlite3.OperationalError: # Locked, read-only, ...: not ours to repair
+        raise
+    except sqlite3.DatabaseError: # Not a database (or a corrupted one): derived data, start over
+        for stale_path in (path, path + "-journal", path + "-wal", path + "-shm"):
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+        return _prepare(sqlite3.connect(path, timeout=CONNECT_TIMEOUT_SECONDS, isolation_level=None), schema, version)
+
+def _prepare(conn, schema, version):
+    try:
+        conn.execute("PRAGMA journal_mode = WAL") # Persistent: a no-op once the file uses WAL
+        if conn.execute("PRAGMA user_version").fetchone()[0] == version:
+            return conn
+        conn.execute("BEGIN IMMEDIATE") # Several sessions may find the file new at the same time
+        if conn.execute("PRAGMA user_version").fetchone()[0] != version:
+            tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()
+            for (table,) in tables:
+                conn.execute(f'DROP TABLE "{table}"')
+            for statement in schema + (_META_SCHEMA,):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        conn.execute("COMMIT")
+        return conn
+    except BaseException:
+        conn.close()
+        raise
+
+def get_meta(conn, key, default=None):
+    """Returns a value recorded with set_meta, or default."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
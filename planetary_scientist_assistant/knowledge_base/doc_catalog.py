@@ -0,0 +1,145 @@
+# planetary_scientist_assistant/knowledge_base/doc_catalog.py
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+
+# SQLite catalog of document metadata, replacing the former metadata.json.
+# Lookups by ID use the primary key and filters on file_type, import_date and size_bytes use
+# secondary indexes, so no operation has to parse or rewrite the whole catalog.
+# SQLite's own file locking serializes concurrent writers from several CLI sessions. The file uses
+# write-ahead logging (WAL), so readers in other sessions never wait for a writer's transaction.
+
+CATALOG_FILENAME = "catalog.sqlite3"
+MIGRATED_SUFFIX = ".migrated"
+CONNECT_TIMEOUT_SECONDS = 30 # How long a writer waits for another session's lock
+_MAX_SQL_PARAMS = 900 # Stay below SQLite's default host parameter limit
+
+# Metadata keys stored in dedicated columns; any other key is kept in the JSON "extra" column.
+_COLUMNS = ("original_filename", "path_in_kb", "import_date", "size_bytes", "file_type", "content_hash")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    original_filename TEXT,
+    path_in_kb TEXT,
+    import_date TEXT,
+    size_bytes INTEGER,
+    file_type TEXT,
+    content_hash TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents (file_type);
+CREATE INDEX IF NOT EXISTS idx_documents_import_date ON documents (import_date);
+CREATE INDEX IF NOT EXISTS idx_documents_size_bytes ON documents (size_bytes);
+CREATE INDEX IF NOT EXISTS idx_documents_path_in_kb ON documents (path_in_kb);
+"""
+_SELECT = f"SELECT doc_id, {', '.join(_COLUMNS)}, extra FROM documents"
+
+
+@contextmanager
+def open_catalog(catalog_path):
+    """
+    Opens the catalog (creating the schema if needed) as a single transaction:
+    committed when the block exits normally, rolled back if it raises.
+    """
+    conn = sqlite3.connect(catalog_path, timeout=CONNECT_TIMEOUT_SECONDS)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL") # Persistent: a no-op once the file uses WAL
+        conn.executescript(_SCHEMA)
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _row_to_info(row):
+    info = {column: value for column, value in zip(_COLUMNS, row[1:-1]) if value is not None}
+    if row[-1]:
+        info.update(json.loads(row[-1]))
+    return info
+
+def _info_to_row(doc_id, info):
+    extra = {k: v for k, v in info.items() if k not in _COLUMNS}
+    return (doc_id,) + tuple(info.get(column) for column in _COLUMNS) + (json.dumps(extra) if extra else None,)
+
+def get_document(conn, doc_id):
+    """Returns the metadata dict of doc_id, or None."""
+    row = conn.execute(f"{_SELECT} WHERE doc_id = ?", (doc_id,)).fetchone()
+    return _row_to_info(row) if row else None
+
+def iter_documents(conn):
+    """Yields every (doc_id, metadata dict) pair in insertion order."""
+    return query_documents(conn)
+
+def get_documents(conn, doc_ids):
+    """Returns {doc_id: metadata dict} for the given IDs that exist, in insertion order."""
+    doc_ids = list(doc_ids)
+    rows = []
+    for start in range(0, len(doc_ids), _MAX_SQL_PARAMS):
+        chunk = doc_ids[start:start + _MAX_SQL_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        rows.extend(conn.execute(f"SELECT rowid, {_SELECT[len('SELECT '):]} WHERE doc_id IN ({placeholders})",
+                                 chunk).fetchall())
+    rows.sort(key=lambda row: row[0])
+    return {row[1]: _row_to_info(row[1:]) for row in rows}
+
+def query_documents(conn, file_type=None, imported_after=None, imported_before=None, min_size=None, max_size=None):
+    """
+    Yields (doc_id, metadata dict) pairs matching all given filters, in insertion order.
+    Every filter maps to an indexed column. Dates are ISO strings compared lexicographically.
+    """
+    clauses, params = [], []
+    for clause, value in (("file_type = ?", file_type), ("import_date >= ?", imported_after),
+                          ("import_date < ?", imported_before), ("size_bytes >= ?", min_size),
+                          ("size_bytes <= ?", max_size)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    for row in conn.execute(f"{_SELECT}{where} ORDER BY rowid", params):
+        yield row[0], _row_to_info(row)
+
+def existing_ids(conn, doc_ids):
+    """Returns the subset of doc_ids already present in the catalog."""
+    return set(get_documents(conn, doc_ids))
+
+def put_documents(conn, entries):
+    """Inserts or replaces several documents. entries maps doc_id -> metadata dict."""
+    placeholders = ", ".join("?" * (len(_COLUMNS) + 2))
+    conn.executemany(f"INSERT OR REPLACE INTO documents VALUES ({placeholders})",
+                     [_info_to_row(doc_id, info) for doc_id, info in entries.items()])
+
+def delete_document(conn, doc_id):
+    """Deletes a document. Returns True if it existed."""
+    return conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount > 0
+
+def count_path_references(conn, path_in_kb):
+    """Counts the documents whose stored file is path_in_kb."""
+    return conn.execute("SELECT COUNT(*) FROM documents WHERE path_in_kb = ?", (path_in_kb,)).fetchone()[0]
+
+def migrate_from_json(conn, metadata_path):
+    """
+    One-time import of a legacy metadata.json into the catalog.
+    The JSON file is renamed to metadata.json.migrated afterwards so the import never runs twice.
+
+    Returns:
+        int: Number of migrated documents (0 if there was nothing to migrate).
+    """
+    if not os.path.exists(metadata_path):
+        return 0
+    try:
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+    except (IOError, json.JSONDecodeError):
+        metadata = {} # Corrupted or empty legacy file: nothing to import
+    if metadata:
+        put_documents(conn, metadata)
+        conn.commit()
+    try:
+        os.replace(metadata_path, metadata_path + MIGRATED_SUFFIX)
+    except FileNotFoundError:
+        pass # Another session migrated it concurrently (INSERT OR REPLACE made the import idempotent)
+    return len(metadata)
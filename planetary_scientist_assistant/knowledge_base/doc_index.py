@@ -0,0 +1,126 @@
+# planetary_scientist_assistant/knowledge_base/doc_index.py
+import re
+
+# Text side of the inverted indexes (see index_store, which stores and queries them):
+# tokenization into lowercase words with their positions, the BM25 parameters, and the
+# boolean/phrase/prefix query language.
+# Positions are token offsets within a document; the term frequency is the number of positions.
+
+# Standard BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens."""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def term_positions(text):
+    """Returns a term -> [token positions] mapping for text."""
+    positions = {}
+    for position, term in enumerate(tokenize(text)):
+        positions.setdefault(term, []).append(position)
+    return positions
+
+# --- Boolean / phrase / prefix queries ---
+# Grammar (operators are case-sensitive, adjacent operands are implicitly ANDed):
+#   query   := or_expr
+#   or_expr := and_expr ("OR" and_expr)*
+#   and_expr:= not_expr (["AND"] not_expr)*
+#   not_expr:= "NOT" not_expr | operand
+#   operand := "(" query ")" | '"' phrase '"' | word | prefix*
+# index_store.evaluate_query works purely on posting lists: sets of document IDs are intersected,
+# united or subtracted, and phrases are verified with the stored token positions.
+
+_QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+_OPERATORS = ("AND", "OR", "NOT")
+
+
+def _lex_query(query):
+    tokens = []
+    for phrase, paren, word in _QUERY_TOKEN_PATTERN.findall(query):
+        if paren:
+            tokens.append(paren)
+        elif word in _OPERATORS:
+            tokens.append(word)
+        elif word:
+            tokens.append(("word", word))
+        else:
+            tokens.append(("phrase", phrase))
+    if query.count('"') % 2:
+        raise ValueError("Unbalanced quotes in query.")
+    return tokens
+
+def _make_operand(kind, raw):
+    """Turns a word or quoted phrase into a query node."""
+    if kind == "word" and raw.endswith("*"):
+        prefix = tokenize(raw[:-1])
+        if len(prefix) != 1:
+            raise ValueError(f"Invalid prefix term '{raw}'.")
+        return ("prefix", prefix[0])
+    terms = tokenize(raw)
+    if not terms:
+        raise ValueError(f"Query term '{raw}' contains no searchable words.")
+    return ("term", terms[0]) if len(terms) == 1 else ("phrase", terms)
+
+def parse_query(query):
+    """
+    Parses a query string into a tree of tuples:
+    ("term", t), ("prefix", p), ("phrase", [t, ...]), ("and", a, b), ("or", a, b), ("not", a).
+
+    Raises:
+        ValueError: If the query is empty or malformed.
+    """
+    tokens = _lex_query(query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        token = peek()
+        if token == "NOT":
+            take()
+            return ("not", parse_not())
+        if token == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Missing closing parenthesis in query.")
+            take()
+            return node
+        if isinstance(token, tuple):
+            take()
+            return _make_operand(*token)
+        raise ValueError("Unexpected end of query." if token is None else f"Unexpected '{token}' in query.")
+
+    if not tokens:
+        raise ValueError("Empty query.")
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[pos]}' in query.")
+    return tree
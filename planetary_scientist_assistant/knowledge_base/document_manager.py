@@ -1,10 +1,26 @@
 # planetary_scientist_assistant/knowledge_base/document_manager.py
+import io
 import os
 import shutil
-import json
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
-METADATA_FILE = "metadata.json"
+try:
+    from . import compression as compression_codecs
+    from . import content_store, doc_catalog, doc_index, file_lock, index_store, text_cache, text_scan, trigram_index
+except ImportError: # Running this file directly as a script
+    import compression as compression_codecs
+    import content_store
+    import doc_catalog
+    import doc_index
+    import file_lock
+    import index_store
+    import text_cache
+    import text_scan
+    import trigram_index
+
+METADATA_FILE = "metadata.json" # Legacy JSON metadata, migrated once into the SQLite catalog
 DOCUMENTS_DIR = "local_documents" # Relative to the knowledge_base directory or a global base? For now, assume relative to project root for simplicity.
 # Let's make DOCUMENTS_DIR relative to the project root for easier management from main.py
 # So, when used from main.py, it would be planetary_scientist_assistant/local_documents
@@ -15,29 +31,195 @@ DOCUMENTS_DIR = "local_documents" # Relative to the knowledge_base directory or
 PROJECT_ROOT_DOCS_DIR = "planetary_scientist_assistant/local_documents"
 PROJECT_ROOT_KB_METADATA_PATH = os.path.join(PROJECT_ROOT_DOCS_DIR, METADATA_FILE)
 
+SEARCH_INDEX_FILENAME = "search_index.sqlite3" # Keyword index of document contents (see index_store)
+FILENAME_TRIGRAMS_FILENAME = "filename_trigrams.sqlite3" # Trigram index of document filenames (fuzzy find)
+DEFAULT_SEARCH_TOP_K = 10 # Number of results returned by ranked search
+DEFAULT_INGEST_WORKERS = None # None lets ProcessPoolExecutor use one worker per CPU
+# Compression of newly stored documents: None, "zlib" or "lzma" (see compression.py).
+# Reading is transparent either way: the method is recorded per document.
+DOCUMENT_COMPRESSION = None
+DECOMPRESSED_DIRNAME = ".decompressed" # Plain copies of compressed documents handed out by get_document_path
+
 
 def _ensure_docs_dir_exists():
-    """Ensures the documents directory and metadata file exist."""
+    """Ensures the documents directory exists."""
     os.makedirs(PROJECT_ROOT_DOCS_DIR, exist_ok=True)
-    if not os.path.exists(PROJECT_ROOT_KB_METADATA_PATH):
-        with open(PROJECT_ROOT_KB_METADATA_PATH, 'w') as f:
-            json.dump({}, f)
 
-def _load_metadata():
-    """Loads the metadata from the JSON file."""
+def _get_catalog_path():
+    """Returns the path of the SQLite metadata catalog."""
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, doc_catalog.CATALOG_FILENAME)
+
+@contextmanager
+def _open_catalog():
+    """
+    Opens the metadata catalog as one transaction.
+    A legacy metadata.json found next to it is migrated into the catalog on first use.
+    """
     _ensure_docs_dir_exists()
+    with doc_catalog.open_catalog(_get_catalog_path()) as conn:
+        if os.path.exists(PROJECT_ROOT_KB_METADATA_PATH):
+            doc_catalog.migrate_from_json(conn, PROJECT_ROOT_KB_METADATA_PATH)
+        yield conn
+
+def _get_index_path():
+    """Returns the path of the keyword search index (kept next to the metadata catalog)."""
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, SEARCH_INDEX_FILENAME)
+
+@contextmanager
+def _writer_lock():
+    """
+    Serializes writers of the search index and of stored files across processes
+    (search_index.sqlite3.lock). Readers never take it: every index change is one SQLite transaction.
+    """
+    _ensure_docs_dir_exists()
+    with file_lock.locked(_get_index_path()):
+        yield
+
+def _get_objects_dir():
+    """Returns the root of the content-addressed document store."""
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, content_store.OBJECTS_DIRNAME)
+
+def _get_text_cache_dir():
+    """Returns the directory holding the extracted-text sidecar files."""
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, text_cache.TEXT_CACHE_DIRNAME)
+
+def _get_decompressed_dir():
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, DECOMPRESSED_DIRNAME)
+
+def _get_decompressed_path(info):
+    """Path of the plain copy of a compressed document (blob name without the compression suffix)."""
+    blob_name = os.path.basename(info["path_in_kb"])
+    return os.path.join(_get_decompressed_dir(), blob_name[:-len(compression_codecs.get_suffix(info["compression"]))])
+
+def _extract_text(file_path, file_type, compression=None):
+    """
+    Extracts the searchable text of a document (decompressing it on the fly if it is stored compressed).
+    Plain text files are read directly; PDFs require PyPDF2 and are skipped (empty text) without it.
+    """
+    if file_type == ".txt":
+        with compression_codecs.open_stream(file_path, compression) as f:
+            return io.TextIOWrapper(f, encoding='utf-8', errors='ignore').read()
+    if file_type == ".pdf":
+        try:
+            import PyPDF2
+        except ImportError:
+            return "" # PyPDF2 not installed: PDFs are simply not searchable
+        try:
+            with compression_codecs.open_stream(file_path, compression) as f:
+                # PdfReader needs random access, which a decompressing stream cannot offer
+                reader = PyPDF2.PdfReader(io.BytesIO(f.read()) if compression else f)
+                return "".join(page.extract_text() or "" for page in reader.pages)
+        except Exception:
+            return "" # Skip malformed PDFs
+    # Add more file types here if needed (e.g., .md, .json)
+    return ""
+
+def _get_cache_name(doc_id, info):
+    """Text cache entries are shared by content hash; documents stored before content addressing use their ID."""
+    return info.get("content_hash") or doc_id
+
+def _get_cached_text(doc_id, info):
+    """
+    Returns the extracted text of a managed document from its sidecar cache,
+    extracting it (once) if the cache entry is missing or stale. Unreadable files yield empty text.
+    """
+    file_path_in_kb = info.get("path_in_kb")
+    if not file_path_in_kb or not os.path.exists(file_path_in_kb):
+        return ""
+    file_type, compression = info.get("file_type"), info.get("compression")
     try:
-        with open(PROJECT_ROOT_KB_METADATA_PATH, 'r') as f:
-            metadata = json.load(f)
-    except (IOError, json.JSONDecodeError):
-        metadata = {} # Initialize if file is corrupted or empty
-    return metadata
-
-def _save_metadata(metadata):
-    """Saves the metadata to the JSON file."""
+        return text_cache.get_cached_text(_get_text_cache_dir(), _get_cache_name(doc_id, info), file_path_in_kb,
+                                          lambda path: _extract_text(path, file_type, compression))
+    except Exception:
+        return ""
+
+def rebuild_search_index():
+    """
+    Rebuilds the keyword search index from scratch from the cached text of every document
+    (documents are only extracted again if their cache entry is missing or stale).
+    Used automatically when the index file is missing, outdated or unreadable.
+
+    Returns:
+        int: Number of indexed documents.
+    """
+    with _writer_lock():
+        with _open_catalog() as conn:
+            documents = list(doc_catalog.iter_documents(conn))
+        with index_store.open_index(_get_index_path()) as conn:
+            index_store.rebuild(conn, ((doc_id, doc_index.term_positions(_get_cached_text(doc_id, info)))
+                                       for doc_id, info in documents))
+    return len(documents)
+
+def _open_search_index():
+    """
+    Returns a context manager opening the search index as one transaction, after rebuilding
+    the index if it does not exist yet. Queries read only the posting lists of their terms.
+    """
+    _ensure_docs_dir_exists()
+    with index_store.open_index(_get_index_path()) as conn:
+        built = index_store.is_built(conn)
+    if not built:
+        with _writer_lock():
+            with index_store.open_index(_get_index_path()) as conn:
+                built = index_store.is_built(conn) # Another writer may have rebuilt it meanwhile
+            if not built:
+                rebuild_search_index()
+    return index_store.open_index(_get_index_path())
+
+def _get_filename_trigrams_path():
+    return os.path.join(PROJECT_ROOT_DOCS_DIR, FILENAME_TRIGRAMS_FILENAME)
+
+def rebuild_filename_trigrams():
+    """
+    Rebuilds the filename trigram index from the catalog. Used automatically when it is missing,
+    outdated or unreadable.
+
+    Returns:
+        int: Number of indexed documents.
+    """
+    with _writer_lock():
+        with _open_catalog() as conn:
+            filenames = [(doc_id, info.get("original_filename", doc_id)) for doc_id, info in doc_catalog.iter_documents(conn)]
+        with trigram_index.open_index(_get_filename_trigrams_path()) as conn:
+            trigram_index.rebuild(conn, filenames)
+    return len(filenames)
+
+def _open_filename_trigrams():
+    """
+    Returns a context manager opening the filename trigram index as one transaction, after
+    rebuilding the index if it does not exist yet.
+    """
     _ensure_docs_dir_exists()
-    with open(PROJECT_ROOT_KB_METADATA_PATH, 'w') as f:
-        json.dump(metadata, f, indent=4)
+    with trigram_index.open_index(_get_filename_trigrams_path()) as conn:
+        built = trigram_index.is_built(conn)
+    if not built:
+        with _writer_lock():
+            with trigram_index.open_index(_get_filename_trigrams_path()) as conn:
+                built = trigram_index.is_built(conn) # Another writer may have rebuilt it meanwhile
+            if not built:
+                rebuild_filename_trigrams()
+    return trigram_index.open_index(_get_filename_trigrams_path())
+
+def _build_metadata_entry(filename, destination_path, content_hash, compression=None, original_size=None):
+    """Builds the metadata record of a document stored at destination_path."""
+    stat = os.stat(destination_path)
+    entry = {
+        "original_filename": filename,
+        "path_in_kb": destination_path, # Storing the path within the KB structure
+        "import_date": datetime.now().isoformat(),
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns, # With size_bytes, lets refresh_documents detect out-of-band edits
+        "file_type": os.path.splitext(filename)[1].lower(),
+        "content_hash": content_hash
+    }
+    if compression:
+        # size_bytes stays the document's own size; the stored (compressed) size is kept for refresh
+        entry.update(size_bytes=original_size, stored_size_bytes=stat.st_size, compression=compression)
+    return entry
+
+def _stored_size(info):
+    """Size of the stored file as recorded in the catalog (compressed size for compressed documents)."""
+    return info.get("stored_size_bytes", info.get("size_bytes"))
 
 def add_document(file_path):
     """
@@ -51,43 +233,284 @@ def add_document(file_path):
         bool: True if successful, False otherwise.
         str: Message indicating success or failure.
     """
-    _ensure_docs_dir_exists()
-    if not os.path.exists(file_path):
-        return False, f"Error: Source file '{file_path}' not found."
+    result = add_documents([file_path])[0]
+    return result["success"], result["message"]
 
-    if not os.path.isfile(file_path):
-        return False, f"Error: Source '{file_path}' is not a file."
+def _ingest_worker(file_path, objects_dir, cache_dir, compression=None):
+    """
+    Stores one document in the content-addressed store, extracts and caches its text and computes its term positions.
+    Content that is already stored is not copied again and its cached text is reused.
+    May run in a worker process (see ingest_documents), so it never touches the catalog or the
+    index; the caller commits its results.
 
+    Returns:
+        tuple: (metadata entry, term positions, deduplicated flag) of the document.
+    """
     filename = os.path.basename(file_path)
-    destination_path = os.path.join(PROJECT_ROOT_DOCS_DIR, filename)
+    file_type = os.path.splitext(filename)[1].lower()
+    # Content already stored with another compression method is reused, and then keeps that method
+    content_hash, object_path, created, compression = content_store.store_file(objects_dir, file_path, file_type, compression)
+    try:
+        info = _build_metadata_entry(filename, object_path, content_hash, compression, os.path.getsize(file_path))
+        if created:
+            text = _extract_text(object_path, file_type, compression)
+            # The cache key hashes the stored bytes, which differ from the content hash when compressed
+            text_cache.store_text(cache_dir, content_hash, object_path, text,
+                                  content_hash=None if compression else content_hash)
+        else:
+            text = text_cache.get_cached_text(cache_dir, content_hash, object_path,
+                                              lambda path: _extract_text(path, file_type, compression))
+        return info, doc_index.term_positions(text), not created
+    except Exception:
+        if created:
+            content_store.remove_object(object_path) # Leave no unreferenced blob behind
+        raise
+
+def _expand_sources(paths_or_directory):
+    """Turns a directory path, a single path or a list of paths into a flat list of paths (directories are expanded, non-recursively)."""
+    if isinstance(paths_or_directory, str):
+        paths_or_directory = [paths_or_directory]
+    file_paths = []
+    for path in paths_or_directory:
+        if os.path.isdir(path):
+            file_paths.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                              if os.path.isfile(os.path.join(path, f)))
+        else:
+            file_paths.append(path)
+    return file_paths
+
+def _ingest_batch(file_paths, executor, progress_callback):
+    """
+    Shared implementation of add_documents and ingest_documents.
+    Files are processed inline when executor is None, otherwise submitted to it.
+    The catalog and the search index are written once, after all files are processed.
 
-    if os.path.exists(destination_path):
-        # Simple conflict resolution: append a timestamp or number if desired
-        # For now, we'll just indicate it already exists.
-        # A more robust solution might involve versioning or unique naming.
-        return False, f"Error: Document '{filename}' already exists in the knowledge base."
+    Extraction runs without any lock; the commit takes the writer lock and re-validates the
+    prepared entries against what other sessions committed in the meantime (optimistic commit):
+    names claimed by another session are rejected and blobs removed meanwhile are stored again.
+    """
+    _ensure_docs_dir_exists()
+    total = len(file_paths)
+    results = [None] * total
+    done = 0
+
+    def record(position, success, message):
+        nonlocal done
+        file_path = file_paths[position]
+        results[position] = {"file_path": file_path, "doc_id": os.path.basename(file_path),
+                             "success": success, "message": message}
+        done += 1
+        if progress_callback:
+            progress_callback(done, total, results[position])
+
+    with _open_catalog() as conn:
+        existing = doc_catalog.existing_ids(conn, (os.path.basename(p) for p in file_paths))
+    jobs = [] # positions of the files to ingest
+    claimed = set()
+    for position, file_path in enumerate(file_paths):
+        filename = os.path.basename(file_path)
+        if not os.path.exists(file_path):
+            record(position, False, f"Error: Source file '{file_path}' not found.")
+        elif not os.path.isfile(file_path):
+            record(position, False, f"Error: Source '{file_path}' is not a file.")
+        elif filename in existing or filename in claimed:
+            # Documents are identified by filename, so a second document with the same name is rejected.
+            # Identical content under a different name is accepted and deduplicated by the content store.
+            record(position, False, f"Error: Document '{filename}' already exists in the knowledge base.")
+        else:
+            claimed.add(filename)
+            jobs.append(position)
+
+    ingested = {} # doc_id -> (metadata entry, term positions, position in file_paths)
+    def finish(position, outcome, error):
+        filename = os.path.basename(file_paths[position])
+        if error is None:
+            info, positions, deduplicated = outcome
+            ingested[filename] = (info, positions, position)
+            note = " (identical content already stored, not copied again)" if deduplicated else ""
+            record(position, True, f"Document '{filename}' added successfully to the knowledge base.{note}")
+        else:
+            record(position, False, f"Error adding document '{filename}': {error}")
+
+    objects_dir, cache_dir = _get_objects_dir(), _get_text_cache_dir()
+    if executor is None:
+        for position in jobs:
+            try:
+                finish(position, _ingest_worker(file_paths[position], objects_dir, cache_dir, DOCUMENT_COMPRESSION), None)
+            except Exception as e:
+                finish(position, None, e)
+    else:
+        futures = {executor.submit(_ingest_worker, file_paths[position], objects_dir, cache_dir, DOCUMENT_COMPRESSION): position
+                   for position in jobs}
+        for future in as_completed(futures):
+            try:
+                finish(futures[future], future.result(), None)
+            except Exception as e:
+                finish(futures[future], None, e)
+
+    if ingested:
+        with _writer_lock():
+            with _open_catalog() as conn:
+                for doc_id in doc_catalog.existing_ids(conn, ingested):
+                    position = ingested.pop(doc_id)[2]
+                    results[position].update(success=False,
+                                             message=f"Error: Document '{doc_id}' already exists in the knowledge base.")
+            for doc_id, (info, positions, position) in ingested.items():
+                if not os.path.exists(info["path_in_kb"]): # Last reference removed by another session meanwhile
+                    _, object_path, _, compression = content_store.store_file(objects_dir, file_paths[position],
+                                                                              info["file_type"], info.get("compression"))
+                    if object_path != info["path_in_kb"]: # Stored meanwhile with another compression method
+                        info = _build_metadata_entry(info["original_filename"], object_path, info["content_hash"],
+                                                     compression, os.path.getsize(file_paths[position]))
+                        ingested[doc_id] = (info, positions, position)
+            with _open_catalog() as conn:
+                doc_catalog.put_documents(conn, {doc_id: entry[0] for doc_id, entry in ingested.items()})
+            with _open_search_index() as conn: # Only the postings of the new documents are written
+                for doc_id, (info, positions, position) in ingested.items():
+                    index_store.add_term_positions(conn, doc_id, positions)
+            with _open_filename_trigrams() as conn:
+                for doc_id, (info, positions, position) in ingested.items():
+                    trigram_index.add(conn, doc_id, info["original_filename"])
+    return results
+
+def add_documents(paths_or_directory, progress_callback=None):
+    """
+    Adds a batch of documents in the current process.
+    Files are hashed and copied with streaming reads into the content-addressed store; the catalog and the search index are written
+    once for the whole batch instead of once per file. A failing file never aborts the batch.
 
-    try:
-        shutil.copy(file_path, destination_path)
-        metadata = _load_metadata()
-
-        doc_id = filename # Using filename as ID for simplicity; could be a UUID
-        metadata[doc_id] = {
-            "original_filename": filename,
-            "path_in_kb": destination_path, # Storing the path within the KB structure
-            "import_date": datetime.now().isoformat(),
-            "size_bytes": os.path.getsize(destination_path),
-            "file_type": os.path.splitext(filename)[1].lower()
-        }
-        _save_metadata(metadata)
-        return True, f"Document '{filename}' added successfully to the knowledge base."
-    except Exception as e:
-        # Clean up if copy succeeded but metadata failed (optional)
-        if os.path.exists(destination_path):
-            # Check if it was the one we just copied before removing
-            # This check is basic; more robust would be to ensure it wasn't pre-existing from a race condition
-            pass # For now, leave it, as metadata is the source of truth for "managed" files
-        return False, f"Error adding document '{filename}': {e}"
+    Args:
+        paths_or_directory (str or list): A directory (all files directly inside it are added),
+                                          a single file path, or a list of paths.
+        progress_callback (callable, optional): Called as progress_callback(done, total, result)
+                                                after each file is processed.
+
+    Returns:
+        list: One result dict per file, in input order, with the keys
+              "file_path", "doc_id", "success" and "message".
+    """
+    return _ingest_batch(_expand_sources(paths_or_directory), None, progress_callback)
+
+def ingest_documents(paths_or_directory, max_workers=DEFAULT_INGEST_WORKERS, progress_callback=None):
+    """
+    Adds many documents in parallel. Copying, text extraction and term counting are spread
+    across a ProcessPoolExecutor; the catalog and the search index are written once at the end.
+    A failing file never aborts the batch, it is only reported as failed.
+
+    Args:
+        paths_or_directory (str or list): A directory, a single file path, or a list of paths.
+        max_workers (int, optional): Number of worker processes. Defaults to one per CPU.
+        progress_callback (callable, optional): Called as progress_callback(done, total, result)
+                                                after each file is processed.
+
+    Returns:
+        list: One result dict per file, in input order (see add_documents).
+    """
+    file_paths = _expand_sources(paths_or_directory)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return _ingest_batch(file_paths, executor, progress_callback)
+
+def _scan_stored_files(directories):
+    """Stats every file in the given directories with one os.scandir pass each. Returns {path: stat_result}."""
+    stats = {}
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        stats[entry.path] = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue # Whole directory gone: its documents are reported as missing
+    return stats
+
+def _readdress_changed_file(path, info):
+    """
+    Moves a content-addressed file that was edited in place to the address of its new content
+    (or drops it if that content is already stored, with any compression method).
+
+    Returns:
+        tuple: (new path, new content hash, compression method of the file at the new path).
+    """
+    compression = info.get("compression")
+    content_hash = content_store.compute_file_hash(path, compression)
+    if not info.get("content_hash"):
+        return path, None, compression # Stored before content addressing: keep the file where it is
+    existing = content_store.find_object(_get_objects_dir(), content_hash, info.get("file_type") or "", compression)
+    new_path, new_compression = existing or (content_store.get_object_path(
+        _get_objects_dir(), content_hash, (info.get("file_type") or "") + compression_codecs.get_suffix(compression)), compression)
+    if new_path != path:
+        if existing:
+            content_store.remove_object(path)
+        else:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.replace(path, new_path)
+            content_store.remove_object(path) # Only prunes the now possibly empty fan-out directory
+        text_cache.remove_cached_text(_get_text_cache_dir(), info["content_hash"])
+        if compression and os.path.exists(_get_decompressed_path(info)):
+            os.remove(_get_decompressed_path(info)) # Plain copy of the previous content
+    return new_path, content_hash, new_compression
+
+def refresh_documents():
+    """
+    Incrementally brings the catalog, text cache and search index in line with the stored files.
+    One os.scandir pass per storage directory compares every file's size and modification time
+    with the catalog; only changed files are re-extracted and re-indexed, and documents whose
+    file disappeared are dropped. Nothing is done for unchanged files.
+
+    Returns:
+        dict: {"checked": int, "changed": [doc_id, ...], "removed": [doc_id, ...]}
+    """
+    with _writer_lock():
+        with _open_catalog() as conn:
+            documents = list(doc_catalog.iter_documents(conn))
+        stats = _scan_stored_files({os.path.dirname(info.get("path_in_kb") or "") for doc_id, info in documents})
+
+        changed_by_path, removed = {}, []
+        for doc_id, info in documents:
+            path = info.get("path_in_kb")
+            stat = stats.get(path)
+            if stat is None:
+                removed.append(doc_id)
+            elif stat.st_size != _stored_size(info) or stat.st_mtime_ns != info.get("mtime_ns"):
+                changed_by_path.setdefault(path, []).append((doc_id, info)) # Deduplicated blobs change together
+        report = {"checked": len(documents), "changed": [], "removed": removed}
+        if not changed_by_path and not removed:
+            return report
+
+        updated, positions = {}, {}
+        for path, entries in changed_by_path.items():
+            new_path, content_hash, compression = _readdress_changed_file(path, entries[0][1])
+            stat = os.stat(new_path)
+            sizes = {"size_bytes": stat.st_size}
+            if compression:
+                with compression_codecs.open_stream(new_path, compression) as f:
+                    sizes = {"size_bytes": content_store.hash_stream(f)[1], "stored_size_bytes": stat.st_size,
+                             "compression": compression}
+            for doc_id, info in entries:
+                info = {key: value for key, value in info.items() if key not in ("stored_size_bytes", "compression")}
+                info.update(path_in_kb=new_path, mtime_ns=stat.st_mtime_ns, **sizes)
+                if content_hash:
+                    info["content_hash"] = content_hash
+                updated[doc_id] = info
+                positions[doc_id] = doc_index.term_positions(_get_cached_text(doc_id, info))
+                report["changed"].append(doc_id)
+        with _open_catalog() as conn:
+            doc_catalog.put_documents(conn, updated)
+            for doc_id in removed:
+                doc_catalog.delete_document(conn, doc_id)
+        with _open_search_index() as conn:
+            for doc_id, term_positions in positions.items():
+                index_store.add_term_positions(conn, doc_id, term_positions)
+            for doc_id in removed:
+                index_store.remove_from_index(conn, doc_id)
+        removed_info = dict(documents)
+        for doc_id in removed:
+            text_cache.remove_cached_text(_get_text_cache_dir(), _get_cache_name(doc_id, removed_info[doc_id]))
+        if removed:
+            with _open_filename_trigrams() as conn:
+                for doc_id in removed:
+                    trigram_index.remove(conn, doc_id)
+        return report
 
 def list_documents():
     """
@@ -97,15 +520,36 @@ def list_documents():
         list: A list of dictionaries, where each dictionary contains metadata of a document.
               Returns an empty list if no documents or metadata found.
     """
-    metadata = _load_metadata()
-    return [info for doc_id, info in metadata.items()]
+    with _open_catalog() as conn:
+        return [info for doc_id, info in doc_catalog.iter_documents(conn)]
+
+def find_documents(file_type=None, imported_after=None, imported_before=None, min_size=None, max_size=None):
+    """
+    Lists the documents matching all given filters, using the catalog's indexed columns.
+
+    Args:
+        file_type (str, optional): Extension including the dot, e.g. ".pdf".
+        imported_after (str, optional): ISO date/time; only documents imported at or after it.
+        imported_before (str, optional): ISO date/time; only documents imported before it.
+        min_size (int, optional): Minimum size in bytes.
+        max_size (int, optional): Maximum size in bytes.
+
+    Returns:
+        list: Metadata dicts of the matching documents.
+    """
+    with _open_catalog() as conn:
+        return [info for doc_id, info in doc_catalog.query_documents(
+            conn, file_type=file_type, imported_after=imported_after, imported_before=imported_before,
+            min_size=min_size, max_size=max_size)]
 
 
 def search_documents_by_keyword(keyword):
     """
-    Searches documents by keyword in their content (basic text search).
-    This is a very basic implementation and will be slow for large files or many documents.
-    It only searches plain text and PDF files (if PyPDF2 is available and integrated).
+    Searches documents by keyword in their content using the on-disk inverted index.
+    Documents are never opened at query time; only the posting lists of the keyword's words are read.
+    A multi-word keyword matches documents containing all of its words, each as a whole word or
+    the beginning of one ("planet" finds "planetary"), like search_notes.
+    Only plain text and PDF files (if PyPDF2 is available) have indexed content.
 
     Args:
         keyword (str): The keyword to search for. Case-insensitive.
@@ -116,51 +560,136 @@ def search_documents_by_keyword(keyword):
     if not keyword:
         return []
 
-    keyword = keyword.lower()
-    metadata = _load_metadata()
-    found_documents_info = []
+    with _open_search_index() as conn:
+        matches = index_store.lookup(conn, keyword, prefixes=True)
+    if not matches:
+        return []
+    with _open_catalog() as conn:
+        return list(doc_catalog.get_documents(conn, matches).values())
+
+def search_documents_query(query):
+    """
+    Searches documents with a boolean query evaluated on the positional index:
+    quoted phrases ("olivine abundance"), AND / OR / NOT (upper case), parentheses and
+    prefix terms (sulf*). Adjacent terms are ANDed. Documents are never opened.
+
+    Args:
+        query (str): The query, e.g. 'jarosite AND NOT Gale' or '"olivine abundance" OR pyrox*'.
 
-    for doc_id, info in metadata.items():
-        file_path_in_kb = info.get("path_in_kb")
-        file_type = info.get("file_type")
+    Returns:
+        list or None: Metadata dicts of the matching documents, or None if the query is malformed.
+        str: Message indicating success or the syntax error.
+    """
+    try:
+        with _open_search_index() as conn:
+            matches = index_store.search_query(conn, query or "")
+    except ValueError as e:
+        return None, f"Error: Invalid query: {e}"
+    if not matches:
+        return [], f"No documents match '{query}'."
+    with _open_catalog() as conn:
+        found = list(doc_catalog.get_documents(conn, matches).values())
+    return found, f"Found {len(found)} document(s) matching '{query}'."
+
+def search_documents_ranked(query, top_k=DEFAULT_SEARCH_TOP_K):
+    """
+    Ranked search: scores documents against a multi-word query with BM25 over the
+    term statistics stored in the search index and returns only the best top_k.
 
-        if not file_path_in_kb or not os.path.exists(file_path_in_kb):
-            # print(f"Warning: Document '{doc_id}' listed in metadata but not found at '{file_path_in_kb}'. Skipping.")
-            continue
+    Args:
+        query (str): One or more words. Case-insensitive.
+        top_k (int, optional): Maximum number of results. Defaults to DEFAULT_SEARCH_TOP_K.
 
-        try:
-            content_to_search = ""
-            if file_type == ".txt":
-                with open(file_path_in_kb, 'r', encoding='utf-8', errors='ignore') as f:
-                    content_to_search = f.read()
-            elif file_type == ".pdf":
-                try:
-                    import PyPDF2
-                    with open(file_path_in_kb, 'rb') as f:
-                        reader = PyPDF2.PdfReader(f)
-                        for page_num in range(len(reader.pages)):
-                            content_to_search += reader.pages[page_num].extract_text() or ""
-                except ImportError:
-                    # print(f"PyPDF2 library not found. Cannot search PDF: {doc_id}. Please install it (`pip install PyPDF2`)")
-                    pass # Silently skip if PyPDF2 not available, or log it.
-                except Exception as pdf_e:
-                    # print(f"Error reading PDF '{doc_id}': {pdf_e}")
-                    pass # Skip malformed PDFs
-
-            # Add more file types here if needed (e.g., .md, .json)
-            # For .json, .md, they can be treated like .txt for simple keyword search
-
-            if keyword in content_to_search.lower():
-                found_documents_info.append(info)
-        except Exception as e:
-            # print(f"Error processing file '{doc_id}' for search: {e}")
-            continue # Skip files that cause errors during search
+    Returns:
+        list: Metadata dicts of the best matching documents, best first, each with an added "score" key.
+    """
+    if not query:
+        return []
+    with _open_search_index() as conn:
+        ranked = index_store.rank_bm25(conn, query, top_k)
+    if not ranked:
+        return []
+    with _open_catalog() as conn:
+        found = doc_catalog.get_documents(conn, [doc_id for doc_id, score in ranked])
+    return [dict(found[doc_id], score=round(score, 4)) for doc_id, score in ranked if doc_id in found]
+
+def fuzzy_find_documents(query, limit=trigram_index.DEFAULT_FUZZY_LIMIT,
+                         min_similarity=trigram_index.DEFAULT_MIN_SIMILARITY, substring=False):
+    """
+    Finds documents whose filename matches query approximately, using a trigram index of the
+    filenames: fragments ("spectr" for "mars_spectra.txt") and misspellings still match.
 
-    return found_documents_info
+    Args:
+        query (str): Part of a filename, possibly misspelled.
+        limit (int, optional): Maximum number of results.
+        min_similarity (float, optional): Share of the query's trigrams a filename must contain (0..1).
+        substring (bool, optional): Only filenames containing query verbatim, anywhere in a word
+            ("pectr" for "mars_spectra.txt"), shortest first and with similarity 1.0.
+
+    Returns:
+        list: Metadata dicts of the matching documents with an added "similarity", best first.
+    """
+    with _open_filename_trigrams() as conn:
+        matches = trigram_index.search(conn, query, limit, min_similarity, substring)
+    if not matches:
+        return []
+    with _open_catalog() as conn:
+        documents = doc_catalog.get_documents(conn, [doc_id for doc_id, _ in matches])
+    return [dict(documents[doc_id], similarity=similarity) for doc_id, similarity in matches if doc_id in documents]
+
+def scan_document(doc_id_or_filename, keyword, max_hits=None):
+    """
+    Scans the stored file of a document for a substring in constant memory
+    (memory-mapped, chunked, case-insensitive; matches across chunk boundaries are found).
+    Intended for very large plain text files, where reading the whole file is not an option.
+
+    Args:
+        doc_id_or_filename (str): The ID or filename of the document.
+        keyword (str): Text to look for.
+        max_hits (int, optional): Stop after this many matches.
+
+    Returns:
+        list or None: Byte offsets of the matches, or None if the document or its file is missing.
+    """
+    with _open_catalog() as conn:
+        doc_info = doc_catalog.get_document(conn, doc_id_or_filename)
+    file_path_in_kb = doc_info.get("path_in_kb") if doc_info else None
+    if not keyword or not file_path_in_kb or not os.path.exists(file_path_in_kb):
+        return None
+    if not doc_info.get("compression"):
+        return text_scan.find_in_file(file_path_in_kb, keyword, max_hits=max_hits)
+    offsets = [] # Compressed: scanned through a streaming decompressor, offsets refer to the original bytes
+    with compression_codecs.open_stream(file_path_in_kb, doc_info["compression"]) as stream:
+        for offset in text_scan.iter_match_offsets(stream, keyword):
+            offsets.append(offset)
+            if max_hits is not None and len(offsets) >= max_hits:
+                break
+    return offsets
+
+def get_document_text(doc_id_or_filename):
+    """
+    Retrieves the extracted text of a document from the sidecar text cache.
+    The text is extracted only when the cache entry is missing or the file changed
+    (detected by size, modification time and content hash).
+
+    Args:
+        doc_id_or_filename (str): The ID or filename of the document.
+
+    Returns:
+        str or None: The extracted text, or None if the document is not in the knowledge base.
+    """
+    with _open_catalog() as conn:
+        doc_info = doc_catalog.get_document(conn, doc_id_or_filename)
+    if not doc_info:
+        return None
+    return _get_cached_text(doc_id_or_filename, doc_info)
 
 def get_document_path(doc_id_or_filename):
     """
     Retrieves the full path of a document in the knowledge base by its ID/filename.
+    For a compressed document this is a plain copy, decompressed (as a stream) on first request
+    into local_documents/.decompressed/ and reused afterwards; use open_document to read the
+    content without materializing it.
 
     Args:
         doc_id_or_filename (str): The ID or filename of the document.
@@ -168,15 +697,38 @@ def get_document_path(doc_id_or_filename):
     Returns:
         str or None: The full path to the document if found, else None.
     """
-    metadata = _load_metadata()
-    doc_info = metadata.get(doc_id_or_filename)
-    if doc_info:
-        return doc_info.get("path_in_kb")
-    return None
+    with _open_catalog() as conn:
+        doc_info = doc_catalog.get_document(conn, doc_id_or_filename)
+    if not doc_info:
+        return None
+    stored_path = doc_info.get("path_in_kb")
+    if not doc_info.get("compression") or not stored_path or not os.path.exists(stored_path):
+        return stored_path
+    plain_path = _get_decompressed_path(doc_info)
+    if not os.path.exists(plain_path):
+        os.makedirs(_get_decompressed_dir(), exist_ok=True)
+        tmp_path = f"{plain_path}.{os.getpid()}.tmp"
+        with compression_codecs.open_stream(stored_path, doc_info["compression"]) as fsrc, open(tmp_path, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, compression_codecs.STREAM_CHUNK_SIZE)
+        os.replace(tmp_path, plain_path)
+    return plain_path
+
+def open_document(doc_id_or_filename):
+    """
+    Opens the content of a document as a binary stream, decompressing it on the fly if it is
+    stored compressed. Returns None if the document or its file is missing.
+    """
+    with _open_catalog() as conn:
+        doc_info = doc_catalog.get_document(conn, doc_id_or_filename)
+    stored_path = doc_info.get("path_in_kb") if doc_info else None
+    if not stored_path or not os.path.exists(stored_path):
+        return None
+    return compression_codecs.open_stream(stored_path, doc_info.get("compression"))
 
 def remove_document(doc_id_or_filename):
     """
-    Removes a document from the knowledge base (deletes file and metadata entry).
+    Removes a document from the knowledge base (deletes its metadata entry, and the stored file
+    once no other document references the same content).
 
     Args:
         doc_id_or_filename (str): The ID or filename of the document to remove.
@@ -185,25 +737,37 @@ def remove_document(doc_id_or_filename):
         bool: True if successful, False otherwise.
         str: Message indicating success or failure.
     """
-    metadata = _load_metadata()
-    doc_info = metadata.get(doc_id_or_filename)
-
-    if not doc_info:
-        return False, f"Error: Document '{doc_id_or_filename}' not found in metadata."
+    with _writer_lock(): # The document is re-read under the lock
+        with _open_catalog() as conn:
+            doc_info = doc_catalog.get_document(conn, doc_id_or_filename)
 
-    file_path_in_kb = doc_info.get("path_in_kb")
+        if not doc_info:
+            return False, f"Error: Document '{doc_id_or_filename}' not found in metadata."
 
-    try:
-        if file_path_in_kb and os.path.exists(file_path_in_kb):
-            os.remove(file_path_in_kb)
+        file_path_in_kb = doc_info.get("path_in_kb")
 
-        # Remove from metadata
-        del metadata[doc_id_or_filename]
-        _save_metadata(metadata)
-
-        return True, f"Document '{doc_id_or_filename}' removed successfully."
-    except Exception as e:
-        return False, f"Error removing document '{doc_id_or_filename}': {e}"
+        try:
+            # Remove from the catalog
+            with _open_catalog() as conn:
+                doc_catalog.delete_document(conn, doc_id_or_filename)
+                still_referenced = doc_catalog.count_path_references(conn, file_path_in_kb) > 0
+
+            with _open_search_index() as conn:
+                index_store.remove_from_index(conn, doc_id_or_filename)
+            with _open_filename_trigrams() as conn:
+                trigram_index.remove(conn, doc_id_or_filename)
+
+            # Deduplicated content is shared: only drop the file and its cached text with the last reference
+            if not still_referenced:
+                if file_path_in_kb and os.path.exists(file_path_in_kb):
+                    content_store.remove_object(file_path_in_kb)
+                if doc_info.get("compression") and os.path.exists(_get_decompressed_path(doc_info)):
+                    os.remove(_get_decompressed_path(doc_info))
+                text_cache.remove_cached_text(_get_text_cache_dir(), _get_cache_name(doc_id_or_filename, doc_info))
+
+            return True, f"Document '{doc_id_or_filename}' removed successfully."
+        except Exception as e:
+            return False, f"Error removing document '{doc_id_or_filename}': {e}"
 
 if __name__ == '__main__':
     # Basic test and usage examples
@@ -273,4 +837,4 @@ if __name__ == '__main__':
     # if os.path.exists(test_pdf_file): # If it was created
     #     os.remove(test_pdf_file)
 
-    print("\nTest complete. Check the 'planetary_scientist_assistant/local_documents' directory and its metadata.json.")
+    print("\nTest complete. Check the 'planetary_scientist_assistant/local_documents' directory and its catalog.sqlite3.")
@@ -0,0 +1,70 @@
+# planetary_scientist_assistant/knowledge_base/file_lock.py
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows: advisory locks are unavailable, so locking degrades to a no-op
+    fcntl = None
+
+# Advisory inter-process locks for the knowledge base stores.
+# A store is guarded by "<path>.lock"; writers hold it for their read-modify-write commit, while
+# readers never lock: every store file is replaced atomically (temporary file + os.replace), so a
+# reader always sees either the previous or the next committed version.
+# Locks are re-entrant per thread, so a commit may call helpers that lock the same store again.
+# flock() locks belong to the open file, so other threads of the same process are excluded too.
+
+LOCK_SUFFIX = ".lock"
+
+_local = threading.local() # .held: lock_path -> [open lock file, depth] for the current thread
+
+
+def _held():
+    if not hasattr(_local, "held"):
+        _local.held = {}
+    return _local.held
+
+@contextmanager
+def locked(path):
+    """Holds the exclusive lock of the store at path for the duration of the block."""
+    lock_path = path + LOCK_SUFFIX
+    held = _held()
+    if lock_path in held:
+        held[lock_path][1] += 1
+        try:
+            yield
+        finally:
+            held[lock_path][1] -= 1
+        return
+    with open(lock_path, 'a') as lock_file: # Closing the file releases the lock
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        held[lock_path] = [lock_file, 1]
+        try:
+            yield
+        finally:
+            del held[lock_path]
+
+@contextmanager
+def try_locked(path):
+    """
+    Like locked(), but does not wait: yields True if the lock was acquired and False if another
+    process or thread holds it.
+    """
+    lock_path = path + LOCK_SUFFIX
+    if lock_path in _held():
+        with locked(path):
+            yield True
+        return
+    with open(lock_path, 'a') as lock_file:
+        if fcntl:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        _held()[lock_path] = [lock_file, 1]
+        try:
+            yield True
+        finally:
+            del _held()[lock_path]
@@ -0,0 +1,212 @@
+# planetary_scientist_assistant/knowledge_base/index_store.py
+import json
+import math
+import heapq
+from contextlib import contextmanager
+
+try:
+    from . import derived_db, doc_index
+except ImportError: # Running this file directly as a script
+    import derived_db
+    import doc_index
+
+# Inverted index kept in an SQLite file (see derived_db), used for documents and for notes.
+# Tables:
+#   postings (term, doc_id, tf)          one row per distinct term of a document, with its frequency
+#   positions (doc_id, term, positions)  JSON list of the term's token offsets in the document
+#   documents (doc_id, length)           number of tokens of every indexed document
+# The primary key (term, doc_id) keeps each posting list together and the terms sorted, so a
+# query reads only the posting lists of its own terms and a prefix query is a range scan of the
+# sorted terms (a binary search, not a pass over the vocabulary); the doc_id index lets a
+# document be replaced or removed without scanning the others. Keyword lookups and BM25 need
+# only postings and documents (frequencies, document frequencies and lengths); positions are
+# kept apart and read only by phrase queries, for the documents that contain every phrase word.
+# The number of documents and their total length (for BM25's average length) are kept in the
+# meta table and adjusted in the transaction that inserts or removes a document, so ranking never
+# scans the documents table.
+# Tokenization, BM25 parameters and the query language are shared with doc_index.
+
+INDEX_VERSION = 3
+
+_SCHEMA = (
+    "CREATE TABLE postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+    "PRIMARY KEY (term, doc_id)) WITHOUT ROWID",
+    "CREATE INDEX idx_postings_doc_id ON postings (doc_id)",
+    "CREATE TABLE positions (doc_id TEXT NOT NULL, term TEXT NOT NULL, positions TEXT NOT NULL, "
+    "PRIMARY KEY (doc_id, term)) WITHOUT ROWID",
+    "CREATE TABLE documents (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL)",
+)
+
+
+@contextmanager
+def open_index(index_path):
+    """Opens (creating it if needed) the index at index_path as a single transaction."""
+    with derived_db.open_db(index_path, _SCHEMA, INDEX_VERSION) as conn:
+        yield conn
+
+def is_built(conn):
+    """True once the index was filled by rebuild (False for a new, reset or unreadable file)."""
+    return bool(derived_db.get_meta(conn, "built"))
+
+def rebuild(conn, documents):
+    """
+    Replaces the whole content of the index and marks it built.
+
+    Args:
+        documents (iterable): (doc_id, term positions) pairs, see doc_index.term_positions.
+    """
+    for table in ("postings", "positions", "documents"):
+        conn.execute(f"DELETE FROM {table}")
+    derived_db.set_meta(conn, "document_count", 0)
+    derived_db.set_meta(conn, "total_length", 0)
+    for doc_id, positions in documents:
+        _insert(conn, doc_id, positions)
+    derived_db.set_meta(conn, "built", 1)
+
+def _insert(conn, doc_id, positions):
+    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                     [(term, doc_id, len(term_positions_list)) for term, term_positions_list in positions.items()])
+    conn.executemany("INSERT INTO positions VALUES (?, ?, ?)",
+                     [(doc_id, term, json.dumps(term_positions_list, separators=(",", ":")))
+                      for term, term_positions_list in positions.items()])
+    length = sum(len(p) for p in positions.values())
+    conn.execute("INSERT INTO documents VALUES (?, ?)", (doc_id, length))
+    _adjust_totals(conn, 1, length)
+
+def _adjust_totals(conn, documents, length):
+    derived_db.set_meta(conn, "document_count", derived_db.get_meta(conn, "document_count", 0) + documents)
+    derived_db.set_meta(conn, "total_length", derived_db.get_meta(conn, "total_length", 0) + length)
+
+def add_term_positions(conn, doc_id, positions):
+    """Indexes precomputed term positions of a document, replacing any previous entry for doc_id."""
+    remove_from_index(conn, doc_id)
+    _insert(conn, doc_id, positions)
+
+def add_to_index(conn, doc_id, text):
+    """Indexes the text of a document, replacing any previous entry for doc_id."""
+    add_term_positions(conn, doc_id, doc_index.term_positions(text))
+
+def remove_from_index(conn, doc_id):
+    """Drops every posting of doc_id. Returns True if the document was indexed."""
+    conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+    conn.execute("DELETE FROM positions WHERE doc_id = ?", (doc_id,))
+    row = conn.execute("SELECT length FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+    if not row:
+        return False
+    conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+    _adjust_totals(conn, -1, -row[0])
+    return True
+
+def _frequencies(conn, term):
+    """Returns the posting list of term as {doc_id: term frequency}."""
+    return dict(conn.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,)))
+
+def _prefix_frequencies(conn, prefix):
+    """Returns {doc_id: total frequency of the terms starting with prefix} (see _prefix_doc_ids)."""
+    return dict(conn.execute("SELECT doc_id, SUM(tf) FROM postings WHERE term >= ? AND term < ? GROUP BY doc_id",
+                             (prefix, prefix + "\U0010ffff")))
+
+def lookup(conn, keyword, prefixes=False):
+    """
+    Finds the documents containing every word of keyword.
+
+    Args:
+        prefixes (bool, optional): Match each word as the beginning of indexed words too
+            ("crat" finds "crater"), not only as a whole word.
+
+    Returns:
+        dict: doc_id -> total number of occurrences of the query words.
+    """
+    terms = doc_index.tokenize(keyword)
+    if not terms:
+        return {}
+    # Intersect starting from the rarest term so the working set stays small.
+    frequencies = _prefix_frequencies if prefixes else _frequencies
+    posting_lists = sorted((frequencies(conn, term) for term in set(terms)), key=len)
+    matches = dict(posting_lists[0])
+    for docs in posting_lists[1:]:
+        if not matches:
+            break
+        matches = {doc_id: count + docs[doc_id] for doc_id, count in matches.items() if doc_id in docs}
+    return matches
+
+def rank_bm25(conn, query, top_k=10):
+    """
+    Scores documents against a multi-term query with BM25, using only the index statistics.
+    Documents need not contain every query term; more (and rarer) matching terms score higher.
+    Only the top_k best results are kept, selected with a bounded heap.
+
+    Returns:
+        list: (doc_id, score) tuples, best first.
+    """
+    terms = set(doc_index.tokenize(query))
+    num_docs = derived_db.get_meta(conn, "document_count", 0)
+    total_length = derived_db.get_meta(conn, "total_length", 0)
+    if not terms or not num_docs or top_k <= 0:
+        return []
+    avg_length = (total_length / num_docs) or 1.0
+
+    scores = {}
+    for term in terms:
+        docs = conn.execute("SELECT p.doc_id, p.tf, d.length FROM postings AS p "
+                            "JOIN documents AS d ON d.doc_id = p.doc_id WHERE p.term = ?", (term,)).fetchall()
+        if not docs:
+            continue
+        doc_freq = len(docs)
+        idf = math.log(1.0 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        for doc_id, term_freq, length in docs:
+            norm = doc_index.BM25_K1 * (1.0 - doc_index.BM25_B + doc_index.BM25_B * length / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * term_freq * (doc_index.BM25_K1 + 1.0) / (term_freq + norm)
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+def _doc_ids(conn, term):
+    return {doc_id for (doc_id,) in conn.execute("SELECT doc_id FROM postings WHERE term = ?", (term,))}
+
+def _prefix_doc_ids(conn, prefix):
+    # Range scan of the sorted terms: prefix <= term < prefix followed by the highest code point
+    return {doc_id for (doc_id,) in conn.execute("SELECT DISTINCT doc_id FROM postings WHERE term >= ? AND term < ?",
+                                                 (prefix, prefix + "\U0010ffff"))}
+
+def _phrase_matches(conn, terms):
+    candidates = None
+    for term in set(terms): # Documents containing every word, from the postings alone
+        docs = _doc_ids(conn, term)
+        candidates = docs if candidates is None else candidates & docs
+        if not candidates:
+            return set()
+    placeholders = ", ".join("?" * len(set(terms)))
+    matches = set()
+    for doc_id in candidates: # Only now are positions read, for the candidates only
+        positions = {term: set(json.loads(term_positions_list)) for term, term_positions_list in conn.execute(
+            f"SELECT term, positions FROM positions WHERE doc_id = ? AND term IN ({placeholders})",
+            (doc_id, *set(terms)))}
+        if any(all(start + offset in positions[term] for offset, term in enumerate(terms[1:], 1))
+               for start in positions[terms[0]]):
+            matches.add(doc_id)
+    return matches
+
+def evaluate_query(conn, tree):
+    """Evaluates a query tree from doc_index.parse_query. Returns the set of matching document IDs."""
+    kind = tree[0]
+    if kind == "term":
+        return _doc_ids(conn, tree[1])
+    if kind == "prefix":
+        return _prefix_doc_ids(conn, tree[1])
+    if kind == "phrase":
+        return _phrase_matches(conn, tree[1])
+    if kind == "not":
+        return {doc_id for (doc_id,) in conn.execute("SELECT doc_id FROM documents")} - evaluate_query(conn, tree[1])
+    left = evaluate_query(conn, tree[1])
+    if kind == "and":
+        return left & evaluate_query(conn, tree[2]) if left else set()
+    return left | evaluate_query(conn, tree[2])
+
+def search_query(conn, query):
+    """
+    Parses and evaluates a boolean/phrase/prefix query, e.g.
+    '"olivine abundance"', 'jarosite AND NOT Gale', 'sulf* OR (clay AND water)'.
+
+    Raises:
+        ValueError: If the query is malformed.
+    """
+    return evaluate_query(conn, doc_index.parse_query(query))
@@ -0,0 +1,88 @@
+# planetary_scientist_assistant/knowledge_base/kb_query.py
+import heapq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from . import document_manager, note_taker
+except ImportError: # Running this file directly as a script
+    import document_manager
+    import note_taker
+
+# One query over the whole knowledge base: documents and notes are searched concurrently on a
+# thread pool, each source with BM25 ranking over its own index, and every hit is tagged with
+# the source it came from. Results can be consumed as they arrive (stream_knowledge_base) or
+# as one merged list ranked by score (search_knowledge_base).
+# Raw BM25 scores depend on each corpus (its size, average length and term frequencies), so they
+# are not comparable across sources: every source divides its scores by its own best score
+# before the merge. The raw value is kept as "bm25_score".
+
+SOURCE_DOCUMENT = "document"
+SOURCE_NOTE = "note"
+DEFAULT_TOP_K = 10
+
+
+def _normalized(hits):
+    # Hits of one source, best first; scores become relative to the best one (1.0)
+    best = max((hit["score"] for hit in hits), default=0)
+    for hit in hits:
+        hit["bm25_score"] = hit["score"]
+        hit["score"] = round(hit["score"] / best, 4) if best > 0 else 0.0
+    return hits
+
+def _search_documents(query, project_base_path, top_k):
+    # Documents are identified by their file name in the knowledge base
+    return _normalized([dict(doc, source=SOURCE_DOCUMENT, title=doc.get("original_filename"),
+                             id=doc.get("original_filename"))
+                        for doc in document_manager.search_documents_ranked(query, top_k=top_k)])
+
+def _search_notes(query, project_base_path, top_k):
+    return _normalized([dict(note, source=SOURCE_NOTE)
+                        for note in note_taker.search_notes_ranked(query, project_base_path, top_k)])
+
+_SOURCES = {SOURCE_DOCUMENT: _search_documents, SOURCE_NOTE: _search_notes}
+
+
+def stream_knowledge_base(query, project_base_path, top_k=DEFAULT_TOP_K, sources=None):
+    """
+    Searches documents and notes concurrently and yields hits as soon as each source answers.
+
+    Args:
+        query (str): One or more words. Case-insensitive.
+        project_base_path (str): Base path of the project (locates the notes).
+        top_k (int, optional): Maximum number of hits per source.
+        sources (iterable, optional): Subset of SOURCE_DOCUMENT / SOURCE_NOTE. Defaults to both.
+
+    Yields:
+        dict: Metadata of a document or note, with added "source", "id", "title", "score"
+              (relative to the best hit of the same source, 0..1) and "bm25_score".
+              Hits of one source arrive together, best first.
+    """
+    sources = list(sources or _SOURCES)
+    unknown = [source for source in sources if source not in _SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)}.")
+    if not query or top_k <= 0:
+        return
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = [executor.submit(_SOURCES[source], query, project_base_path, top_k) for source in sources]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def search_knowledge_base(query, project_base_path, top_k=DEFAULT_TOP_K, sources=None, on_result=None):
+    """
+    Searches documents and notes concurrently and merges the hits into one ranked list.
+
+    Args:
+        on_result (callable, optional): Called with every hit as it arrives, before the merge.
+        Other arguments are as for stream_knowledge_base.
+
+    Returns:
+        list: The best top_k hits across all sources, best first, each tagged with "source".
+    """
+    hits = []
+    for hit in stream_knowledge_base(query, project_base_path, top_k, sources):
+        if on_result:
+            on_result(hit)
+        hits.append(hit)
+    # Each source's best hit scores 1.0; ties are broken by the raw score so the order is stable
+    return heapq.nlargest(top_k, hits, key=lambda hit: (hit["score"], hit["bm25_score"]))
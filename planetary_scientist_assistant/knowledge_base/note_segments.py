@@ -0,0 +1,149 @@
+# planetary_scientist_assistant/knowledge_base/note_segments.py
+import os
+import threading
+
+# Packed storage for note contents.
+# Instead of one file per note, contents are appended to a few large segment files:
+#   local_notes/segments/000001.seg, 000002.seg, ...
+# A note's metadata records where its content lives (segment name, byte offset, byte length),
+# so the metadata doubles as the offset index and a read is a single seek + read.
+# Updating or deleting a note leaves its old bytes behind as dead space; compaction copies the
+# live contents of mostly-dead segments into a fresh segment and deletes the old ones.
+
+SEGMENTS_DIRNAME = "segments"
+SEGMENT_SUFFIX = ".seg"
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024 # Start a new segment once the current one reaches 16 MiB
+COMPACT_DEAD_RATIO = 0.5 # Compact a segment once at least half of it is dead space...
+COMPACT_MIN_DEAD_BYTES = 64 * 1024 # ...and the dead space is worth reclaiming
+
+_lock = threading.Lock() # Serializes appends within this process
+
+
+def _segment_number(name):
+    return int(name[:-len(SEGMENT_SUFFIX)])
+
+def _segment_name(number):
+    return f"{number:06d}{SEGMENT_SUFFIX}"
+
+def list_segments(segments_dir):
+    """Returns the segment file names in creation order."""
+    try:
+        names = [name for name in os.listdir(segments_dir)
+                 if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()]
+    except FileNotFoundError:
+        return []
+    return sorted(names, key=_segment_number)
+
+def _next_segment_name(segments_dir):
+    segments = list_segments(segments_dir)
+    return _segment_name(_segment_number(segments[-1]) + 1 if segments else 1)
+
+def _write(segment_path, data):
+    with open(segment_path, 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+    return offset
+
+def append(segments_dir, data):
+    """
+    Appends data to the current segment (starting a new one when it is full).
+
+    Returns:
+        tuple: (segment_name, offset, length) locating the data.
+    """
+    return append_many(segments_dir, [data])[0]
+
+def append_many(segments_dir, items):
+    """
+    Appends several contents with one open() per segment written, starting a new segment
+    whenever the current one is full.
+
+    Returns:
+        list: (segment_name, offset, length) for every item, in order.
+    """
+    os.makedirs(segments_dir, exist_ok=True)
+    locations = []
+    with _lock:
+        segments = list_segments(segments_dir)
+        name = segments[-1] if segments else _next_segment_name(segments_dir)
+        f = open(os.path.join(segments_dir, name), 'ab')
+        try:
+            offset = f.tell()
+            for data in items:
+                if offset >= SEGMENT_MAX_BYTES:
+                    f.close()
+                    name = _segment_name(_segment_number(name) + 1)
+                    f = open(os.path.join(segments_dir, name), 'ab')
+                    offset = f.tell()
+                f.write(data)
+                locations.append((name, offset, len(data)))
+                offset += len(data)
+        finally:
+            f.close()
+    return locations
+
+def read(segments_dir, segment_name, offset, length):
+    """Reads length bytes at offset from a segment. Returns None if the segment is gone."""
+    try:
+        with open(os.path.join(segments_dir, segment_name), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+    except FileNotFoundError:
+        return None
+
+def dead_bytes(segments_dir, locations):
+    """
+    Returns {segment_name: (segment size, dead bytes)} for every segment.
+
+    Args:
+        locations (iterable): (segment_name, offset, length) of every live content.
+    """
+    live = {}
+    for segment_name, _, length in locations:
+        live[segment_name] = live.get(segment_name, 0) + length
+    stats = {}
+    for name in list_segments(segments_dir):
+        size = os.path.getsize(os.path.join(segments_dir, name))
+        stats[name] = (size, max(size - live.get(name, 0), 0))
+    return stats
+
+def segments_to_compact(segments_dir, locations):
+    """Returns the names of the segments whose dead space crossed the compaction thresholds."""
+    return [name for name, (size, dead) in dead_bytes(segments_dir, locations).items()
+            if size and dead >= COMPACT_MIN_DEAD_BYTES and dead >= size * COMPACT_DEAD_RATIO]
+
+def compact(segments_dir, live, segment_names):
+    """
+    Copies the live contents of the given segments into a new segment.
+    The old segments are NOT deleted here: the caller first records the new locations and then
+    calls remove_segments(), so a crash in between only leaves unreferenced (dead) bytes behind.
+
+    Args:
+        live (dict): key -> (segment_name, offset, length) of every live content.
+        segment_names (list): Segments to rewrite.
+
+    Returns:
+        dict: key -> (segment_name, offset, length) for every moved content.
+    """
+    doomed = set(segment_names)
+    moving = sorted(((loc, key) for key, loc in live.items() if loc[0] in doomed),
+                    key=lambda item: (_segment_number(item[0][0]), item[0][1]))
+    moved = {}
+    if not moving:
+        return moved
+    with _lock:
+        target = _next_segment_name(segments_dir)
+        target_path = os.path.join(segments_dir, target)
+        for (segment_name, offset, length), key in moving:
+            data = read(segments_dir, segment_name, offset, length)
+            if data is None:
+                continue
+            moved[key] = (target, _write(target_path, data), len(data))
+    return moved
+
+def remove_segments(segments_dir, segment_names):
+    for name in segment_names:
+        try:
+            os.remove(os.path.join(segments_dir, name))
+        except FileNotFoundError:
+            pass
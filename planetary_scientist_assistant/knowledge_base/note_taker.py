@@ -2,11 +2,55 @@
 import os
 import json
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    from . import compression as compression_codecs
+    from . import derived_db, doc_index, file_lock, index_store, note_segments, notes_journal, notes_order, trigram_index
+except ImportError: # Running this file directly as a script
+    import compression as compression_codecs
+    import derived_db
+    import doc_index
+    import file_lock
+    import index_store
+    import note_segments
+    import notes_journal
+    import notes_order
+    import trigram_index
+
 NOTES_SUBDIR_NAME = "local_notes"
 NOTES_METADATA_FILENAME = "notes_metadata.json"
 NOTES_CONTENT_DIR_NAME = "content"
+NOTES_INDEX_FILENAME = "notes_index.sqlite3"
+NOTES_TITLE_TRIGRAMS_FILENAME = "notes_title_trigrams.sqlite3"
+
+# Where new note contents are written: "files" (one <id>.txt per note in content/) or
+# "packed" (appended to segment files, see note_segments). Existing notes stay readable in
+# either mode, since each note's metadata records where its content lives.
+STORAGE_FILES = "files"
+STORAGE_PACKED = "packed"
+NOTES_STORAGE_MODE = STORAGE_FILES
+# Compression of new note contents in either mode: None, "zlib" or "lzma" (see compression.py).
+# Recorded per note as "content_compression", so reading is transparent.
+NOTES_COMPRESSION = None
+
+DEFAULT_SEARCH_TOP_K = 10 # Number of results returned by ranked search
+IMPORT_BATCH_SIZE = 500 # Notes committed together by import_notes
+NOTE_IMPORT_EXTENSIONS = (".txt",)
+
+# Note metadata is persisted as a snapshot (notes_metadata.json) plus an append-only journal of
+# add/modify/delete records (see notes_journal). Mutations append one record instead of rewriting
+# the whole file; loads are cached in-process and shared by all read paths (do not mutate them).
+# Three derived SQLite databases (see derived_db) are maintained in place by add/update/delete,
+# each change writing only the rows of the notes it touches, and rebuilt whenever they are
+# missing, unreadable or older than the metadata (each records the metadata change time it
+# reflects): a full-text index of titles and contents (an index_store like the documents'), so
+# searches never open note files, the listing sort orders (see notes_order), so pages of the
+# listing are index ranges instead of full sorts, and a trigram index of titles (see
+# trigram_index) for fuzzy title search.
+# Writers (including rebuilds of derived files) hold the store's file lock, so several CLI
+# sessions or scripts can add and edit notes concurrently; readers never wait for it.
 
 def get_project_notes_dir(project_base_path):
     return os.path.join(project_base_path, NOTES_SUBDIR_NAME)
@@ -17,6 +61,18 @@ def get_notes_metadata_path(project_base_path):
 def get_notes_content_dir(project_base_path):
     return os.path.join(get_project_notes_dir(project_base_path), NOTES_CONTENT_DIR_NAME)
 
+def get_notes_index_path(project_base_path):
+    return os.path.join(get_project_notes_dir(project_base_path), NOTES_INDEX_FILENAME)
+
+def get_notes_order_path(project_base_path):
+    return os.path.join(get_project_notes_dir(project_base_path), notes_order.ORDER_FILENAME)
+
+def get_notes_title_trigrams_path(project_base_path):
+    return os.path.join(get_project_notes_dir(project_base_path), NOTES_TITLE_TRIGRAMS_FILENAME)
+
+def get_notes_segments_dir(project_base_path):
+    return os.path.join(get_project_notes_dir(project_base_path), note_segments.SEGMENTS_DIRNAME)
+
 def _ensure_notes_dirs_exist(notes_dir, content_dir, metadata_path):
     os.makedirs(notes_dir, exist_ok=True)
     os.makedirs(content_dir, exist_ok=True)
@@ -25,51 +81,312 @@ def _ensure_notes_dirs_exist(notes_dir, content_dir, metadata_path):
             json.dump({}, f)
 
 def _load_notes_metadata(metadata_path):
-    if not os.path.exists(metadata_path):
-        return {}
+    return notes_journal.load_metadata(metadata_path)
+
+def _segment_location(note_info):
+    return (note_info["content_segment"], note_info["content_offset"], note_info["content_length"])
+
+def _encode_content(content, compression):
+    return compression_codecs.compress_bytes(content.encode('utf-8'), compression)
+
+def _read_note_content(project_base_path, note_info):
+    if not note_info: return None
+    compression = note_info.get("content_compression")
+    if note_info.get("content_segment"):
+        data = note_segments.read(get_notes_segments_dir(project_base_path), *_segment_location(note_info))
+        return compression_codecs.decompress_bytes(data, compression).decode('utf-8') if data is not None else None
+    if not note_info.get("content_filename"): return None
+    note_content_filepath = os.path.join(get_notes_content_dir(project_base_path), note_info["content_filename"])
+    if not os.path.exists(note_content_filepath): return None
     try:
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if not content: return {}
-            return json.loads(content)
-    except (IOError, json.JSONDecodeError):
-        return {}
+        if compression:
+            with open(note_content_filepath, 'rb') as f:
+                return compression_codecs.decompress_bytes(f.read(), compression).decode('utf-8')
+        with open(note_content_filepath, 'r', encoding='utf-8') as f: return f.read()
+    except IOError: return None
 
-def _save_notes_metadata(metadata_path, metadata):
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=4)
+def _is_synced(project_base_path, conn):
+    # A derived database is current if it reflects the newest metadata change
+    synced = derived_db.get_meta(conn, "metadata_mtime_ns")
+    return synced is not None and \
+        synced >= notes_journal.last_modified_ns(get_notes_metadata_path(project_base_path))
 
-def add_note(title, content, project_base_path):
+def _mark_synced(project_base_path, conn):
+    # Called in the transaction that applies the changes just journaled
+    derived_db.set_meta(conn, "metadata_mtime_ns", notes_journal.last_modified_ns(get_notes_metadata_path(project_base_path)))
+
+def _index_text(note_info, content):
+    return f"{note_info.get('title', '')}\n{content}"
+
+def _rebuild_notes_index(project_base_path, conn):
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    index_store.rebuild(conn, ((note_id, doc_index.term_positions(
+                                   _index_text(note_info, _read_note_content(project_base_path, note_info) or "")))
+                               for note_id, note_info in metadata.items()))
+    return len(metadata)
+
+def _rebuild_notes_order(project_base_path, conn):
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    notes_order.rebuild(conn, metadata)
+    return len(metadata)
+
+def _rebuild_title_trigrams(project_base_path, conn):
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    trigram_index.rebuild(conn, ((note_id, note_info.get("title", "")) for note_id, note_info in metadata.items()))
+    return len(metadata)
+
+def _derived_stores(project_base_path):
+    # (path, open function, rebuild function) of every derived database
+    return ((get_notes_index_path(project_base_path), index_store.open_index, _rebuild_notes_index),
+            (get_notes_order_path(project_base_path), notes_order.open_order, _rebuild_notes_order),
+            (get_notes_title_trigrams_path(project_base_path), trigram_index.open_index, _rebuild_title_trigrams))
+
+def _rebuild(project_base_path, path, open_func, rebuild_func):
+    with open_func(path) as conn:
+        count = rebuild_func(project_base_path, conn)
+        _mark_synced(project_base_path, conn)
+        return count
+
+def rebuild_notes_index(project_base_path):
+    """Rebuilds the full-text index of the notes from scratch. Returns the number of indexed notes."""
+    with file_lock.locked(get_notes_metadata_path(project_base_path)):
+        return _rebuild(project_base_path, *_derived_stores(project_base_path)[0])
+
+def rebuild_notes_order(project_base_path):
+    """Rebuilds the persisted sort orders of the notes. Returns the number of notes."""
+    with file_lock.locked(get_notes_metadata_path(project_base_path)):
+        return _rebuild(project_base_path, *_derived_stores(project_base_path)[1])
+
+def rebuild_title_trigrams(project_base_path):
+    """Rebuilds the trigram index of note titles. Returns the number of indexed notes."""
+    with file_lock.locked(get_notes_metadata_path(project_base_path)):
+        return _rebuild(project_base_path, *_derived_stores(project_base_path)[2])
+
+def _sync_derived(project_base_path, path, open_func, rebuild_func):
+    # Rebuilt when missing, unreadable or older than the newest metadata change. Checking never
+    # locks; a rebuild is a write and takes the store lock like any other writer.
+    with open_func(path) as conn:
+        if _is_synced(project_base_path, conn):
+            return
+    with file_lock.locked(get_notes_metadata_path(project_base_path)):
+        with open_func(path) as conn:
+            if not _is_synced(project_base_path, conn): # Not rebuilt by another writer while we waited
+                rebuild_func(project_base_path, conn)
+                _mark_synced(project_base_path, conn)
+
+def _open_derived(project_base_path, path, open_func, rebuild_func):
+    # Returns a context manager opening an up-to-date derived database as one transaction
+    if not os.path.isdir(get_project_notes_dir(project_base_path)):
+        return open_func(":memory:") # No notes yet: empty, nothing to persist
+    _sync_derived(project_base_path, path, open_func, rebuild_func)
+    return open_func(path)
+
+def _open_notes_index(project_base_path):
+    return _open_derived(project_base_path, *_derived_stores(project_base_path)[0])
+
+def _open_notes_order(project_base_path):
+    return _open_derived(project_base_path, *_derived_stores(project_base_path)[1])
+
+def _open_title_trigrams(project_base_path):
+    return _open_derived(project_base_path, *_derived_stores(project_base_path)[2])
+
+def _sync_derived_files(project_base_path):
+    # Writers bring every derived database up to date before the journal moves ahead of them
+    for store in _derived_stores(project_base_path):
+        _sync_derived(project_base_path, *store)
+
+@contextmanager
+def _updating_derived(project_base_path):
+    # Opens the derived databases to apply the changes just journaled, as (index, order, titles);
+    # each is marked synced in the transaction carrying its changes
+    (index_path, _, _), (order_path, _, _), (titles_path, _, _) = _derived_stores(project_base_path)
+    with index_store.open_index(index_path) as index, notes_order.open_order(order_path) as order, \
+            trigram_index.open_index(titles_path) as titles:
+        yield index, order, titles
+        for conn in (index, order, titles):
+            _mark_synced(project_base_path, conn)
+
+def _touch_derived(project_base_path):
+    # After journaling changes that leave titles, contents and dates alone (content moves),
+    # marks the derived databases as current again so they are not needlessly rebuilt.
+    with _updating_derived(project_base_path):
+        pass
+
+def _append_to_segment(project_base_path, content, compression=None):
+    segment_name, offset, length = note_segments.append(get_notes_segments_dir(project_base_path),
+                                                        _encode_content(content, compression))
+    return {"content_segment": segment_name, "content_offset": offset, "content_length": length}
+
+def _compact_segments_if_needed(project_base_path, metadata_path):
+    # Rewrites mostly-dead segments; the moves are journaled before the old segments are removed
+    segments_dir = get_notes_segments_dir(project_base_path)
+    live = {note_id: _segment_location(info) for note_id, info in _load_notes_metadata(metadata_path).items()
+            if info.get("content_segment")}
+    doomed = note_segments.segments_to_compact(segments_dir, live.values())
+    if not doomed: return
+    _sync_derived_files(project_base_path) # Bring up to date before touching
+    moved = note_segments.compact(segments_dir, live, doomed)
+    notes_journal.append_records(metadata_path, [
+        {"op": "modify", "id": note_id,
+         "changes": {"content_segment": segment_name, "content_offset": offset, "content_length": length}}
+        for note_id, (segment_name, offset, length) in moved.items()])
+    _touch_derived(project_base_path)
+    note_segments.remove_segments(segments_dir, doomed)
+
+def _write_note_file(path, content, compression):
+    if compression:
+        with open(path, 'wb') as f: f.write(_encode_content(content, compression))
+    else:
+        with open(path, 'w', encoding='utf-8') as f: f.write(content)
+
+def _add_notes_batch(project_base_path, batch):
+    """
+    Stores a batch of new notes with a single journal append and a single transaction per
+    derived database.
+
+    Args:
+        batch (list): (source, title, content) tuples; source is only echoed back in the results.
+
+    Returns:
+        list: One {"source", "note_id", "success", "message"} dict per note, in batch order.
+    """
     notes_dir = get_project_notes_dir(project_base_path)
     content_dir = get_notes_content_dir(project_base_path)
     metadata_path = get_notes_metadata_path(project_base_path)
     _ensure_notes_dirs_exist(notes_dir, content_dir, metadata_path)
+    with file_lock.locked(metadata_path): # Writers are serialized across processes
+        metadata = _load_notes_metadata(metadata_path)
 
-    note_id = str(uuid.uuid4())
-    note_filename = f"{note_id}.txt"
-    note_content_filepath = os.path.join(content_dir, note_filename)
-    metadata = _load_notes_metadata(metadata_path)
+        results, added, written_files = [], [], []
+        for source, title, content in batch:
+            note_id = str(uuid.uuid4())
+            result = {"source": source, "note_id": note_id, "success": False}
+            results.append(result)
+            if note_id in metadata:
+                result["message"] = "Error: Note ID collision. Please try again."
+                continue
+            note_info = {
+                "id": note_id, "title": title,
+                "created_date": datetime.now().isoformat(),
+                "last_modified_date": datetime.now().isoformat(),
+            }
+            if NOTES_COMPRESSION:
+                note_info["content_compression"] = NOTES_COMPRESSION
+            if NOTES_STORAGE_MODE != STORAGE_PACKED:
+                note_filename = f"{note_id}.txt{compression_codecs.get_suffix(NOTES_COMPRESSION)}"
+                note_content_filepath = os.path.join(content_dir, note_filename)
+                try:
+                    _write_note_file(note_content_filepath, content, NOTES_COMPRESSION)
+                except Exception as e:
+                    result["message"] = f"Error adding note '{title}': {e}"
+                    continue
+                written_files.append(note_content_filepath)
+                note_info["content_filename"] = note_filename
+            added.append((result, note_info, content))
 
-    if note_id in metadata:
-        return False, "Error: Note ID collision. Please try again."
+        try:
+            if NOTES_STORAGE_MODE == STORAGE_PACKED:
+                locations = note_segments.append_many(get_notes_segments_dir(project_base_path),
+                                                      [_encode_content(content, NOTES_COMPRESSION) for _, _, content in added])
+                for (_, note_info, _), (segment_name, offset, length) in zip(added, locations):
+                    note_info.update({"content_segment": segment_name, "content_offset": offset, "content_length": length})
+            _sync_derived_files(project_base_path)
+            notes_journal.append_records(metadata_path, [{"op": "add", "id": note_info["id"], "note": note_info}
+                                                         for _, note_info, _ in added])
+        except Exception as e:
+            for path in written_files:
+                try: os.remove(path)
+                except OSError: pass
+            for result, note_info, _ in added:
+                result["message"] = f"Error adding note '{note_info['title']}': {e}"
+            return results
+
+        with _updating_derived(project_base_path) as (index, order, titles):
+            for result, note_info, content in added:
+                index_store.add_to_index(index, note_info["id"], _index_text(note_info, content))
+                notes_order.add_note(order, note_info["id"], note_info)
+                trigram_index.add(titles, note_info["id"], note_info["title"])
+                result["success"] = True
+                result["message"] = f"Note '{note_info['title']}' (ID: {note_info['id']}) added."
+        return results
+
+def add_note(title, content, project_base_path):
+    result = _add_notes_batch(project_base_path, [(None, title, content)])[0]
+    return result["success"], result["message"]
 
+def _iter_import_records(source):
+    # Yields (source label, title, content, error) for a directory of .txt files or a JSONL file/stream
+    if isinstance(source, str) and os.path.isdir(source):
+        for entry in sorted(os.scandir(source), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(NOTE_IMPORT_EXTENSIONS): continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    yield entry.path, os.path.splitext(entry.name)[0], f.read(), None
+            except (IOError, UnicodeDecodeError) as e:
+                yield entry.path, None, None, f"Error reading '{entry.path}': {e}"
+        return
+
+    stream = open(source, 'r', encoding='utf-8') if isinstance(source, str) else source
     try:
-        with open(note_content_filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-
-        metadata[note_id] = {
-            "id": note_id, "title": title,
-            "created_date": datetime.now().isoformat(),
-            "last_modified_date": datetime.now().isoformat(),
-            "content_filename": note_filename
-        }
-        _save_notes_metadata(metadata_path, metadata)
-        return True, f"Note '{title}' (ID: {note_id}) added."
-    except Exception as e:
-        if os.path.exists(note_content_filepath) and note_id not in _load_notes_metadata(metadata_path):
-            try: os.remove(note_content_filepath)
-            except OSError: pass
-        return False, f"Error adding note '{title}': {e}"
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip(): continue
+            label = f"line {line_number}"
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield label, None, None, f"Error: invalid JSON on {label}: {e}"
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("title"), str) \
+                    or not isinstance(record.get("content", ""), str):
+                yield label, None, None, f"Error: {label} needs a string \"title\" (and optional \"content\")."
+                continue
+            yield label, record["title"], record.get("content", ""), None
+    finally:
+        if stream is not source: stream.close()
+
+def import_notes(source, project_base_path, batch_size=IMPORT_BATCH_SIZE, progress_callback=None):
+    """
+    Bulk-imports notes, committing metadata, search index and sort order once per batch
+    instead of once per note.
+
+    Args:
+        source: A directory of text files (title = file name without extension, content = file text),
+            the path of a JSON Lines file, or an open text stream (e.g. sys.stdin) of JSON Lines,
+            one {"title": ..., "content": ...} object per line.
+        project_base_path (str): Project directory holding local_notes/.
+        batch_size (int, optional): Notes per commit.
+        progress_callback (callable, optional): Called as progress_callback(done, result) for
+            each record in input order, once its result is known, where result is the dict
+            described below.
+
+    Returns:
+        list: One {"source", "note_id", "success", "message"} dict per imported record, in input order.
+    """
+    results, batch, done = [], [], 0
+
+    def flush():
+        for (position, _), result in zip(batch, _add_notes_batch(project_base_path, [record for _, record in batch])):
+            results[position] = result
+        batch.clear()
+
+    def report_ready():
+        # Reports results in input order, stopping at the first record still waiting for its batch
+        nonlocal done
+        while done < len(results) and results[done] is not None:
+            done += 1
+            if progress_callback: progress_callback(done, results[done - 1])
+
+    for label, title, content, error in _iter_import_records(source):
+        if error:
+            results.append({"source": label, "note_id": None, "success": False, "message": error})
+        else:
+            batch.append((len(results), (label, title, content)))
+            results.append(None) # Filled in when its batch is committed
+            if len(batch) >= batch_size: flush()
+        report_ready()
+    if batch: flush()
+    report_ready()
+    return results
 
 def list_notes(project_base_path):
     notes_dir = get_project_notes_dir(project_base_path)
@@ -77,18 +394,36 @@ def list_notes(project_base_path):
     metadata_path = get_notes_metadata_path(project_base_path)
     _ensure_notes_dirs_exist(notes_dir, content_dir, metadata_path)
     metadata = _load_notes_metadata(metadata_path)
-    return sorted(metadata.values(), key=lambda x: x.get("created_date", ""), reverse=True)
+    with _open_notes_order(project_base_path) as conn:
+        note_ids = notes_order.note_ids(conn, "created_date")
+    return [metadata[note_id] for note_id in note_ids if note_id in metadata]
 
-def get_note_content(note_id, project_base_path):
+def list_notes_page(project_base_path, limit=20, offset=0, cursor=None, sort_by="created_date", descending=True):
+    """
+    Returns one page of the note listing, read from the persisted sort order (no sorting).
+
+    Args:
+        project_base_path (str): Project directory holding local_notes/.
+        limit (int, optional): Maximum number of notes on the page.
+        offset (int, optional): Notes to skip (counted after the cursor, if given).
+        cursor (str, optional): next_cursor of the previous page.
+        sort_by (str, optional): "created_date" or "last_modified_date".
+        descending (bool, optional): Newest first (default).
+
+    Returns:
+        tuple: (list of note metadata dicts, next_cursor or None on the last page).
+
+    Raises:
+        ValueError: On an unknown sort key, a negative offset/limit or a malformed cursor.
+    """
     metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
-    note_info = metadata.get(note_id)
-    if not note_info or not note_info.get("content_filename"): return None
+    with _open_notes_order(project_base_path) as conn:
+        note_ids, next_cursor = notes_order.page(conn, sort_by, descending, offset, limit, cursor)
+    return [metadata[note_id] for note_id in note_ids if note_id in metadata], next_cursor
 
-    note_content_filepath = os.path.join(get_notes_content_dir(project_base_path), note_info["content_filename"])
-    if not os.path.exists(note_content_filepath): return None
-    try:
-        with open(note_content_filepath, 'r', encoding='utf-8') as f: return f.read()
-    except IOError: return None
+def get_note_content(note_id, project_base_path):
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    return _read_note_content(project_base_path, metadata.get(note_id))
 
 def get_note_details(note_id, project_base_path):
     metadata_path = get_notes_metadata_path(project_base_path)
@@ -98,37 +433,130 @@ def get_note_details(note_id, project_base_path):
     return _load_notes_metadata(metadata_path).get(note_id)
 
 def search_notes(keyword, project_base_path):
+    # Answered from the full-text index: cost grows with the number of matches, not of notes.
+    # Every word of keyword must begin a word of the title or content ("crat" finds
+    # "Crater rim survey"); fragments from the middle of a word are not matched.
     if not keyword: return []
-    keyword_lower = keyword.lower()
-    all_notes_metadata = list_notes(project_base_path)
-    found_notes_info = []
-    for note_meta in all_notes_metadata:
-        if keyword_lower in note_meta.get("title", "").lower():
-            found_notes_info.append(note_meta)
-            continue
-        content = get_note_content(note_meta.get("id"), project_base_path)
-        if content and keyword_lower in content.lower():
-            found_notes_info.append(note_meta)
-    return found_notes_info
+    with _open_notes_index(project_base_path) as conn:
+        matches = index_store.lookup(conn, keyword, prefixes=True)
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    found_notes_info = [metadata[note_id] for note_id in matches if note_id in metadata]
+    return sorted(found_notes_info, key=lambda x: x.get("created_date", ""), reverse=True)
+
+def search_notes_ranked(query, project_base_path, top_k=DEFAULT_SEARCH_TOP_K):
+    """
+    Ranked search: scores notes against a multi-word query with BM25 over the full-text index
+    (title and content) and returns only the best top_k.
+
+    Returns:
+        list: Note metadata dicts, best first, each with an added "score" key.
+    """
+    if not query: return []
+    with _open_notes_index(project_base_path) as conn:
+        ranked = index_store.rank_bm25(conn, query, top_k)
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    return [dict(metadata[note_id], score=round(score, 4)) for note_id, score in ranked if note_id in metadata]
+
+def fuzzy_search_notes(query, project_base_path, limit=trigram_index.DEFAULT_FUZZY_LIMIT,
+                       min_similarity=trigram_index.DEFAULT_MIN_SIMILARITY, substring=False):
+    """
+    Finds notes whose title matches query approximately: fragments of words ("crat" for
+    "Crater"), misspellings ("jezro") and partial titles all match.
+
+    Args:
+        substring (bool, optional): Only titles containing query verbatim, anywhere in a word
+            ("rat" for "Gale Crater"), shortest first and with similarity 1.0.
+
+    Returns:
+        list: Note metadata dicts with an added "similarity" (0..1), best first.
+    """
+    with _open_title_trigrams(project_base_path) as conn:
+        matches = trigram_index.search(conn, query, limit, min_similarity, substring)
+    metadata = _load_notes_metadata(get_notes_metadata_path(project_base_path))
+    return [dict(metadata[note_id], similarity=similarity) for note_id, similarity in matches if note_id in metadata]
+
+def update_note(note_id, project_base_path, title=None, content=None):
+    content_dir, metadata_path = get_notes_content_dir(project_base_path), get_notes_metadata_path(project_base_path)
+    _ensure_notes_dirs_exist(get_project_notes_dir(project_base_path), content_dir, metadata_path)
+    with file_lock.locked(metadata_path): # Writers are serialized across processes
+        note_info = _load_notes_metadata(metadata_path).get(note_id)
+        if not note_info: return False, f"Error: Note ID '{note_id}' not found."
+
+        changes = {"last_modified_date": datetime.now().isoformat()}
+        if title is not None: changes["title"] = title
+        try:
+            _sync_derived_files(project_base_path)
+            if content is None:
+                content = _read_note_content(project_base_path, note_info) or ""
+            elif note_info.get("content_segment"): # Packed notes keep their storage: the new content is appended
+                changes.update(_append_to_segment(project_base_path, content, note_info.get("content_compression")))
+            else:
+                _write_note_file(os.path.join(content_dir, note_info["content_filename"]), content,
+                                 note_info.get("content_compression"))
+            notes_journal.append_records(metadata_path, [{"op": "modify", "id": note_id, "changes": changes}])
+            with _updating_derived(project_base_path) as (index, order, titles):
+                index_store.add_to_index(index, note_id, _index_text(dict(note_info, **changes), content))
+                notes_order.add_note(order, note_id, dict(note_info, **changes))
+                if title is not None:
+                    trigram_index.add(titles, note_id, title)
+            if "content_segment" in changes: _compact_segments_if_needed(project_base_path, metadata_path)
+            return True, f"Note ID '{note_id}' (Title: {changes.get('title', note_info.get('title'))}) updated."
+        except Exception as e:
+            return False, f"Error updating note ID '{note_id}': {e}"
 
 def delete_note(note_id, project_base_path):
     notes_dir, content_dir, metadata_path = (get_project_notes_dir(project_base_path),
                                              get_notes_content_dir(project_base_path),
                                              get_notes_metadata_path(project_base_path))
     _ensure_notes_dirs_exist(notes_dir, content_dir, metadata_path)
-    metadata = _load_notes_metadata(metadata_path)
-    note_info = metadata.get(note_id)
+    with file_lock.locked(metadata_path): # Writers are serialized across processes
+        metadata = _load_notes_metadata(metadata_path)
+        note_info = metadata.get(note_id)
 
-    if not note_info: return False, f"Error: Note ID '{note_id}' not found."
+        if not note_info: return False, f"Error: Note ID '{note_id}' not found."
 
-    content_filepath = os.path.join(content_dir, note_info.get("content_filename", "")) if note_info.get("content_filename") else None
-    try:
-        if content_filepath and os.path.exists(content_filepath): os.remove(content_filepath)
-        del metadata[note_id]
-        _save_notes_metadata(metadata_path, metadata)
-        return True, f"Note ID '{note_id}' (Title: {note_info.get('title')}) deleted."
-    except Exception as e:
-        return False, f"Error deleting note ID '{note_id}': {e}"
+        content_filepath = os.path.join(content_dir, note_info.get("content_filename", "")) if note_info.get("content_filename") else None
+        try:
+            _sync_derived_files(project_base_path)
+            if content_filepath and os.path.exists(content_filepath): os.remove(content_filepath)
+            notes_journal.append_records(metadata_path, [{"op": "delete", "id": note_id}])
+            with _updating_derived(project_base_path) as (index, order, titles):
+                index_store.remove_from_index(index, note_id)
+                notes_order.remove_note(order, note_id)
+                trigram_index.remove(titles, note_id)
+            if note_info.get("content_segment"): _compact_segments_if_needed(project_base_path, metadata_path)
+            return True, f"Note ID '{note_id}' (Title: {note_info.get('title')}) deleted."
+        except Exception as e:
+            return False, f"Error deleting note ID '{note_id}': {e}"
+
+def pack_notes(project_base_path):
+    """
+    Moves the contents of all file-based notes into segment files (packed storage).
+    The new locations are journaled in one batch before the per-note files are removed.
+    """
+    metadata_path = get_notes_metadata_path(project_base_path)
+    _ensure_notes_dirs_exist(get_project_notes_dir(project_base_path), get_notes_content_dir(project_base_path),
+                             metadata_path)
+    with file_lock.locked(metadata_path): # Writers are serialized across processes
+        records, packed_files = [], []
+        try:
+            _sync_derived_files(project_base_path) # Bring up to date before touching
+            for note_id, note_info in _load_notes_metadata(metadata_path).items():
+                if note_info.get("content_segment") or not note_info.get("content_filename"): continue
+                content = _read_note_content(project_base_path, note_info)
+                if content is None: continue
+                packed_info = {k: v for k, v in note_info.items() if k != "content_filename"}
+                packed_info.update(_append_to_segment(project_base_path, content, note_info.get("content_compression")))
+                records.append({"op": "add", "id": note_id, "note": packed_info}) # Replaces the whole entry
+                packed_files.append(os.path.join(get_notes_content_dir(project_base_path), note_info["content_filename"]))
+            notes_journal.append_records(metadata_path, records)
+            _touch_derived(project_base_path)
+        except Exception as e:
+            return False, f"Error packing notes: {e}"
+        for path in packed_files:
+            try: os.remove(path)
+            except OSError: pass
+        return True, f"Packed {len(records)} note(s) into segment files."
 
 if __name__ == '__main__':
     print("--- Running note_taker.py direct test ---")
@@ -0,0 +1,196 @@
+# planetary_scientist_assistant/knowledge_base/notes_journal.py
+import os
+import json
+import threading
+
+try:
+    from . import file_lock
+except ImportError: # Running this file directly as a script
+    import file_lock
+
+# Journaled persistence for note metadata.
+#
+# notes_metadata.json             snapshot of all note metadata (JSON object, note_id -> info)
+# notes_metadata.json.journal     append-only JSON lines, one record per mutation:
+#                                   {"op": "add", "id": ..., "note": {...}}
+#                                   {"op": "modify", "id": ..., "changes": {...}}
+#                                   {"op": "delete", "id": ...}
+# notes_metadata.json.compacting  journal being folded into the snapshot by a compaction
+#
+# Loading replays snapshot + compacting + journal. Every record is idempotent, so replaying a
+# record that is already contained in the snapshot (e.g. after a crash mid-compaction) is harmless.
+# Compaction first renames the journal (new mutations go to a fresh journal immediately), then
+# writes the new snapshot atomically and finally deletes the renamed journal.
+#
+# Across processes, appends and the journal rename hold the store's file lock
+# (notes_metadata.json.lock, see file_lock); readers never lock. Only one process compacts at a
+# time (notes_metadata.json.compacting.lock), others skip the compaction.
+
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+COMPACT_THRESHOLD_BYTES = 1024 * 1024 # Compact once the journal grows past 1 MiB
+_LOAD_RETRIES = 5
+
+# In-process cache: metadata_path -> {"base": (snapshot sig, compacting sig, journal inode),
+#                                     "offset": bytes of the journal already applied, "metadata": dict}
+# Readers share the cached dict and must not mutate it. A journal that only grew is applied
+# incrementally from the cached offset; any other change triggers a full reload.
+_cache = {}
+_lock = threading.RLock() # Serializes appends, loads and compaction within this process
+_compactions = {} # metadata_path -> running background compaction thread
+
+
+def get_journal_path(metadata_path):
+    return metadata_path + JOURNAL_SUFFIX
+
+def get_compacting_path(metadata_path):
+    return metadata_path + COMPACTING_SUFFIX
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def last_modified_ns(metadata_path):
+    """Returns the modification time (ns) of the newest of snapshot, compacting journal and journal."""
+    signatures = (_signature(metadata_path), _signature(get_compacting_path(metadata_path)),
+                  _signature(get_journal_path(metadata_path)))
+    return max((sig[0] for sig in signatures if sig), default=0)
+
+def apply_record(metadata, record):
+    """Applies one journal record to a metadata dict in place."""
+    op, note_id = record.get("op"), record.get("id")
+    if op == "add":
+        metadata[note_id] = record["note"]
+    elif op == "modify":
+        if note_id in metadata:
+            metadata[note_id] = dict(metadata[note_id], **record["changes"])
+    elif op == "delete":
+        metadata.pop(note_id, None)
+
+def _replay(path, metadata, offset=0):
+    """Applies the complete records of a journal file from offset on. Returns the new offset."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return offset
+    end = data.rfind(b"\n") + 1 # A trailing partial line is a record still being written
+    for line in data[:end].splitlines():
+        try:
+            apply_record(metadata, json.loads(line))
+        except (ValueError, KeyError):
+            continue # Skip a corrupted record rather than losing the whole journal
+    return offset + end
+
+def _read_snapshot(metadata_path):
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return json.loads(content) if content else {}
+    except (IOError, json.JSONDecodeError):
+        return {}
+
+def _base_signature(metadata_path):
+    journal_sig = _signature(get_journal_path(metadata_path))
+    return (_signature(metadata_path), _signature(get_compacting_path(metadata_path)),
+            journal_sig[2] if journal_sig else None)
+
+def load_metadata(metadata_path):
+    """
+    Returns the current note metadata (snapshot with the journals replayed).
+    The returned dict is shared with other readers and must not be modified.
+    """
+    with _lock:
+        base = _base_signature(metadata_path)
+        cached = _cache.get(metadata_path)
+        journal_path = get_journal_path(metadata_path)
+        if cached and cached["base"] == base:
+            journal_sig = _signature(journal_path)
+            size = journal_sig[1] if journal_sig else 0
+            if size > cached["offset"]:
+                cached["offset"] = _replay(journal_path, cached["metadata"], cached["offset"])
+            if size >= cached["offset"]:
+                return cached["metadata"]
+
+        # Full reload. Another process may compact meanwhile; retry until the files were stable.
+        for _ in range(_LOAD_RETRIES):
+            metadata = _read_snapshot(metadata_path)
+            _replay(get_compacting_path(metadata_path), metadata)
+            offset = _replay(journal_path, metadata)
+            after = _base_signature(metadata_path)
+            if after == base:
+                break
+            base = after
+        if base[0] is None:
+            _cache.pop(metadata_path, None)
+            return metadata
+        _cache[metadata_path] = {"base": base, "offset": offset, "metadata": metadata}
+        return metadata
+
+def append_records(metadata_path, records):
+    """
+    Appends mutation records to the journal (one write for the whole list) and starts a
+    background compaction once the journal has grown past COMPACT_THRESHOLD_BYTES.
+    """
+    if not records:
+        return
+    journal_path = get_journal_path(metadata_path)
+    data = "".join(json.dumps(record) + "\n" for record in records).encode('utf-8')
+    with file_lock.locked(metadata_path), _lock:
+        with open(journal_path, 'ab') as f:
+            f.write(data)
+        size = os.path.getsize(journal_path)
+    if size >= COMPACT_THRESHOLD_BYTES:
+        compact_in_background(metadata_path)
+
+def compact(metadata_path):
+    """
+    Folds the journal into a new snapshot and removes it.
+    Only the journal rename happens under the lock, so appends and reads are not held up
+    while the snapshot is written.
+    """
+    compacting_path = get_compacting_path(metadata_path)
+    with file_lock.try_locked(compacting_path) as acquired:
+        if acquired: # Otherwise another process is compacting right now
+            _compact(metadata_path, compacting_path)
+
+def _compact(metadata_path, compacting_path):
+    journal_path = get_journal_path(metadata_path)
+    with file_lock.locked(metadata_path), _lock:
+        if os.path.exists(journal_path) and not os.path.exists(compacting_path):
+            os.replace(journal_path, compacting_path) # From here on, new records go to a fresh journal
+    if not os.path.exists(compacting_path):
+        return
+    metadata = _read_snapshot(metadata_path)
+    _replay(compacting_path, metadata)
+    data_mtime_ns = last_modified_ns(metadata_path)
+    tmp_path = f"{metadata_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
+    # Compaction does not change the data, so the snapshot keeps the time of the last mutation
+    # (derived data such as the notes search index compares itself against it).
+    os.utime(tmp_path, ns=(data_mtime_ns, data_mtime_ns))
+    os.replace(tmp_path, metadata_path)
+    os.remove(compacting_path)
+
+def compact_in_background(metadata_path):
+    """Runs compact() on a background thread, unless one is already running for this file."""
+    with _lock:
+        running = _compactions.get(metadata_path)
+        if running and running.is_alive():
+            return running
+        # Not a daemon thread: the interpreter waits for a compaction to finish before exiting.
+        thread = threading.Thread(target=compact, args=(metadata_path,), name="notes-journal-compaction")
+        _compactions[metadata_path] = thread
+        thread.start()
+        return thread
+
+def wait_for_compaction(metadata_path):
+    """Blocks until a background compaction of metadata_path (if any) has finished."""
+    thread = _compactions.get(metadata_path)
+    if thread:
+        thread.join()
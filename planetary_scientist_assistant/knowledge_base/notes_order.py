@@ -0,0 +1,101 @@
+# planetary_scientist_assistant/knowledge_base/notes_order.py
+from contextlib import contextmanager
+
+try:
+    from . import derived_db
+except ImportError: # Running this file directly as a script
+    import derived_db
+
+# Persisted sort orders for note listings.
+# An SQLite file (see derived_db) holds one row per note with its sort dates, and an index per
+# sort key on (date, note_id), which keeps the notes in ascending order for that key:
+#   notes_order (note_id, created_date, last_modified_date)
+# Adding, editing or removing a note writes only its own row (and index entries), and a page is
+# a range of an index read from a cursor or offset, so listing the newest N notes never sorts
+# the whole collection.
+# Dates are ISO strings, which sort chronologically; the note ID breaks ties.
+
+ORDER_FILENAME = "notes_order.sqlite3"
+ORDER_VERSION = 2
+SORT_KEYS = ("created_date", "last_modified_date")
+_CURSOR_SEPARATOR = "|"
+
+_SCHEMA = (
+    "CREATE TABLE notes_order (note_id TEXT PRIMARY KEY, created_date TEXT NOT NULL, "
+    "last_modified_date TEXT NOT NULL)",
+) + tuple(f"CREATE INDEX idx_notes_order_{key} ON notes_order ({key}, note_id)" for key in SORT_KEYS)
+
+
+@contextmanager
+def open_order(order_path):
+    """Opens (creating it if needed) the sort order file at order_path as a single transaction."""
+    with derived_db.open_db(order_path, _SCHEMA, ORDER_VERSION) as conn:
+        yield conn
+
+def rebuild(conn, metadata):
+    """Replaces the sort orders by those of a {note_id: note_info} dict (used on rebuilds)."""
+    conn.execute("DELETE FROM notes_order")
+    for note_id, note_info in metadata.items():
+        add_note(conn, note_id, note_info)
+
+def add_note(conn, note_id, note_info):
+    """Adds a note, or moves it to the positions of its (changed) dates."""
+    conn.execute("INSERT OR REPLACE INTO notes_order VALUES (?, ?, ?)",
+                 (note_id,) + tuple(note_info.get(key, "") for key in SORT_KEYS))
+
+def remove_note(conn, note_id):
+    """Removes a note. Returns True if it was present."""
+    return conn.execute("DELETE FROM notes_order WHERE note_id = ?", (note_id,)).rowcount > 0
+
+def _encode_cursor(entry):
+    return f"{entry[0]}{_CURSOR_SEPARATOR}{entry[1]}"
+
+def _decode_cursor(cursor):
+    date, sep, note_id = cursor.rpartition(_CURSOR_SEPARATOR)
+    if not sep:
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+    return [date, note_id]
+
+def _check_sort_key(sort_by):
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort_by}'. Use one of: {', '.join(SORT_KEYS)}.")
+
+def note_ids(conn, sort_by="created_date", descending=True):
+    """Returns the IDs of all notes in the given order."""
+    _check_sort_key(sort_by)
+    direction = "DESC" if descending else "ASC"
+    return [note_id for (note_id,) in conn.execute(
+        f"SELECT note_id FROM notes_order ORDER BY {sort_by} {direction}, note_id {direction}")]
+
+def page(conn, sort_by="created_date", descending=True, offset=0, limit=20, cursor=None):
+    """
+    Returns one page of note IDs.
+
+    Args:
+        sort_by (str): "created_date" or "last_modified_date".
+        descending (bool, optional): Newest first (default) or oldest first.
+        offset (int, optional): Entries to skip (after the cursor, if one is given).
+        limit (int, optional): Maximum page size.
+        cursor (str, optional): next_cursor returned for the previous page. Unlike an offset it stays
+            correct when notes are added or deleted between two page requests.
+
+    Returns:
+        tuple: (note_ids, next_cursor) where next_cursor is None on the last page.
+
+    Raises:
+        ValueError: On an unknown sort key, negative offset/limit or a malformed cursor.
+    """
+    _check_sort_key(sort_by)
+    if offset < 0 or limit < 0:
+        raise ValueError("offset and limit must not be negative.")
+    direction = "DESC" if descending else "ASC"
+    where, params = "", []
+    if cursor:
+        # The page starts right after the cursor entry, in the direction of the listing
+        where, params = f"WHERE ({sort_by}, note_id) {'<' if descending else '>'} (?, ?)", _decode_cursor(cursor)
+    rows = conn.execute(f"SELECT {sort_by}, note_id FROM notes_order {where} "
+                        f"ORDER BY {sort_by} {direction}, note_id {direction} LIMIT ? OFFSET ?",
+                        params + [limit + 1, offset]).fetchall() # One more row tells whether a next page exists
+    view = rows[:limit]
+    next_cursor = _encode_cursor(view[-1]) if view and len(rows) > limit else None
+    return [note_id for _, note_id in view], next_cursor
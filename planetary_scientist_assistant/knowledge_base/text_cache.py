@@ -0,0 +1,93 @@
+# planetary_scientist_assistant/knowledge_base/text_cache.py
+import os
+import json
+
+try:
+    from .content_store import compute_file_hash
+except ImportError: # Running a knowledge_base module directly as a script
+    from content_store import compute_file_hash
+
+# Sidecar cache of extracted document text.
+# For every cached document two files live in the cache directory:
+#   <name>.txt        the extracted text (UTF-8)
+#   <name>.key.json   {"size_bytes": ..., "mtime_ns": ..., "sha256": ...} of the source file
+# A cache entry is fresh when size and mtime match. If they differ (e.g. the file was touched or
+# copied) the content hash decides whether the text really has to be extracted again.
+
+TEXT_CACHE_DIRNAME = ".text_cache"
+
+
+def _cache_paths(cache_dir, cache_name):
+    return (os.path.join(cache_dir, f"{cache_name}.txt"),
+            os.path.join(cache_dir, f"{cache_name}.key.json"))
+
+def _load_key(key_path):
+    try:
+        with open(key_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return None
+
+def _save_key(key_path, key):
+    with open(key_path, 'w', encoding='utf-8') as f:
+        json.dump(key, f)
+
+def get_cached_text(cache_dir, cache_name, file_path, extract_func):
+    """
+    Returns the extracted text of file_path, using the sidecar cache when it is still valid.
+    Stale or missing entries are rebuilt by calling extract_func(file_path) and stored.
+
+    Args:
+        cache_dir (str): Directory holding the sidecar files.
+        cache_name (str): Name of the cache entry (e.g. the document ID).
+        file_path (str): Path of the source document.
+        extract_func (callable): Function extracting the text of the source document.
+
+    Returns:
+        str: The extracted text.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    text_path, key_path = _cache_paths(cache_dir, cache_name)
+    stat = os.stat(file_path)
+    key = _load_key(key_path)
+    have_text = os.path.exists(text_path)
+
+    if key and have_text and key.get("size_bytes") == stat.st_size and key.get("mtime_ns") == stat.st_mtime_ns:
+        with open(text_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    content_hash = compute_file_hash(file_path)
+    new_key = {"size_bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+    if key and have_text and key.get("sha256") == content_hash:
+        # Same bytes, only the stat data changed: refresh the key, keep the text
+        _save_key(key_path, new_key)
+        with open(text_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    text = extract_func(file_path)
+    _write_entry(text_path, key_path, text, new_key)
+    return text
+
+def _write_entry(text_path, key_path, text, key):
+    with open(text_path, 'w', encoding='utf-8', errors='replace') as f:
+        f.write(text)
+    _save_key(key_path, key)
+
+def store_text(cache_dir, cache_name, file_path, text, content_hash=None):
+    """
+    Stores already extracted text for file_path as a fresh cache entry.
+    Used when the text is extracted elsewhere (e.g. in a worker process during bulk ingestion).
+    Pass content_hash when it is already known to avoid hashing the file again.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    text_path, key_path = _cache_paths(cache_dir, cache_name)
+    stat = os.stat(file_path)
+    key = {"size_bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+           "sha256": content_hash or compute_file_hash(file_path)}
+    _write_entry(text_path, key_path, text, key)
+
+def remove_cached_text(cache_dir, cache_name):
+    """Deletes the sidecar files of a cache entry, if present."""
+    for path in _cache_paths(cache_dir, cache_name):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,64 @@
+# planetary_scientist_assistant/knowledge_base/text_scan.py
+import os
+import mmap
+
+# Constant-memory keyword scanning for very large text files (e.g. multi-gigabyte instrument dumps).
+# Files are memory-mapped and consumed in fixed-size chunks; only one lowercased chunk plus
+# len(keyword) - 1 carried-over bytes are held at a time, so matches spanning a chunk boundary
+# are still found. Matching is case-insensitive for ASCII letters (bytes.lower()).
+
+SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def iter_match_offsets(stream, keyword, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Yields the byte offset of every (possibly overlapping) case-insensitive occurrence of keyword.
+
+    Args:
+        stream: Any object with a read(size) method returning bytes (file, mmap, decompressor stream).
+        keyword (str): Text to look for; encoded as UTF-8.
+        chunk_size (int, optional): Number of bytes read per step.
+    """
+    needle = keyword.encode('utf-8').lower()
+    if not needle:
+        return
+    overlap = len(needle) - 1
+    carry = b""
+    base = 0 # Offset in the stream of window[0]
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        window = carry + chunk.lower()
+        pos = window.find(needle)
+        while pos != -1:
+            yield base + pos
+            pos = window.find(needle, pos + 1)
+        # Keep the tail that could still be the start of a match continuing in the next chunk.
+        # It is shorter than the needle, so no match found above lies entirely inside it.
+        keep = min(overlap, len(window))
+        base += len(window) - keep
+        carry = window[len(window) - keep:] if keep else b""
+
+def find_in_file(file_path, keyword, max_hits=None, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Scans a file for keyword through a read-only memory map.
+
+    Args:
+        file_path (str): File to scan.
+        keyword (str): Text to look for (case-insensitive).
+        max_hits (int, optional): Stop after this many matches.
+        chunk_size (int, optional): Number of bytes examined per step.
+
+    Returns:
+        list: Byte offsets of the matches, in file order.
+    """
+    offsets = []
+    if os.path.getsize(file_path) == 0:
+        return offsets # Empty files cannot be memory-mapped
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset in iter_match_offsets(mm, keyword, chunk_size):
+            offsets.append(offset)
+            if max_hits is not None and len(offsets) >= max_hits:
+                break
+    return offsets
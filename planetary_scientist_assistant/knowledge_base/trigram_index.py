@@ -0,0 +1,130 @@
+# planetary_scientist_assistant/knowledge_base/trigram_index.py
+import re
+from contextlib import contextmanager
+
+try:
+    from . import derived_db
+except ImportError: # Running this file directly as a script
+    import derived_db
+
+# Trigram index for fuzzy and substring matching of short strings (note titles, document filenames).
+# Text is split into words at anything but letters and digits ("mars_spectra_v2.txt" gives
+# "mars", "spectra", "v2", "txt"). Every word is padded as "  word " and cut into overlapping
+# 3-character trigrams, so prefixes, inner fragments and misspellings still share most
+# trigrams with the original.
+# The index is an SQLite file (see derived_db) with the tables
+#   trigram_keys (key, text, gram_count)  indexed text and number of distinct trigrams of every key
+#   trigram_postings (gram, key)          one row per trigram of a key
+# so adding or removing a key writes only its own rows, and the key index of the postings lets
+# a key be removed without scanning the others.
+#
+# Similarity of a query q to a string s (0..1):
+#   primary:   |T(q) & T(s)| / |T(q)|            how much of the query is found in s
+#   tie-break: |T(q) & T(s)| / |T(q) | T(s)|     prefers strings that are not much longer
+# Only the posting lists of the query's trigrams are read, never the whole key set.
+#
+# Substring mode finds the keys whose text contains the query verbatim (case-insensitive), e.g.
+# "rat" in "Gale Crater": fragments are too short for the padded trigrams above to match. Every
+# trigram found inside a word of the query (unpadded: "rat" has just "rat") must then also be a
+# trigram of the text, so the candidates are the intersection of those posting lists, and each
+# candidate is confirmed against its stored text. Such matches have similarity 1.0.
+
+TRIGRAM_INDEX_VERSION = 3
+DEFAULT_MIN_SIMILARITY = 0.3
+DEFAULT_FUZZY_LIMIT = 10
+
+_WORD_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+_SCHEMA = (
+    "CREATE TABLE trigram_keys (key TEXT PRIMARY KEY, text TEXT NOT NULL, gram_count INTEGER NOT NULL)",
+    "CREATE TABLE trigram_postings (gram TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (gram, key)) WITHOUT ROWID",
+    "CREATE INDEX idx_trigram_postings_key ON trigram_postings (key)",
+)
+
+
+def trigrams(text):
+    """Returns the set of word trigrams of text (case-insensitive)."""
+    grams = set()
+    for word in _WORD_PATTERN.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def inner_trigrams(text):
+    """Returns the set of trigrams found inside the words of text, without padding (case-insensitive)."""
+    return {word[i:i + 3] for word in _WORD_PATTERN.findall(text.lower()) for i in range(len(word) - 2)}
+
+@contextmanager
+def open_index(index_path):
+    """Opens (creating it if needed) the trigram index at index_path as a single transaction."""
+    with derived_db.open_db(index_path, _SCHEMA, TRIGRAM_INDEX_VERSION) as conn:
+        yield conn
+
+def is_built(conn):
+    """True once the index was filled by rebuild (False for a new, reset or unreadable file)."""
+    return bool(derived_db.get_meta(conn, "built"))
+
+def rebuild(conn, items):
+    """Replaces the whole content of the index by items, (key, text) pairs, and marks it built."""
+    conn.execute("DELETE FROM trigram_postings")
+    conn.execute("DELETE FROM trigram_keys")
+    for key, text in items:
+        _insert(conn, key, text)
+    derived_db.set_meta(conn, "built", 1)
+
+def _insert(conn, key, text):
+    grams = trigrams(text)
+    conn.executemany("INSERT INTO trigram_postings VALUES (?, ?)", [(gram, key) for gram in grams])
+    conn.execute("INSERT INTO trigram_keys VALUES (?, ?, ?)", (key, text, len(grams)))
+
+def add(conn, key, text):
+    """Indexes text under key, replacing any previous entry for key."""
+    remove(conn, key)
+    _insert(conn, key, text)
+
+def remove(conn, key):
+    """Removes key. Returns True if it was indexed."""
+    conn.execute("DELETE FROM trigram_postings WHERE key = ?", (key,))
+    return conn.execute("DELETE FROM trigram_keys WHERE key = ?", (key,)).rowcount > 0
+
+def search(conn, query, limit=DEFAULT_FUZZY_LIMIT, min_similarity=DEFAULT_MIN_SIMILARITY, substring=False):
+    """
+    Finds the keys whose text is most similar to query.
+
+    Args:
+        substring (bool, optional): Only keys whose text contains query verbatim (case-insensitive),
+            shortest text first. The query needs a word of at least 3 letters or digits.
+
+    Returns:
+        list: (key, similarity) tuples, best first, with similarity >= min_similarity.
+    """
+    if substring:
+        return _search_substring(conn, query, limit)
+    query_grams = sorted(trigrams(query))
+    if not query_grams or limit <= 0:
+        return []
+    placeholders = ", ".join("?" * len(query_grams))
+    rows = conn.execute("SELECT p.key, COUNT(*), k.gram_count FROM trigram_postings AS p "
+                        "JOIN trigram_keys AS k ON k.key = p.key "
+                        f"WHERE p.gram IN ({placeholders}) GROUP BY p.key", query_grams)
+    scored = []
+    for key, count, gram_count in rows:
+        similarity = count / len(query_grams)
+        if similarity >= min_similarity:
+            jaccard = count / (len(query_grams) + gram_count - count)
+            scored.append((similarity, jaccard, key))
+    scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    return [(key, round(similarity, 3)) for similarity, _, key in scored[:limit]]
+
+def _search_substring(conn, query, limit):
+    query_grams = sorted(inner_trigrams(query))
+    if not query_grams or limit <= 0:
+        return []
+    placeholders = ", ".join("?" * len(query_grams))
+    candidates = conn.execute("SELECT k.key, k.text FROM trigram_keys AS k JOIN "
+                              f"(SELECT key FROM trigram_postings WHERE gram IN ({placeholders}) "
+                              "GROUP BY key HAVING COUNT(*) = ?) AS p ON p.key = k.key",
+                              query_grams + [len(query_grams)])
+    needle = query.lower()
+    matches = sorted((len(text), key) for key, text in candidates if needle in text.lower())
+    return [(key, 1.0) for _, key in matches[:limit]]
@@ -4,6 +4,7 @@ import os
 
 # Determine the directory where this script (main.py) is located.
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NOTES_PAGE_SIZE = 20 # Notes shown per page by the N2 listing
 # Add SCRIPT_DIR to sys.path to allow imports of modules from subdirectories
 if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
@@ -35,6 +36,7 @@ def display_main_menu(agent):
 def handle_knowledge_base_menu():
     from knowledge_base import document_manager
     from knowledge_base import note_taker
+    from knowledge_base import kb_query
 
     while True:
         print("\n--- Knowledge Base Menu ---")
@@ -44,12 +46,23 @@ def handle_knowledge_base_menu():
         print("D3. Search Documents (Keyword)")
         print("D4. View Document Details")
         print("D5. Remove Document")
+        print("D6. Import Folder of Documents (Parallel)")
+        print("D7. Ranked Search Documents (Best Matches)")
+        print("D8. Scan Large Document for Text (Byte Offsets)")
+        print("D9. Refresh Changed Documents (Incremental Re-index)")
+        print("D10. Advanced Search (\"phrases\", AND/OR/NOT, prefix*)")
+        print("D11. Find Documents by Approximate Filename")
         print("--- Notes ---")
         print("N1. Add Note")
         print("N2. List Notes")
         print("N3. Search Notes (Keyword)")
         print("N4. View Note Content")
         print("N5. Delete Note")
+        print("N6. Edit Note")
+        print("N7. Bulk Import Notes (Folder of .txt Files or JSONL File)")
+        print("N8. Find Notes by Approximate Title")
+        print("--- Documents and Notes ---")
+        print("K1. Search Everything (Documents and Notes, Ranked)")
         print("0. Back to Main Menu")
         choice = input("KB Menu Choice: ").upper()
 
@@ -85,6 +98,57 @@ def handle_knowledge_base_menu():
                 success, msg = document_manager.remove_document(doc_id, project_base_path=SCRIPT_DIR)
                 print(msg)
             else: print("Removal cancelled.")
+        elif choice == 'D6':
+            folder = os.path.abspath(input("Enter full path of the folder to import: "))
+            if not os.path.isdir(folder):
+                print(f"Folder '{folder}' not found.")
+            else:
+                workers = input("Number of worker processes (press Enter for one per CPU): ").strip()
+                max_workers = int(workers) if workers.isdigit() and int(workers) > 0 else None
+                def report_progress(done, total, result):
+                    status = "OK" if result["success"] else "FAILED"
+                    print(f"  [{done}/{total}] {status}: {result['message']}")
+                results = document_manager.ingest_documents(folder, max_workers=max_workers,
+                                                            progress_callback=report_progress)
+                added = sum(1 for r in results if r["success"])
+                print(f"Imported {added} of {len(results)} file(s).")
+        elif choice == 'D7':
+            query = input("Enter search words: ")
+            top_k = input(f"Number of results (press Enter for {document_manager.DEFAULT_SEARCH_TOP_K}): ").strip()
+            top_k = int(top_k) if top_k.isdigit() else document_manager.DEFAULT_SEARCH_TOP_K
+            found = document_manager.search_documents_ranked(query, top_k=top_k)
+            if not found: print(f"No documents match '{query}'.")
+            else:
+                print(f"\nBest matches for '{query}':")
+                for i, doc in enumerate(found): print(f"  {i+1}. {doc.get('original_filename')} (Score: {doc.get('score')}, Type: {doc.get('file_type')})")
+        elif choice == 'D8':
+            doc_id = input("Enter Document ID (filename) to scan: ")
+            keyword = input("Enter text to find: ")
+            offsets = document_manager.scan_document(doc_id, keyword, max_hits=100)
+            if offsets is None: print(f"Document '{doc_id}' not found.")
+            elif not offsets: print(f"'{keyword}' not found in '{doc_id}'.")
+            else:
+                print(f"Found '{keyword}' at byte offset(s) (first {len(offsets)} shown):")
+                print("  " + ", ".join(str(o) for o in offsets))
+        elif choice == 'D9':
+            report = document_manager.refresh_documents()
+            print(f"Checked {report['checked']} document(s): {len(report['changed'])} re-indexed, {len(report['removed'])} removed.")
+            for doc_id in report['changed']: print(f"  Re-indexed: {doc_id}")
+            for doc_id in report['removed']: print(f"  Removed (file missing): {doc_id}")
+        elif choice == 'D10':
+            query = input('Enter query (e.g. "olivine abundance" AND NOT Gale): ')
+            found, msg = document_manager.search_documents_query(query)
+            print(msg)
+            if found:
+                for i, doc in enumerate(found): print(f"  {i+1}. {doc.get('original_filename')} (Type: {doc.get('file_type')})")
+        elif choice == 'D11':
+            query = input("Enter part of a filename (typos are fine): ")
+            # Filenames containing the text as typed come first; approximate matches only if there are none
+            found = document_manager.fuzzy_find_documents(query, substring=True) or document_manager.fuzzy_find_documents(query)
+            if not found: print(f"No document filenames resemble '{query}'.")
+            else:
+                print(f"\nDocument filenames resembling '{query}':")
+                for i, doc in enumerate(found): print(f"  {i+1}. {doc.get('original_filename')} (Similarity: {doc.get('similarity')})")
         elif choice == 'N1':
             title = input("Note title: ")
             print("Note content (type '--ENDNOTE--' on a new line to finish):")
@@ -97,13 +161,19 @@ def handle_knowledge_base_menu():
             success, msg = note_taker.add_note(title, content, project_base_path=SCRIPT_DIR)
             print(msg)
         elif choice == 'N2':
-            notes = note_taker.list_notes(project_base_path=SCRIPT_DIR)
+            notes, cursor = note_taker.list_notes_page(project_base_path=SCRIPT_DIR, limit=NOTES_PAGE_SIZE)
             if not notes: print("No notes found.")
             else:
-                print("\nAvailable Notes:")
-                for i, note in enumerate(notes): print(f"  {i+1}. ID: {note.get('id')}, Title: {note.get('title')}, Created: {note.get('created_date')}")
+                print("\nAvailable Notes (newest first):")
+                shown = 0
+                while True:
+                    for note in notes:
+                        shown += 1
+                        print(f"  {shown}. ID: {note.get('id')}, Title: {note.get('title')}, Created: {note.get('created_date')}")
+                    if not cursor or input("Show more? (yes/no): ").lower() != 'yes': break
+                    notes, cursor = note_taker.list_notes_page(project_base_path=SCRIPT_DIR, limit=NOTES_PAGE_SIZE, cursor=cursor)
         elif choice == 'N3':
-            keyword = input("Enter keyword to search in notes: ")
+            keyword = input("Enter keyword(s) to search in notes (whole words or their beginnings): ")
             found = note_taker.search_notes(keyword, project_base_path=SCRIPT_DIR)
             if not found: print(f"No notes found with keyword '{keyword}'.")
             else:
@@ -124,6 +194,45 @@ def handle_knowledge_base_menu():
                 success, msg = note_taker.delete_note(note_id, project_base_path=SCRIPT_DIR)
                 print(msg)
             else: print("Deletion cancelled.")
+        elif choice == 'N6':
+            note_id = input("Enter Note ID to edit: ")
+            new_title = input("New title (press Enter to keep the current one): ")
+            print("New content (type '--ENDNOTE--' on a new line to finish; finish immediately to keep the current content):")
+            content_lines = []
+            while True:
+                line = input()
+                if line == "--ENDNOTE--": break
+                content_lines.append(line)
+            success, msg = note_taker.update_note(note_id, project_base_path=SCRIPT_DIR,
+                                                  title=new_title or None,
+                                                  content="\n".join(content_lines) if content_lines else None)
+            print(msg)
+        elif choice == 'N7':
+            source = os.path.abspath(input("Enter a folder of .txt files or a JSONL file: "))
+            if not os.path.exists(source): print(f"'{source}' not found.")
+            else:
+                results = note_taker.import_notes(source, project_base_path=SCRIPT_DIR)
+                for r in results:
+                    if not r["success"]: print(f"  FAILED ({r['source']}): {r['message']}")
+                print(f"Imported {sum(1 for r in results if r['success'])} of {len(results)} note(s).")
+        elif choice == 'N8':
+            query = input("Enter part of a title (typos are fine): ")
+            # Titles containing the text as typed come first; approximate matches only if there are none
+            found = note_taker.fuzzy_search_notes(query, project_base_path=SCRIPT_DIR, substring=True) \
+                or note_taker.fuzzy_search_notes(query, project_base_path=SCRIPT_DIR)
+            if not found: print(f"No note titles resemble '{query}'.")
+            else:
+                print(f"\nNote titles resembling '{query}':")
+                for i, note in enumerate(found): print(f"  {i+1}. ID: {note.get('id')}, Title: {note.get('title')} (Similarity: {note.get('similarity')})")
+        elif choice == 'K1':
+            query = input("Enter search words: ")
+            def show_hit(hit):
+                print(f"  found [{hit['source']}] {hit.get('title')} (Score: {hit.get('score')})")
+            found = kb_query.search_knowledge_base(query, project_base_path=SCRIPT_DIR, on_result=show_hit)
+            if not found: print(f"Nothing in the knowledge base matches '{query}'.")
+            else:
+                print(f"\nBest matches for '{query}' across documents and notes:")
+                for i, hit in enumerate(found): print(f"  {i+1}. [{hit['source']}] ID: {hit.get('id')}, Title: {hit.get('title')} (Score: {hit.get('score')})")
         elif choice == '0': break
         else: print("Invalid KB menu choice.")
         if choice != '0': input("\nPress Enter to return to KB Menu...")
@@ -175,6 +284,9 @@ def handle_experiment_logbook_menu():
         print("L1. Add Log Entry")
         print("L2. View Log File (by date or filename)")
         print("L3. List All Log Files")
+        print("L4. Query Logs (Time Range, Level, Experiment ID)")
+        print("L5. Follow Today's Log (Live, Ctrl+C to Stop)")
+        print("L6. Compress Old Logs (gzip/xz Archives)")
         print("0. Back to Main Menu")
         choice = input("Logbook Menu Choice: ").upper()
 
@@ -188,10 +300,18 @@ def handle_experiment_logbook_menu():
             print(msg)
         elif choice == 'L2':
             identifier = input("Enter log filename (e.g., log_YYYYMMDD.txt) or date (YYYYMMDD or YYYY-MM-DD): ")
-            content, msg = logbook.view_log_file(identifier, project_base_path=SCRIPT_DIR)
+            count = input(f"Lines from the end to show (press Enter for {logbook.DEFAULT_TAIL_LINES}, 'all' for the whole file): ").strip().lower()
+            if count == 'all': # Streamed line by line instead of loading the whole file
+                lines, msg = logbook.iter_log_lines(identifier, project_base_path=SCRIPT_DIR), f"Content of '{identifier}'"
+            else:
+                lines, msg = logbook.tail_log(identifier, project_base_path=SCRIPT_DIR,
+                                              n=int(count) if count.isdigit() else logbook.DEFAULT_TAIL_LINES)
             print(f"\n--- {msg} ---")
-            if content: print(content.strip())
-            else: print("No content found or error retrieving log.")
+            shown = 0
+            for line in lines or ():
+                shown += 1
+                print(logbook.render_log_line(line))
+            if not shown: print("No content found or error retrieving log.")
             print("--- End of Log View ---")
         elif choice == 'L3':
             files, msg = logbook.list_log_files(project_base_path=SCRIPT_DIR)
@@ -199,6 +319,39 @@ def handle_experiment_logbook_menu():
             if files:
                 print("Available log files (most recent first):")
                 for f_name in files: print(f"  - {f_name}")
+        elif choice == 'L4':
+            try:
+                since = input("From (YYYY-MM-DD or YYYY-MM-DDTHH:MM, press Enter for no limit): ").strip()
+                until = input("Until, exclusive (same formats, press Enter for no limit): ").strip()
+                start = logbook.parse_query_time(since) if since else None
+                end = logbook.parse_query_time(until) if until else None
+            except ValueError as e:
+                print(f"Invalid time: {e}")
+            else:
+                levels = input("Levels, comma-separated (press Enter for all): ").replace(" ", "").upper()
+                exp_ids = input("Experiment IDs, comma-separated (press Enter for all): ").replace(" ", "")
+                matches = logbook.query_log_entries(SCRIPT_DIR, start=start, end=end,
+                                                    levels=levels.split(",") if levels else None,
+                                                    experiment_ids=exp_ids.split(",") if exp_ids else None)
+                count = 0
+                for record in matches: # Printed as they are found
+                    count += 1
+                    print(logbook.format_log_record(record))
+                print(f"--- {count} matching entr{'y' if count == 1 else 'ies'} ---")
+        elif choice == 'L5':
+            print("Following today's log; new entries appear as they are written. Press Ctrl+C to stop.")
+            try:
+                for line in logbook.follow_log(SCRIPT_DIR): print(logbook.render_log_line(line))
+            except KeyboardInterrupt:
+                print("\nStopped following.")
+        elif choice == 'L6':
+            days = input("Compress logs older than how many days? ").strip()
+            method = input("Archive format, gzip or xz (press Enter for gzip): ").strip().lower() or "gzip"
+            monthly = input("Roll up into one archive per month? (yes/no): ").strip().lower() == 'yes'
+            if not days.isdigit(): print("Please enter a number of days.")
+            else:
+                success, msg = logbook.compress_old_logs(SCRIPT_DIR, older_than_days=int(days), method=method, monthly=monthly)
+                print(msg)
         elif choice == '0': break
         else: print("Invalid Logbook menu choice.")
         if choice != '0': input("\nPress Enter to return to Logbook Menu...")
@@ -310,9 +463,101 @@ def main_application_loop():
             print("\nInvalid main menu choice. Please try again.")
             input("Press Enter to continue...")
 
+# --- Non-interactive Commands ---
+def run_command(argv):
+    """
+    Runs a one-shot command instead of the interactive menus, e.g.
+        python main.py import-notes notes_folder/
+        python main.py import-notes notes.jsonl --batch-size 1000
+        some_exporter | python main.py import-notes -
+        python main.py query-logs --last-days 90 --level ERROR --experiment MSL-42
+        python main.py tail-log 2024-05-01 -n 100
+        python main.py tail-log --follow
+        python main.py compress-logs --older-than 30 --method xz --monthly
+    Returns the process exit code.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py", description="Planetary Scientist's Assistant commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import-notes", help="Bulk import notes from a folder of .txt files or JSON Lines.")
+    import_parser.add_argument("source", help='Folder of .txt files, JSONL file, or "-" to read JSON Lines from stdin.')
+    import_parser.add_argument("--batch-size", type=int, default=None, help="Notes committed together (default: 500).")
+    query_parser = commands.add_parser("query-logs", help="Print logbook entries by time range, level and experiment ID.")
+    query_parser.add_argument("--since", help="Earliest time, YYYY-MM-DD or YYYY-MM-DDTHH:MM[:SS] (inclusive).")
+    query_parser.add_argument("--until", help="Latest time, same formats (exclusive).")
+    query_parser.add_argument("--last-days", type=int, help="Only the last N days, today included (instead of --since).")
+    query_parser.add_argument("--level", action="append", help="Log level to include (repeatable).")
+    query_parser.add_argument("--experiment", action="append", help="Experiment ID to include (repeatable).")
+    query_parser.add_argument("--json", action="store_true", help="Print one JSON record per line.")
+    tail_parser = commands.add_parser("tail-log", help="Print the end of a daily log, optionally following new entries.")
+    tail_parser.add_argument("log", nargs="?", help="Log filename or date YYYYMMDD / YYYY-MM-DD (default: today).")
+    tail_parser.add_argument("-n", "--lines", type=int, default=None, help="Lines to print (default: 50).")
+    tail_parser.add_argument("-f", "--follow", action="store_true", help="Keep printing new entries until Ctrl+C.")
+    compress_parser = commands.add_parser("compress-logs", help="Compress old daily logs into gzip/xz archives.")
+    compress_parser.add_argument("--older-than", type=int, required=True, help="Minimum age of the logs in days (at least 1).")
+    compress_parser.add_argument("--method", choices=("gzip", "xz"), default="gzip", help="Archive format (default: gzip).")
+    compress_parser.add_argument("--monthly", action="store_true", help="Roll logs up into one archive per month.")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-notes":
+        from knowledge_base import note_taker
+        source = sys.stdin if args.source == "-" else os.path.abspath(args.source)
+        if source is not sys.stdin and not os.path.exists(source):
+            print(f"'{source}' not found.", file=sys.stderr)
+            return 1
+        batch_size = args.batch_size if args.batch_size and args.batch_size > 0 else note_taker.IMPORT_BATCH_SIZE
+        def report_failure(done, result):
+            if not result["success"]: print(f"  FAILED ({result['source']}): {result['message']}", file=sys.stderr)
+        results = note_taker.import_notes(source, project_base_path=SCRIPT_DIR, batch_size=batch_size,
+                                          progress_callback=report_failure)
+        imported = sum(1 for r in results if r["success"])
+        print(f"Imported {imported} of {len(results)} note(s).")
+        return 0 if imported == len(results) else 1
+    if args.command == "query-logs":
+        import json
+        from experiment_support import logbook
+        try:
+            start = logbook.parse_query_time(args.since) if args.since else None
+            end = logbook.parse_query_time(args.until) if args.until else None
+        except ValueError as e:
+            print(f"Invalid time: {e}", file=sys.stderr)
+            return 1
+        if args.last_days:
+            start = logbook.last_days_start(args.last_days)
+        for record in logbook.query_log_entries(SCRIPT_DIR, start=start, end=end, levels=args.level,
+                                                experiment_ids=args.experiment):
+            print(json.dumps(record, ensure_ascii=False) if args.json else logbook.format_log_record(record))
+        return 0
+    if args.command == "tail-log":
+        from experiment_support import logbook
+        identifier = args.log or logbook.get_daily_log_filename()
+        lines, msg = logbook.tail_log(identifier, SCRIPT_DIR, n=logbook.DEFAULT_TAIL_LINES if args.lines is None else args.lines)
+        if lines is None and not args.follow:
+            print(msg, file=sys.stderr)
+            return 1
+        for line in lines or (): print(logbook.render_log_line(line))
+        if args.follow:
+            try:
+                for line in logbook.follow_log(SCRIPT_DIR, args.log): print(logbook.render_log_line(line), flush=True)
+            except KeyboardInterrupt:
+                pass
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+        return 0
+    if args.command == "compress-logs":
+        from experiment_support import logbook
+        success, msg = logbook.compress_old_logs(SCRIPT_DIR, older_than_days=args.older_than, method=args.method,
+                                                 monthly=args.monthly)
+        print(msg, file=sys.stdout if success else sys.stderr)
+        return 0 if success else 1
+    return 2
+
 if __name__ == "__main__":
     # This structure assumes main.py is inside 'planetary_scientist_assistant' directory,
     # and this directory is the root for all its modules and data subdirectories.
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     main_application_loop()
 
 def add_document(file_path, project_base_path):
@@ -0,0 +1,461 @@
+# planetary_scientist_assistant/tests/test_document_manager.py
+import unittest
+from unittest import mock
+import os
+import sys
+import io
+import hashlib
+import json
+import shutil
+import tempfile
+import multiprocessing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) # .../tests/
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) # .../planetary_scientist_assistant/
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from knowledge_base import derived_db, document_manager, doc_catalog, file_lock, index_store, text_scan
+
+def _search_in_process(docs_dir, results):
+    document_manager.PROJECT_ROOT_DOCS_DIR = docs_dir
+    document_manager.PROJECT_ROOT_KB_METADATA_PATH = os.path.join(docs_dir, document_manager.METADATA_FILE)
+    derived_db.CONNECT_TIMEOUT_SECONDS = doc_catalog.CONNECT_TIMEOUT_SECONDS = 0.5 # Fail fast instead of waiting
+    try:
+        results.put([d["original_filename"] for d in document_manager.search_documents_by_keyword("olivine")])
+    except Exception as e:
+        results.put(repr(e))
+
+def _add_documents_in_process(docs_dir, file_paths):
+    document_manager.PROJECT_ROOT_DOCS_DIR = docs_dir
+    document_manager.PROJECT_ROOT_KB_METADATA_PATH = os.path.join(docs_dir, document_manager.METADATA_FILE)
+    for file_path in file_paths:
+        success, msg = document_manager.add_document(file_path)
+        assert success, msg
+
+class TestDocumentManager(unittest.TestCase):
+
+    def setUp(self):
+        # Point the document manager at a throwaway knowledge base
+        self.tmp_dir = tempfile.mkdtemp()
+        self.docs_dir = os.path.join(self.tmp_dir, "local_documents")
+        self.src_dir = os.path.join(self.tmp_dir, "src")
+        os.makedirs(self.src_dir)
+        self._saved_paths = (document_manager.PROJECT_ROOT_DOCS_DIR, document_manager.PROJECT_ROOT_KB_METADATA_PATH)
+        document_manager.PROJECT_ROOT_DOCS_DIR = self.docs_dir
+        document_manager.PROJECT_ROOT_KB_METADATA_PATH = os.path.join(self.docs_dir, document_manager.METADATA_FILE)
+
+    def tearDown(self):
+        document_manager.PROJECT_ROOT_DOCS_DIR, document_manager.PROJECT_ROOT_KB_METADATA_PATH = self._saved_paths
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _make_source(self, filename, content):
+        path = os.path.join(self.src_dir, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    # --- Keyword Index ---
+    def test_search_uses_index(self):
+        document_manager.add_document(self._make_source("olivine.txt", "Olivine abundance near Gale crater."))
+        document_manager.add_document(self._make_source("jarosite.txt", "Jarosite detected at Meridiani."))
+
+        found = [d["original_filename"] for d in document_manager.search_documents_by_keyword("OLIVINE")]
+        self.assertEqual(found, ["olivine.txt"])
+
+        # Search must not need the stored files once they are indexed
+        os.remove(document_manager.get_document_path("jarosite.txt"))
+        found = [d["original_filename"] for d in document_manager.search_documents_by_keyword("jarosite")]
+        self.assertEqual(found, ["jarosite.txt"])
+
+    def test_multi_word_keyword_requires_all_words(self):
+        document_manager.add_document(self._make_source("a.txt", "olivine abundance"))
+        document_manager.add_document(self._make_source("b.txt", "olivine only"))
+        found = [d["original_filename"] for d in document_manager.search_documents_by_keyword("abundance olivine")]
+        self.assertEqual(found, ["a.txt"])
+
+    def test_keyword_matches_word_beginnings(self):
+        document_manager.add_document(self._make_source("a.txt", "Planetary packagers at work"))
+        document_manager.add_document(self._make_source("b.txt", "A planet"))
+        found = sorted(d["original_filename"] for d in document_manager.search_documents_by_keyword("planet"))
+        self.assertEqual(found, ["a.txt", "b.txt"])
+        found = [d["original_filename"] for d in document_manager.search_documents_by_keyword("packager plan")]
+        self.assertEqual(found, ["a.txt"])
+        self.assertEqual(document_manager.search_documents_by_keyword("lanet"), []) # Not from inside a word
+
+    def test_remove_document_updates_index(self):
+        document_manager.add_document(self._make_source("mars.txt", "Mars dust storm"))
+        success, msg = document_manager.remove_document("mars.txt")
+        self.assertTrue(success, msg)
+        self.assertEqual(document_manager.search_documents_by_keyword("dust"), [])
+        with index_store.open_index(document_manager._get_index_path()) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0], 0)
+            self.assertEqual(index_store.lookup(conn, "dust"), {})
+
+    def test_missing_index_is_rebuilt(self):
+        document_manager.add_document(self._make_source("venus.txt", "Venus sulfuric clouds"))
+        os.remove(document_manager._get_index_path())
+        found = document_manager.search_documents_by_keyword("sulfuric")
+        self.assertEqual(len(found), 1)
+        self.assertTrue(os.path.exists(document_manager._get_index_path()))
+
+        with open(document_manager._get_index_path(), 'wb') as f: # Unreadable: replaced and rebuilt
+            f.write(b"not a database" * 100)
+        self.assertEqual(len(document_manager.search_documents_by_keyword("clouds")), 1)
+
+    def test_updates_write_only_the_changed_postings(self):
+        document_manager.add_document(self._make_source("a.txt", "olivine basalt"))
+        with mock.patch.object(index_store, "rebuild", side_effect=AssertionError("rebuilt")):
+            document_manager.add_document(self._make_source("b.txt", "olivine dust"))
+            document_manager.remove_document("a.txt")
+            self.assertEqual([d["original_filename"] for d in document_manager.search_documents_by_keyword("olivine")],
+                             ["b.txt"])
+
+    # --- Text Cache ---
+    def test_text_is_extracted_once_and_reused(self):
+        document_manager.add_document(self._make_source("titan.txt", "Titan methane lakes"))
+        with mock.patch.object(document_manager, "_extract_text", side_effect=AssertionError("re-extracted")):
+            self.assertEqual(document_manager.get_document_text("titan.txt"), "Titan methane lakes")
+            os.remove(document_manager._get_index_path())
+            self.assertEqual(len(document_manager.search_documents_by_keyword("methane")), 1)
+
+    def test_stale_cache_is_rebuilt(self):
+        document_manager.add_document(self._make_source("io.txt", "Io volcanoes"))
+        stored_path = document_manager.get_document_path("io.txt")
+
+        # Touching the file without changing bytes keeps the cached text (hash still matches)
+        stat = os.stat(stored_path)
+        os.utime(stored_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with mock.patch.object(document_manager, "_extract_text", side_effect=AssertionError("re-extracted")):
+            self.assertEqual(document_manager.get_document_text("io.txt"), "Io volcanoes")
+
+        with open(stored_path, 'w', encoding='utf-8') as f:
+            f.write("Io sulfur plumes, much longer text")
+        self.assertEqual(document_manager.get_document_text("io.txt"), "Io sulfur plumes, much longer text")
+
+    def test_remove_document_drops_cache(self):
+        document_manager.add_document(self._make_source("europa.txt", "Europa ice shell"))
+        cache_dir = document_manager._get_text_cache_dir()
+        self.assertTrue(os.listdir(cache_dir))
+        document_manager.remove_document("europa.txt")
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    # --- Parallel Ingestion ---
+    def test_ingest_documents_isolates_failures(self):
+        document_manager.add_document(self._make_source("existing.txt", "already here"))
+        paths = [self._make_source("one.txt", "olivine grains"),
+                 os.path.join(self.src_dir, "missing.txt"),
+                 self._make_source("two.txt", "olivine and pyroxene"),
+                 os.path.join(self.src_dir, "existing.txt")]
+        progress = []
+        with mock.patch.object(doc_catalog, "put_documents", wraps=doc_catalog.put_documents) as save:
+            results = document_manager.ingest_documents(paths, max_workers=2,
+                                                        progress_callback=lambda done, total, r: progress.append((done, total)))
+            self.assertEqual(save.call_count, 1) # Metadata committed once for the whole batch
+
+        self.assertEqual([r["success"] for r in results], [True, False, True, False])
+        self.assertEqual(sorted(progress), [(i, 4) for i in range(1, 5)])
+        found = sorted(d["original_filename"] for d in document_manager.search_documents_by_keyword("olivine"))
+        self.assertEqual(found, ["one.txt", "two.txt"])
+        self.assertEqual(document_manager.get_document_text("two.txt"), "olivine and pyroxene")
+
+    # --- Batch Import ---
+    def test_add_documents_from_directory(self):
+        self._make_source("a.txt", "basalt")
+        self._make_source("b.txt", "basalt and regolith")
+        os.makedirs(os.path.join(self.src_dir, "nested"))
+        with mock.patch.object(doc_catalog, "put_documents", wraps=doc_catalog.put_documents) as save:
+            results = document_manager.add_documents(self.src_dir)
+            self.assertEqual(save.call_count, 1)
+        self.assertEqual([(r["doc_id"], r["success"]) for r in results], [("a.txt", True), ("b.txt", True)])
+        self.assertEqual(len(document_manager.search_documents_by_keyword("basalt")), 2)
+
+        # Re-importing reports every file as a duplicate without touching metadata
+        results = document_manager.add_documents([os.path.join(self.src_dir, "a.txt")])
+        self.assertFalse(results[0]["success"])
+        self.assertIn("already exists", results[0]["message"])
+
+    def test_add_document_keeps_single_file_api(self):
+        success, msg = document_manager.add_document(self._make_source("c.txt", "craters"))
+        self.assertTrue(success)
+        self.assertEqual(msg, "Document 'c.txt' added successfully to the knowledge base.")
+        success, msg = document_manager.add_document(os.path.join(self.src_dir, "nope.txt"))
+        self.assertFalse(success)
+        self.assertIn("not found", msg)
+
+    # --- Content-Addressed Store ---
+    def test_identical_content_is_stored_once(self):
+        document_manager.add_document(self._make_source("paper.txt", "Phyllosilicates in Jezero"))
+        success, msg = document_manager.add_document(self._make_source("paper_copy.txt", "Phyllosilicates in Jezero"))
+        self.assertTrue(success, msg)
+        self.assertIn("not copied again", msg)
+
+        path = document_manager.get_document_path("paper.txt")
+        self.assertEqual(path, document_manager.get_document_path("paper_copy.txt"))
+        self.assertEqual(os.path.basename(path), content_hash_of("Phyllosilicates in Jezero") + ".txt")
+        self.assertEqual(len(document_manager.search_documents_by_keyword("jezero")), 2)
+
+        # The shared blob survives until its last reference is removed
+        document_manager.remove_document("paper.txt")
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(document_manager.get_document_text("paper_copy.txt"), "Phyllosilicates in Jezero")
+        document_manager.remove_document("paper_copy.txt")
+        self.assertFalse(os.path.exists(path))
+
+    def test_same_name_is_still_rejected(self):
+        document_manager.add_document(self._make_source("notes.txt", "first"))
+        os.makedirs(os.path.join(self.src_dir, "other"))
+        other = os.path.join(self.src_dir, "other", "notes.txt")
+        with open(other, 'w', encoding='utf-8') as f:
+            f.write("second")
+        success, msg = document_manager.add_document(other)
+        self.assertFalse(success)
+        self.assertIn("already exists", msg)
+
+    # --- Ranked Search ---
+    def test_ranked_search_orders_by_bm25(self):
+        document_manager.add_document(self._make_source("dust.txt", "dust dust dust storm on Mars"))
+        document_manager.add_document(self._make_source("storm.txt", "a storm with some dust"))
+        document_manager.add_document(self._make_source("ice.txt", "polar ice caps"))
+
+        ranked = document_manager.search_documents_ranked("dust storm")
+        self.assertEqual([d["original_filename"] for d in ranked], ["dust.txt", "storm.txt"])
+        self.assertGreater(ranked[0]["score"], ranked[1]["score"])
+        self.assertEqual(len(document_manager.search_documents_ranked("dust storm", top_k=1)), 1)
+        self.assertEqual(document_manager.search_documents_ranked("olivine"), [])
+
+    def test_index_statistics_follow_removal(self):
+        document_manager.add_document(self._make_source("a.txt", "one two three"))
+        document_manager.add_document(self._make_source("b.txt", "four five"))
+        document_manager.remove_document("a.txt")
+        with index_store.open_index(document_manager._get_index_path()) as conn:
+            self.assertEqual(dict(conn.execute("SELECT doc_id, length FROM documents")), {"b.txt": 2})
+            self.assertEqual((derived_db.get_meta(conn, "document_count"), derived_db.get_meta(conn, "total_length")),
+                             (1, 2))
+            statements = []
+            conn.set_trace_callback(statements.append)
+            self.assertEqual([doc_id for doc_id, _ in index_store.rank_bm25(conn, "five")], ["b.txt"])
+            conn.set_trace_callback(None)
+            self.assertFalse([sql for sql in statements if "COUNT(" in sql]) # Statistics come from meta, not a scan
+
+    # --- Boolean / Phrase Queries ---
+    def _query(self, query):
+        found, msg = document_manager.search_documents_query(query)
+        self.assertIsNotNone(found, msg)
+        return sorted(d["original_filename"] for d in found)
+
+    def test_phrase_boolean_and_prefix_queries(self):
+        document_manager.add_document(self._make_source("gale.txt", "Olivine abundance in Gale crater; jarosite traces."))
+        document_manager.add_document(self._make_source("meridiani.txt", "Jarosite at Meridiani. Abundance of olivine is low."))
+        document_manager.add_document(self._make_source("jezero.txt", "Sulfate and carbonate minerals in Jezero."))
+
+        self.assertEqual(self._query('"olivine abundance"'), ["gale.txt"])
+        self.assertEqual(self._query("olivine abundance"), ["gale.txt", "meridiani.txt"])
+        self.assertEqual(self._query("jarosite AND NOT Gale"), ["meridiani.txt"])
+        self.assertEqual(self._query("sulf* OR gale"), ["gale.txt", "jezero.txt"])
+        self.assertEqual(self._query("NOT (jarosite OR carbonate)"), [])
+        self.assertEqual(self._query('(jezero OR meridiani) AND "abundance of olivine"'), ["meridiani.txt"])
+
+    def test_only_phrase_queries_read_positions(self):
+        document_manager.add_document(self._make_source("gale.txt", "Olivine abundance in Gale crater."))
+        document_manager.add_document(self._make_source("jezero.txt", "Abundance of olivine in Jezero; sulfate."))
+        with mock.patch.object(index_store, "json") as index_json: # Positions are the only JSON in the index
+            index_json.loads.side_effect = AssertionError("positions read")
+            self.assertEqual(len(document_manager.search_documents_by_keyword("olivine abundance")), 2)
+            self.assertEqual(len(document_manager.search_documents_ranked("olivine")), 2)
+            self.assertEqual(self._query("sulf* OR crat* OR zzz*"), ["gale.txt", "jezero.txt"])
+        self.assertEqual(self._query('"abundance of olivine"'), ["jezero.txt"])
+        self.assertEqual(self._query('"olivine of abundance"'), [])
+
+    def test_malformed_query_reports_error(self):
+        for query in ('"unclosed phrase', "(olivine OR", "AND", ""):
+            found, msg = document_manager.search_documents_query(query)
+            self.assertIsNone(found, query)
+            self.assertTrue(msg.startswith("Error"), msg)
+
+    # --- SQLite Catalog ---
+    def test_legacy_metadata_json_is_migrated_once(self):
+        os.makedirs(self.docs_dir)
+        legacy_path = os.path.join(self.docs_dir, "old.txt")
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            f.write("Legacy Viking lander report")
+        with open(document_manager.PROJECT_ROOT_KB_METADATA_PATH, 'w') as f:
+            json.dump({"old.txt": {"original_filename": "old.txt", "path_in_kb": legacy_path,
+                                   "import_date": "2023-01-01T00:00:00", "size_bytes": 27, "file_type": ".txt"}}, f)
+
+        docs = document_manager.list_documents()
+        self.assertEqual([d["original_filename"] for d in docs], ["old.txt"])
+        self.assertFalse(os.path.exists(document_manager.PROJECT_ROOT_KB_METADATA_PATH))
+        self.assertTrue(os.path.exists(document_manager.PROJECT_ROOT_KB_METADATA_PATH + ".migrated"))
+        self.assertEqual(document_manager.get_document_path("old.txt"), legacy_path)
+        self.assertEqual(len(document_manager.search_documents_by_keyword("viking")), 1)
+        success, msg = document_manager.remove_document("old.txt")
+        self.assertTrue(success, msg)
+        self.assertFalse(os.path.exists(legacy_path))
+
+    def test_find_documents_filters(self):
+        document_manager.add_document(self._make_source("small.txt", "a"))
+        document_manager.add_document(self._make_source("large.txt", "a" * 100))
+        self.assertEqual([d["original_filename"] for d in document_manager.find_documents(min_size=50)], ["large.txt"])
+        self.assertEqual(len(document_manager.find_documents(file_type=".txt")), 2)
+        self.assertEqual(document_manager.find_documents(file_type=".pdf"), [])
+        self.assertEqual(document_manager.find_documents(imported_before="2000-01-01"), [])
+
+    # --- Fuzzy Filename Search ---
+    def test_fuzzy_find_documents_by_filename(self):
+        document_manager.add_documents([self._make_source("mars_spectra_2024.txt", "a"),
+                                        self._make_source("europa_ice_shell.txt", "b"),
+                                        self._make_source("spectrometer_calibration.txt", "c")])
+        found = document_manager.fuzzy_find_documents("spectra")
+        self.assertEqual(found[0]["original_filename"], "mars_spectra_2024.txt")
+        self.assertEqual(found[0]["similarity"], 1.0)
+        self.assertEqual(document_manager.fuzzy_find_documents("eurpa ice")[0]["original_filename"],
+                         "europa_ice_shell.txt")
+        self.assertEqual([(d["original_filename"], d["similarity"])
+                          for d in document_manager.fuzzy_find_documents("pectr", substring=True)],
+                         [("mars_spectra_2024.txt", 1.0), ("spectrometer_calibration.txt", 1.0)])
+
+        document_manager.remove_document("europa_ice_shell.txt")
+        self.assertEqual(document_manager.fuzzy_find_documents("europa"), [])
+        os.remove(os.path.join(self.docs_dir, document_manager.FILENAME_TRIGRAMS_FILENAME)) # Rebuilt when missing
+        self.assertEqual(document_manager.fuzzy_find_documents("calibraton")[0]["original_filename"],
+                         "spectrometer_calibration.txt")
+
+    # --- Multi-process Safety ---
+    @unittest.skipIf(file_lock.fcntl is None, "advisory file locks need fcntl")
+    def test_concurrent_sessions_do_not_lose_index_updates(self):
+        context = multiprocessing.get_context("fork")
+        workers = []
+        for n in range(4):
+            paths = [self._make_source(f"p{n}_{i}.txt", f"regolith sample {n} {i}") for i in range(8)]
+            workers.append(context.Process(target=_add_documents_in_process, args=(self.docs_dir, paths)))
+        for worker in workers: worker.start()
+        for worker in workers: worker.join()
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+        self.assertEqual(len(document_manager.list_documents()), 32)
+        self.assertEqual(len(document_manager.search_documents_by_keyword("regolith")), 32)
+
+    def test_readers_in_other_processes_proceed_during_a_write(self):
+        document_manager.add_document(self._make_source("olivine.txt", "Olivine abundance"))
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        with document_manager._open_catalog() as catalog, document_manager._open_search_index() as index:
+            for conn in (catalog, index):
+                conn.execute("PRAGMA cache_size = 1") # A large batch: changes spill to disk before the commit
+            doc_catalog.put_documents(catalog, {f"bulk{i}.txt": {"original_filename": f"bulk{i}.txt"} for i in range(500)})
+            for i in range(500):
+                index_store.add_to_index(index, f"bulk{i}.txt", f"olivine filler {i} " * 20)
+            reader = context.Process(target=_search_in_process, args=(self.docs_dir, results))
+            reader.start()
+            found = results.get(timeout=30)
+            reader.join()
+        self.assertEqual(found, ["olivine.txt"]) # The last committed state, read without waiting
+
+    def test_commit_rejects_name_claimed_by_another_session(self):
+        path = self._make_source("claimed.txt", "first session")
+        real_ingest = document_manager._ingest_worker
+        def ingest_while_another_session_commits(*args):
+            outcome = real_ingest(*args)
+            # Another session commits the same name between our extraction and our commit
+            with document_manager._open_catalog() as conn:
+                doc_catalog.put_documents(conn, {"claimed.txt": dict(outcome[0])})
+            return outcome
+        with mock.patch.object(document_manager, "_ingest_worker", side_effect=ingest_while_another_session_commits):
+            results = document_manager.add_documents([path])
+        self.assertFalse(results[0]["success"])
+        self.assertIn("already exists", results[0]["message"])
+
+    # --- Large File Scan ---
+    def test_scan_document_returns_byte_offsets(self):
+        document_manager.add_document(self._make_source("dump.txt", "xx Olivine yy OLIVINE zz"))
+        self.assertEqual(document_manager.scan_document("dump.txt", "olivine"), [3, 14])
+        self.assertEqual(document_manager.scan_document("dump.txt", "olivine", max_hits=1), [3])
+        self.assertIsNone(document_manager.scan_document("missing.txt", "olivine"))
+
+    # --- Compression ---
+    def test_compressed_documents_are_transparent(self):
+        for method in ("zlib", "lzma"):
+            text = f"xx Olivine yy OLIVINE zz {method} " + "basalt " * 1000
+            with mock.patch.object(document_manager, "DOCUMENT_COMPRESSION", method):
+                document_manager.add_document(self._make_source(f"{method}.txt", text))
+            info = next(d for d in document_manager.list_documents() if d["original_filename"] == f"{method}.txt")
+            self.assertEqual(info["compression"], method)
+            self.assertEqual(info["size_bytes"], len(text))
+            self.assertLess(info["stored_size_bytes"], len(text))
+
+            self.assertEqual(document_manager.scan_document(f"{method}.txt", "olivine"), [3, 14])
+            with document_manager.open_document(f"{method}.txt") as stream:
+                self.assertEqual(stream.read().decode('utf-8'), text)
+            with open(document_manager.get_document_path(f"{method}.txt"), encoding='utf-8') as f:
+                self.assertEqual(f.read(), text) # Consumers needing a real file get a plain copy
+        self.assertEqual(sorted(d["original_filename"] for d in document_manager.search_documents_by_keyword("olivine")),
+                         ["lzma.txt", "zlib.txt"])
+        self.assertEqual(document_manager.refresh_documents()["changed"], [])
+
+        plain_copy = document_manager.get_document_path("zlib.txt")
+        document_manager.remove_document("zlib.txt")
+        self.assertFalse(os.path.exists(plain_copy))
+
+    def test_same_content_is_stored_once_whatever_the_compression(self):
+        text = "Gypsum veins " * 200
+        document_manager.add_document(self._make_source("plain.txt", text))
+        with mock.patch.object(document_manager, "DOCUMENT_COMPRESSION", "zlib"):
+            success, msg = document_manager.add_document(self._make_source("again.txt", text))
+        self.assertTrue(success, msg)
+        details = {d["original_filename"]: d for d in document_manager.list_documents()}
+        self.assertEqual(details["again.txt"]["path_in_kb"], details["plain.txt"]["path_in_kb"])
+        self.assertNotIn("compression", details["again.txt"]) # The existing plain blob is reused as it is
+        blobs = [name for _, _, names in os.walk(document_manager._get_objects_dir()) for name in names]
+        self.assertEqual(len(blobs), 1)
+
+        document_manager.remove_document("plain.txt")
+        with document_manager.open_document("again.txt") as stream:
+            self.assertEqual(stream.read().decode('utf-8'), text)
+        self.assertEqual(len(document_manager.search_documents_by_keyword("gypsum")), 1)
+
+    def test_refresh_reindexes_only_changed_files(self):
+        document_manager.add_document(self._make_source("edited.txt", "old basalt text"))
+        document_manager.add_document(self._make_source("same.txt", "untouched gypsum"))
+        document_manager.add_document(self._make_source("gone.txt", "vanishing hematite"))
+
+        edited_path = document_manager.get_document_path("edited.txt")
+        with open(edited_path, 'w', encoding='utf-8') as f:
+            f.write("new andesite text, longer")
+        os.remove(document_manager.get_document_path("gone.txt"))
+
+        with mock.patch.object(document_manager, "_extract_text", wraps=document_manager._extract_text) as extract:
+            report = document_manager.refresh_documents()
+            self.assertEqual(extract.call_count, 1) # Only the edited file is extracted again
+        self.assertEqual(report, {"checked": 3, "changed": ["edited.txt"], "removed": ["gone.txt"]})
+
+        self.assertEqual(document_manager.search_documents_by_keyword("basalt"), [])
+        self.assertEqual(len(document_manager.search_documents_by_keyword("andesite")), 1)
+        self.assertEqual(document_manager.search_documents_by_keyword("hematite"), [])
+        self.assertEqual(sorted(d["original_filename"] for d in document_manager.list_documents()), ["edited.txt", "same.txt"])
+
+        # The edited file moved to the address of its new content
+        new_path = document_manager.get_document_path("edited.txt")
+        self.assertNotEqual(new_path, edited_path)
+        self.assertEqual(os.path.basename(new_path), content_hash_of("new andesite text, longer") + ".txt")
+        self.assertEqual(document_manager.refresh_documents()["changed"], [])
+
+
+class TestTextScan(unittest.TestCase):
+
+    def test_matches_across_chunk_boundaries(self):
+        data = b"abcSULFATEdefsulfate" * 5
+        expected = [i for i in range(len(data)) if data[i:i + 7].lower() == b"sulfate"]
+        for chunk_size in (1, 2, 3, 7, 8, 64):
+            offsets = list(text_scan.iter_match_offsets(io.BytesIO(data), "Sulfate", chunk_size=chunk_size))
+            self.assertEqual(offsets, expected, f"chunk_size={chunk_size}")
+
+    def test_overlapping_matches(self):
+        self.assertEqual(list(text_scan.iter_match_offsets(io.BytesIO(b"aaaa"), "aa", chunk_size=1)), [0, 1, 2])
+
+
+def content_hash_of(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# planetary_scientist_assistant/tests/test_kb_query.py
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) # .../tests/
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) # .../planetary_scientist_assistant/
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from unittest import mock
+from knowledge_base import document_manager, kb_query, note_taker
+
+
+class TestKnowledgeBaseQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.docs_dir = os.path.join(self.base, "local_documents")
+        self._saved_paths = (document_manager.PROJECT_ROOT_DOCS_DIR, document_manager.PROJECT_ROOT_KB_METADATA_PATH)
+        document_manager.PROJECT_ROOT_DOCS_DIR = self.docs_dir
+        document_manager.PROJECT_ROOT_KB_METADATA_PATH = os.path.join(self.docs_dir, document_manager.METADATA_FILE)
+        for filename, content in (("olivine.txt", "Olivine olivine olivine at Gale crater."),
+                                  ("basalt.txt", "Basalt plains, no mention of the mineral.")):
+            path = os.path.join(self.base, filename)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            document_manager.add_document(path)
+        note_taker.add_note("Jezero olivine", "Olivine-rich unit seen by the rover.", self.base)
+        note_taker.add_note("Shopping", "Nothing relevant.", self.base)
+
+    def tearDown(self):
+        document_manager.PROJECT_ROOT_DOCS_DIR, document_manager.PROJECT_ROOT_KB_METADATA_PATH = self._saved_paths
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def test_merged_ranking_tags_each_source(self):
+        streamed = []
+        found = kb_query.search_knowledge_base("olivine", self.base, on_result=streamed.append)
+        self.assertEqual(sorted((hit["source"], hit["title"]) for hit in found),
+                         [("document", "olivine.txt"), ("note", "Jezero olivine")])
+        note_id = note_taker.search_notes("jezero", self.base)[0]["id"]
+        self.assertEqual(sorted((hit["source"], hit["id"]) for hit in found),
+                         [("document", "olivine.txt"), ("note", note_id)])
+        self.assertEqual([hit["score"] for hit in found], sorted((hit["score"] for hit in found), reverse=True))
+        self.assertEqual(len(streamed), 2)
+        self.assertEqual(kb_query.search_knowledge_base("olivine", self.base, top_k=1), found[:1])
+        self.assertEqual([hit["source"] for hit in kb_query.search_knowledge_base("olivine", self.base, sources=["note"])],
+                         ["note"])
+        self.assertEqual(kb_query.search_knowledge_base("", self.base), [])
+        with self.assertRaises(ValueError):
+            list(kb_query.stream_knowledge_base("olivine", self.base, sources=["web"]))
+
+    def test_scores_are_normalized_per_source(self):
+        for i in range(3):
+            note_taker.add_note(f"Olivine {i}", "olivine " * (i + 1), self.base)
+        found = kb_query.search_knowledge_base("olivine", self.base)
+        for source in ("document", "note"):
+            hits = [hit for hit in found if hit["source"] == source]
+            self.assertEqual(hits[0]["score"], 1.0) # Each source's best hit
+            self.assertTrue(all(0 < hit["score"] <= 1.0 and hit["bm25_score"] > 0 for hit in hits))
+        self.assertEqual([hit["score"] for hit in found], sorted((hit["score"] for hit in found), reverse=True))
+
+    def test_sources_are_searched_concurrently(self):
+        # The document search waits for the note search to start, so a sequential
+        # implementation would deadlock (and time out) here.
+        notes_started = threading.Event()
+        search_notes = note_taker.search_notes_ranked
+        search_documents = document_manager.search_documents_ranked
+
+        def slow_documents(*args, **kwargs):
+            self.assertTrue(notes_started.wait(timeout=5))
+            return search_documents(*args, **kwargs)
+
+        def signalling_notes(*args, **kwargs):
+            notes_started.set()
+            return search_notes(*args, **kwargs)
+
+        with mock.patch.object(document_manager, "search_documents_ranked", side_effect=slow_documents), \
+             mock.patch.object(note_taker, "search_notes_ranked", side_effect=signalling_notes):
+            sources = [hit["source"] for hit in kb_query.stream_knowledge_base("olivine", self.base,
+                                                                              sources=["document", "note"])]
+        self.assertEqual(sorted(sources), ["document", "note"])
+
+
+if __name__ == '__main__':
+    unittest.main()
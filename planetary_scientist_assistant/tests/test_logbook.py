@@ -0,0 +1,347 @@
+# planetary_scientist_assistant/tests/test_logbook.py
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) # .../tests/
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) # .../planetary_scientist_assistant/
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from experiment_support import log_index, log_writer, logbook
+from knowledge_base import file_lock
+
+def _compress_in_process(base, start):
+    start.wait()
+    success, msg = logbook.compress_old_logs(base, older_than_days=1, method="gzip", monthly=True)
+    assert success, msg
+
+
+class TestLogbook(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logbook.stop_buffered_logging(self.base)
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _today(self):
+        content, msg = logbook.view_log_file(logbook.get_daily_log_filename(), self.base)
+        return content
+
+    # --- Basic Operations ---
+    def test_add_and_view_entries(self):
+        self.assertTrue(logbook.add_log_entry("System initialized.", self.base, experiment_id="EXP001")[0])
+        self.assertTrue(logbook.add_log_entry("Out of range.", self.base, level="warning")[0])
+        self.assertFalse(logbook.add_log_entry("", self.base)[0])
+        lines = self._today().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith("[INFO] [ExpID: EXP001]: System initialized."))
+        self.assertTrue(lines[1].endswith("[WARNING]: Out of range."))
+
+    # --- Buffered Writer ---
+    def test_buffered_entries_written_in_batches(self):
+        with mock.patch.object(logbook, "_write_entries", wraps=logbook._write_entries) as write:
+            logbook.start_buffered_logging(self.base, batch_size=100, flush_interval=60)
+            for i in range(250):
+                self.assertTrue(logbook.add_log_entry(f"event {i}", self.base, experiment_id="RUN")[0])
+            success, msg = logbook.flush_log_entries(self.base)
+            self.assertTrue(success, msg)
+            self.assertEqual(write.call_count, 3) # Two full batches, then the flush
+        lines = self._today().splitlines()
+        self.assertEqual([line.rsplit(": ", 1)[1] for line in lines], [f"event {i}" for i in range(250)])
+
+        self.assertTrue(logbook.stop_buffered_logging(self.base)[0])
+        logbook.add_log_entry("direct again", self.base)
+        self.assertTrue(self._today().endswith(": direct again\n"))
+
+    def test_buffered_entries_written_after_flush_interval(self):
+        logbook.start_buffered_logging(self.base, batch_size=1000, flush_interval=0.05)
+        written = threading.Event()
+        with mock.patch.object(logbook, "_write_entries", side_effect=lambda *args: written.set()):
+            logbook.add_log_entry("lonely event", self.base)
+            self.assertTrue(written.wait(timeout=5)) # No flush call needed
+
+    def test_full_queue_applies_backpressure(self):
+        release = threading.Event()
+        writer = log_writer.BufferedLogWriter(lambda batch: release.wait(), batch_size=1, max_queue=2)
+        self.assertTrue(writer.put("first")) # Taken by the (blocked) writer thread
+        self.assertFalse(writer.flush(timeout=0.01))
+        self.assertTrue(writer.put("second", timeout=1))
+        self.assertFalse(writer.put("third", timeout=0.05)) # Queue holds the flush marker and "second"
+        release.set()
+        self.assertTrue(writer.close(timeout=5))
+        self.assertEqual(writer.written, 2)
+        self.assertFalse(writer.put("late"))
+
+    def test_write_errors_are_reported(self):
+        logbook.start_buffered_logging(self.base)
+        with mock.patch.object(logbook, "_write_entries", side_effect=OSError("disk full")):
+            logbook.add_log_entry("lost", self.base)
+            logbook.add_log_entry("also lost", self.base)
+            success, msg = logbook.flush_log_entries(self.base)
+        self.assertFalse(success)
+        self.assertIn("disk full", msg)
+        self.assertIn("2 dropped", msg)
+        self.assertEqual(logbook._get_buffered_writer(self.base).dropped, 2)
+
+        # The failure was reported once; later writes succeed and flush cleanly
+        logbook.add_log_entry("kept", self.base)
+        self.assertTrue(logbook.flush_log_entries(self.base)[0])
+        self.assertTrue(logbook.stop_buffered_logging(self.base)[0])
+        self.assertTrue(self._today().endswith(": kept\n"))
+
+
+    # --- Structured Logs ---
+    def _add_at(self, moment, text, level="INFO", experiment_id=None):
+        with mock.patch.object(logbook, "datetime", wraps=datetime) as fake_datetime:
+            fake_datetime.now.return_value = moment
+            success, msg = logbook.add_log_entry(text, self.base, experiment_id=experiment_id, level=level)
+        self.assertTrue(success, msg)
+
+    def test_jsonl_records_and_index(self):
+        day = datetime(2024, 3, 1)
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL):
+            self._add_at(day.replace(hour=9), "Boot", experiment_id="MSL-42")
+            self._add_at(day.replace(hour=9, minute=5), "Sensor \"A\" failed", level="error", experiment_id="MSL-42")
+            self._add_at(day.replace(hour=14), "Other run failed", level="ERROR", experiment_id="M2020")
+            self._add_at(day.replace(hour=14, minute=1), "Idle")
+            self.assertEqual(logbook.list_log_files(self.base)[0], ["log_20240301.jsonl"])
+            content, msg = logbook.view_log_file("2024-03-01", self.base)
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(records[1], {"timestamp": "2024-03-01T09:05:00.000", "level": "ERROR",
+                                      "experiment_id": "MSL-42", "text": 'Sensor "A" failed'})
+
+        log_path = os.path.join(logbook.get_log_files_dir(self.base), "log_20240301.jsonl")
+        saved = log_index.load_index(log_path) # Writers save it when a block starts: the last entry is not in yet
+        self.assertLess(saved["size"], os.path.getsize(log_path))
+
+        found = logbook.read_log_records("20240301", self.base, levels=["error"], experiment_ids=["MSL-42"])
+        self.assertEqual([r["text"] for r in found], ['Sensor "A" failed'])
+        index = log_index.load_index(log_path) # Caught up and saved by the query
+        self.assertEqual(index["size"], os.path.getsize(log_path))
+        self.assertEqual(len(index["blocks"]), 2) # A new block starts with every hour
+        self.assertEqual(index["levels"], {"INFO": [0, 1], "ERROR": [0, 1]})
+        self.assertEqual(index["experiments"], {"MSL-42": [0], "M2020": [1]})
+        with mock.patch.object(log_index, "read_block", wraps=log_index.read_block) as read_block:
+            self.assertEqual([r["text"] for r in logbook.read_log_records("20240301", self.base, hours=[14])],
+                             ["Other run failed", "Idle"])
+            self.assertEqual(read_block.call_count, 1) # The 09:00 block is never read
+        self.assertEqual(list(logbook.read_log_records("20240301", self.base, experiment_ids=["none"])), [])
+
+    def test_writers_save_the_index_once_per_block(self):
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL), \
+             mock.patch.object(log_index, "BLOCK_MAX_BYTES", 1000), \
+             mock.patch.object(log_index, "save_index", wraps=log_index.save_index) as save_index, \
+             mock.patch.object(log_index, "load_index", wraps=log_index.load_index) as load_index:
+            for i in range(60):
+                self._add_at(datetime(2024, 3, 3, 10, i), f"entry {i}")
+            log_path = os.path.join(logbook.get_log_files_dir(self.base), "log_20240303.jsonl")
+            blocks = len(log_index.update_index(log_path)["blocks"])
+        self.assertGreater(blocks, 3)
+        self.assertEqual(save_index.call_count, blocks + 1) # One save per block started, plus the catch-up
+        self.assertEqual(load_index.call_count, 2) # The writer keeps its index in memory
+        self.assertEqual(sum(block["records"] for block in log_index.load_index(log_path)["blocks"]), 60)
+
+    def test_index_catches_up_with_unindexed_lines(self):
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL), \
+             mock.patch.object(log_index, "BLOCK_MAX_BYTES", 200):
+            for i in range(10):
+                self._add_at(datetime(2024, 3, 2, 10, i), f"entry {i}")
+            log_path = os.path.join(logbook.get_log_files_dir(self.base), "log_20240302.jsonl")
+            os.remove(log_index.get_index_path(log_path))
+            with open(log_path, 'a', encoding='utf-8') as f: # Written by another tool, plus a partial line
+                f.write('{"timestamp": "2024-03-02T10:30:00.000", "level": "WARNING", "experiment_id": null, "text": "late"}\n{"trunc')
+            found = list(logbook.read_log_records("20240302", self.base, levels=["warning"]))
+            index = log_index.load_index(log_path)
+        self.assertEqual([r["text"] for r in found], ["late"])
+        self.assertGreater(len(index["blocks"]), 1)
+        self.assertEqual(sum(block["records"] for block in index["blocks"]), 11)
+        self.assertLess(index["size"], os.path.getsize(log_path)) # The partial line waits for its newline
+
+
+    # --- Queries Across Days ---
+    def test_query_across_days_and_formats(self):
+        for day in (1, 2, 3, 4):
+            self._add_at(datetime(2024, 5, day, 8), f"text day {day}", level="ERROR", experiment_id="MSL-42")
+            self._add_at(datetime(2024, 5, day, 9), f"text info {day}")
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL):
+            self._add_at(datetime(2024, 5, 3, 8, 30), "json day 3", level="error", experiment_id="MSL-42")
+            self._add_at(datetime(2024, 5, 3, 8, 45), "json other", level="ERROR", experiment_id="M2020")
+
+        with mock.patch.object(logbook, "_iter_text_records", wraps=logbook._iter_text_records) as read_text:
+            found = logbook.query_log_entries(self.base, start=datetime(2024, 5, 2), end=datetime(2024, 5, 4),
+                                              levels=["error"], experiment_ids=["MSL-42"])
+            self.assertEqual(read_text.call_count, 0) # Lazy: nothing is read before iteration
+            self.assertEqual([r["text"] for r in found], ["text day 2", "text day 3", "json day 3"])
+            self.assertEqual(read_text.call_count, 2) # Days 1 and 4 are never opened
+
+        everything = list(logbook.query_log_entries(self.base))
+        self.assertEqual(len(everything), 10)
+        self.assertEqual([r["timestamp"] for r in everything], sorted(r["timestamp"] for r in everything))
+        self.assertEqual(logbook.format_log_record(everything[0]),
+                         "[2024-05-01 08:00:00.000] [ERROR] [ExpID: MSL-42]: text day 1")
+        self.assertEqual([r["text"] for r in logbook.query_log_entries(self.base, start=datetime(2024, 5, 4, 8, 30))],
+                         ["text info 4"])
+
+    def test_query_skips_blocks_outside_time_range(self):
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL):
+            for hour in range(6):
+                self._add_at(datetime(2024, 6, 1, hour), f"hour {hour}")
+            with mock.patch.object(log_index, "read_block", wraps=log_index.read_block) as read_block:
+                found = logbook.query_log_entries(self.base, start=datetime(2024, 6, 1, 2),
+                                                  end=datetime(2024, 6, 1, 4))
+                self.assertEqual([r["text"] for r in found], ["hour 2", "hour 3"])
+                self.assertEqual(read_block.call_count, 2)
+
+    def test_parse_query_time(self):
+        self.assertEqual(logbook.parse_query_time("20240501"), datetime(2024, 5, 1))
+        self.assertEqual(logbook.parse_query_time("2024-05-01T13:30"), datetime(2024, 5, 1, 13, 30))
+        with self.assertRaises(ValueError):
+            logbook.parse_query_time("yesterday")
+
+
+    # --- Tail and Follow ---
+    def test_tail_reads_only_the_end_in_blocks(self):
+        log_path = os.path.join(logbook._ensure_log_files_dir_exists(self.base), "log_20240701.txt")
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"line {i}\n" for i in range(10000))
+        with mock.patch.object(logbook, "TAIL_BLOCK_SIZE", 32):
+            lines, msg = logbook.tail_log("20240701", self.base, n=5)
+        self.assertEqual(lines, [f"line {i}" for i in range(9995, 10000)])
+        self.assertEqual(logbook.tail_log("log_20240701.txt", self.base, n=3)[0], ["line 9997", "line 9998", "line 9999"])
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write("only\nno newline at end")
+        self.assertEqual(logbook.tail_log("20240701", self.base, n=10)[0], ["only", "no newline at end"])
+        self.assertIsNone(logbook.tail_log("20240702", self.base)[0])
+
+    def test_follow_streams_new_lines(self):
+        log_dir = logbook._ensure_log_files_dir_exists(self.base)
+        log_path = os.path.join(log_dir, "log_20240701.txt")
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write("old line\n")
+        stop = threading.Event()
+        stream = logbook.follow_log(self.base, "20240701", poll_interval=0.01, stop_event=stop)
+        received, got_second = [], threading.Event()
+
+        def consume():
+            for line in stream:
+                received.append(line)
+                if line == "second":
+                    got_second.set()
+                if len(received) == 3:
+                    stop.set()
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        time.sleep(0.05)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write("first\nsec")
+            f.flush()
+            time.sleep(0.05) # The partial line is held back until its newline arrives
+            f.write("ond\n")
+        self.assertTrue(got_second.wait(timeout=5))
+        with open(log_path, 'w', encoding='utf-8') as f: # Truncated: followed from the start again
+            f.write("new\n")
+        consumer.join(timeout=5)
+        stop.set()
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(received, ["first", "second", "new"])
+
+    def test_render_log_line(self):
+        self.assertEqual(logbook.render_log_line('{"timestamp": "2024-07-01T10:00:00.000", "level": "INFO", '
+                                                 '"experiment_id": null, "text": "Boot"}'),
+                         "[2024-07-01 10:00:00.000] [INFO]: Boot")
+        self.assertEqual(logbook.render_log_line("[plain] line"), "[plain] line")
+
+
+    # --- Retention ---
+    def _write_day(self, day, structured=False):
+        with mock.patch.object(logbook, "LOG_FORMAT", logbook.LOG_FORMAT_JSONL if structured else logbook.LOG_FORMAT_TEXT):
+            self._add_at(day.replace(hour=8), f"morning {day:%d}", level="ERROR", experiment_id="MSL-42")
+            self._add_at(day.replace(hour=20), f"evening {day:%d}")
+
+    def test_old_logs_compressed_per_day_and_read_transparently(self):
+        old, recent = datetime.now() - timedelta(days=40), datetime.now() - timedelta(days=1)
+        self._write_day(old)
+        self._write_day(old - timedelta(days=1), structured=True)
+        self._write_day(recent)
+        success, msg = logbook.compress_old_logs(self.base, older_than_days=30, method="xz")
+        self.assertTrue(success, msg)
+
+        files = logbook.list_log_files(self.base)[0]
+        self.assertEqual(files, sorted([logbook.get_daily_log_filename(recent), logbook.get_daily_log_filename(old) + ".xz",
+                                        logbook.get_daily_log_filename(old - timedelta(days=1), "jsonl") + ".xz"],
+                                       reverse=True))
+        content, msg = logbook.view_log_file(f"{old:%Y-%m-%d}", self.base)
+        self.assertIn(f"morning {old:%d}", content)
+        self.assertEqual(logbook.view_log_file(logbook.get_daily_log_filename(old), self.base)[0], content)
+        self.assertEqual(logbook.tail_log(f"{old:%Y%m%d}", self.base, n=1)[0][0][-len("evening 00"):], f"evening {old:%d}")
+
+        found = logbook.query_log_entries(self.base, levels=["ERROR"], experiment_ids=["MSL-42"])
+        self.assertEqual([r["text"] for r in found], [f"morning {d:%d}" for d in (old - timedelta(days=1), old, recent)])
+        self.assertEqual([r["text"] for r in logbook.read_log_records(f"{old - timedelta(days=1):%Y%m%d}", self.base,
+                                                                      hours=[20])], [f"evening {old - timedelta(days=1):%d}"])
+
+        self.assertFalse(logbook.compress_old_logs(self.base, older_than_days=0)[0]) # Today's log is never touched
+        self.assertFalse(logbook.compress_old_logs(self.base, older_than_days=30, method="zip")[0])
+
+    def test_monthly_rollup_grows_a_day_at_a_time(self):
+        first, second, third = datetime(2024, 3, 1), datetime(2024, 3, 2), datetime(2024, 3, 3)
+        for day in (first, second):
+            self._write_day(day)
+        self._write_day(second, structured=True)
+        logbook.compress_old_logs(self.base, older_than_days=1, method="gzip", monthly=True)
+        self._write_day(third)
+        success, msg = logbook.compress_old_logs(self.base, older_than_days=1, method="gzip", monthly=True)
+        self.assertTrue(success, msg)
+        self.assertEqual(logbook.list_log_files(self.base)[0], ["log_202403.txt.gz", "log_202403.jsonl.gz"])
+
+        content, msg = logbook.view_log_file("2024-03-02", self.base) # Only that day, out of the text rollup
+        self.assertEqual(content.count("\n"), 2)
+        self.assertIn("morning 02", content)
+        self.assertEqual(len(logbook.view_log_file("log_202403.txt.gz", self.base)[0].splitlines()), 6)
+        self.assertEqual([line[-10:] for line in logbook.iter_log_lines("log_20240303.txt", self.base)],
+                         ["morning 03", "evening 03"])
+
+        found = [r["text"] for r in logbook.query_log_entries(self.base, start=datetime(2024, 3, 2), end=datetime(2024, 3, 3))]
+        self.assertEqual(found, ["morning 02", "morning 02", "evening 02", "evening 02"]) # Text and JSONL merged by time
+        self.assertEqual(len(list(logbook.query_log_entries(self.base))), 8)
+
+    @unittest.skipIf(file_lock.fcntl is None, "advisory file locks need fcntl")
+    def test_concurrent_retention_runs_from_several_processes(self):
+        for day in range(1, 11):
+            self._write_day(datetime(2024, 3, day))
+        context = multiprocessing.get_context("fork")
+        start = context.Event()
+        workers = [context.Process(target=_compress_in_process, args=(self.base, start)) for _ in range(3)]
+        for worker in workers: worker.start()
+        start.set()
+        for worker in workers: worker.join()
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 3)
+        self.assertEqual(logbook.list_log_files(self.base)[0], ["log_202403.txt.gz"])
+        lines = logbook.view_log_file("log_202403.txt.gz", self.base)[0].splitlines()
+        self.assertEqual(len(lines), 20) # Every day archived exactly once
+
+    def test_retention_runs_when_a_new_day_starts(self):
+        self._write_day(datetime.now() - timedelta(days=10))
+        with mock.patch.object(logbook, "LOG_RETENTION_DAYS", 7), \
+             mock.patch.object(logbook, "_start_retention", side_effect=logbook.compress_old_logs) as start:
+            logbook.add_log_entry("first entry today", self.base)
+            logbook.add_log_entry("second entry today", self.base)
+        self.assertEqual(start.call_count, 1)
+        self.assertEqual(sorted(logbook.list_log_files(self.base)[0]),
+                         sorted([logbook.get_daily_log_filename(), logbook.get_daily_log_filename(
+                             datetime.now() - timedelta(days=10)) + ".gz"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
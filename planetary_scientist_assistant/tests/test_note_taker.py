@@ -0,0 +1,396 @@
+# planetary_scientist_assistant/tests/test_note_taker.py
+import unittest
+from unittest import mock
+import os
+import sys
+import io
+import json
+import shutil
+import tempfile
+import threading
+import multiprocessing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) # .../tests/
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) # .../planetary_scientist_assistant/
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from knowledge_base import file_lock, note_segments, note_taker, notes_journal, notes_order
+
+def _add_notes_in_process(base, prefix, count):
+    for i in range(count):
+        success, msg = note_taker.add_note(f"{prefix} {i}", f"concurrent {prefix.lower()}", base)
+        assert success, msg
+
+class TestNoteTaker(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _add(self, title, content):
+        success, msg = note_taker.add_note(title, content, self.base)
+        self.assertTrue(success, msg)
+        return msg.split("(ID: ")[1].split(")")[0] # Messages look like "Note 'T' (ID: <uuid>) added."
+
+    # --- Basic Operations ---
+    def test_add_search_delete(self):
+        alpha = self._add("Alpha", "Alpha particles and planets.")
+        self._add("Beta", "Beta decay")
+        self.assertEqual(note_taker.get_note_content(alpha, self.base), "Alpha particles and planets.")
+        self.assertEqual([n["title"] for n in note_taker.search_notes("planets", self.base)], ["Alpha"])
+        self.assertEqual([n["title"] for n in note_taker.search_notes("beta", self.base)], ["Beta"])
+
+        success, msg = note_taker.delete_note(alpha, self.base)
+        self.assertTrue(success, msg)
+        self.assertIsNone(note_taker.get_note_content(alpha, self.base))
+        self.assertEqual([n["title"] for n in note_taker.list_notes(self.base)], ["Beta"])
+
+    # --- Full-Text Index ---
+    def test_search_answers_from_index_without_reading_notes(self):
+        self._add("Olympus Mons", "Tallest volcano on Mars.")
+        edited = self._add("Draft", "nothing yet")
+        self._add("Valles Marineris", "Canyon system on Mars.")
+        note_taker.update_note(edited, self.base, content="Gale crater volcano survey")
+        self.assertEqual(note_taker.search_notes("nothing", self.base), []) # Replaced content is no longer indexed
+        with mock.patch.object(note_taker, "_read_note_content") as read_content:
+            self.assertEqual(sorted(n["title"] for n in note_taker.search_notes("volcano", self.base)),
+                             ["Draft", "Olympus Mons"])
+            self.assertEqual(len(note_taker.search_notes("MARS", self.base)), 2)
+            read_content.assert_not_called()
+
+    def test_index_rebuilt_when_missing_or_stale(self):
+        note_id = self._add("Regolith", "Loose surface material")
+        index_path = note_taker.get_notes_index_path(self.base)
+        os.remove(index_path)
+        self.assertEqual([n["id"] for n in note_taker.search_notes("surface", self.base)], [note_id])
+        self.assertTrue(os.path.exists(index_path))
+
+        # Another session renames the note without updating the index: the index is now older
+        journal_path = notes_journal.get_journal_path(note_taker.get_notes_metadata_path(self.base))
+        stat = os.stat(index_path)
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "modify", "id": note_id, "changes": {"title": "Dust"}}) + "\n")
+        os.utime(journal_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual([n["id"] for n in note_taker.search_notes("dust", self.base)], [note_id])
+        self.assertEqual(note_taker.search_notes("regolith", self.base), [])
+
+    def test_search_matches_word_beginnings(self):
+        crater = self._add("Crater rim survey", "Heights along the rim")
+        self._add("Craters elsewhere", "Not surveyed")
+        self.assertEqual([n["id"] for n in note_taker.search_notes("crat rim", self.base)], [crater])
+        self.assertEqual(len(note_taker.search_notes("CRAT", self.base)), 2)
+        self.assertEqual(len(note_taker.search_notes("surv", self.base)), 2)
+        self.assertEqual(note_taker.search_notes("rater", self.base), []) # Not the beginning of a word
+
+    def test_note_changes_write_only_their_postings(self):
+        first = self._add("First", "olivine")
+        with mock.patch.object(note_taker.index_store, "rebuild", side_effect=AssertionError("rebuilt")):
+            second = self._add("Second", "olivine basalt")
+            note_taker.update_note(first, self.base, content="dust")
+            note_taker.delete_note(second, self.base)
+            self.assertEqual(note_taker.search_notes("olivine", self.base), [])
+            self.assertEqual([n["id"] for n in note_taker.search_notes("dust", self.base)], [first])
+
+    def test_corrupted_derived_files_are_rebuilt(self):
+        note_id = self._add("Regolith", "Loose surface material")
+        for path in (note_taker.get_notes_index_path(self.base), note_taker.get_notes_order_path(self.base),
+                     note_taker.get_notes_title_trigrams_path(self.base)):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("{not json")
+        self.assertEqual([n["id"] for n in note_taker.search_notes("surface", self.base)], [note_id])
+        self.assertEqual([n["id"] for n in note_taker.fuzzy_search_notes("regolth", self.base)], [note_id])
+        self.assertEqual([n["id"] for n in note_taker.list_notes(self.base)], [note_id])
+        self.assertEqual([n["id"] for n in note_taker.list_notes_page(self.base)[0]], [note_id])
+
+    def test_delete_removes_note_from_index(self):
+        note_id = self._add("Ice", "Polar caps")
+        note_taker.delete_note(note_id, self.base)
+        self.assertEqual(note_taker.search_notes("polar", self.base), [])
+        self.assertEqual(note_taker.search_notes("polar", tempfile.gettempdir() + "/no-such-project"), [])
+
+    # --- Packed Storage ---
+    def test_packed_mode_stores_contents_in_segments(self):
+        with mock.patch.object(note_taker, "NOTES_STORAGE_MODE", note_taker.STORAGE_PACKED):
+            ids = [self._add(f"Note {i}", f"packed content {i} \u00e9") for i in range(20)]
+            note_taker.update_note(ids[0], self.base, content="rewritten")
+        self.assertEqual(os.listdir(note_taker.get_notes_content_dir(self.base)), []) # No per-note files
+        self.assertEqual(note_segments.list_segments(note_taker.get_notes_segments_dir(self.base)), ["000001.seg"])
+        self.assertEqual(note_taker.get_note_content(ids[0], self.base), "rewritten")
+        self.assertEqual(note_taker.get_note_content(ids[7], self.base), "packed content 7 \u00e9")
+        self.assertEqual(len(note_taker.search_notes("packed", self.base)), 19)
+
+    def test_segments_compacted_when_deleted_notes_accumulate(self):
+        segments_dir = note_taker.get_notes_segments_dir(self.base)
+        with mock.patch.object(note_taker, "NOTES_STORAGE_MODE", note_taker.STORAGE_PACKED), \
+             mock.patch.object(note_segments, "COMPACT_MIN_DEAD_BYTES", 1):
+            ids = [self._add(f"Note {i}", "x" * 100) for i in range(10)]
+            for note_id in ids[:4]:
+                note_taker.delete_note(note_id, self.base)
+            self.assertEqual(note_segments.list_segments(segments_dir), ["000001.seg"]) # 40% dead: kept
+            note_taker.delete_note(ids[4], self.base)
+        self.assertEqual(note_segments.list_segments(segments_dir), ["000002.seg"])
+        self.assertEqual(os.path.getsize(os.path.join(segments_dir, "000002.seg")), 500)
+        notes_journal._cache.clear() # Moved locations were journaled
+        for note_id in ids[5:]:
+            self.assertEqual(note_taker.get_note_content(note_id, self.base), "x" * 100)
+
+    def test_pack_existing_file_notes(self):
+        first, second = self._add("First", "one"), self._add("Second", "two")
+        success, msg = note_taker.pack_notes(self.base)
+        self.assertTrue(success, msg)
+        self.assertEqual(os.listdir(note_taker.get_notes_content_dir(self.base)), [])
+        self.assertEqual(note_taker.get_note_content(first, self.base), "one")
+        self.assertEqual(note_taker.get_note_details(second, self.base)["title"], "Second")
+        self.assertIn("content_segment", note_taker.get_note_details(second, self.base))
+
+    # --- Compression ---
+    def test_compressed_notes_are_read_transparently(self):
+        text = "Layered sulfates in Valles Marineris. " * 50
+        with mock.patch.object(note_taker, "NOTES_COMPRESSION", "zlib"):
+            plain_file = self._add("Zlib file", text)
+        with mock.patch.object(note_taker, "NOTES_COMPRESSION", "lzma"), \
+             mock.patch.object(note_taker, "NOTES_STORAGE_MODE", note_taker.STORAGE_PACKED):
+            packed = self._add("Lzma packed", text)
+        stored = os.listdir(note_taker.get_notes_content_dir(self.base))
+        self.assertEqual(stored, [f"{plain_file}.txt.zz"])
+        self.assertLess(os.path.getsize(os.path.join(note_taker.get_notes_content_dir(self.base), stored[0])), len(text))
+        self.assertEqual(note_taker.get_note_content(plain_file, self.base), text)
+        self.assertEqual(note_taker.get_note_content(packed, self.base), text)
+        self.assertEqual(len(note_taker.search_notes("sulfates", self.base)), 2)
+
+        # Edits and packing keep each note's compression
+        note_taker.update_note(plain_file, self.base, content="edited jarosite")
+        self.assertEqual(note_taker.get_note_content(plain_file, self.base), "edited jarosite")
+        note_taker.pack_notes(self.base)
+        self.assertEqual(note_taker.get_note_details(plain_file, self.base)["content_compression"], "zlib")
+        self.assertEqual(note_taker.get_note_content(plain_file, self.base), "edited jarosite")
+
+    def test_list_notes_page_with_offset_and_cursor(self):
+        ids = [self._add(f"Note {i}", "x") for i in range(7)]
+        newest_first = ids[::-1]
+        page, cursor = note_taker.list_notes_page(self.base, limit=3)
+        self.assertEqual([n["id"] for n in page], newest_first[:3])
+        page, cursor = note_taker.list_notes_page(self.base, limit=3, cursor=cursor)
+        self.assertEqual([n["id"] for n in page], newest_first[3:6])
+        page, cursor = note_taker.list_notes_page(self.base, limit=3, cursor=cursor)
+        self.assertEqual(([n["id"] for n in page], cursor), (newest_first[6:], None))
+
+        page, _ = note_taker.list_notes_page(self.base, limit=2, offset=5, descending=False)
+        self.assertEqual([n["id"] for n in page], ids[5:])
+        with self.assertRaises(ValueError):
+            note_taker.list_notes_page(self.base, sort_by="title")
+
+    def test_cursor_stays_valid_when_notes_change(self):
+        ids = [self._add(f"Note {i}", "x") for i in range(4)]
+        page, cursor = note_taker.list_notes_page(self.base, limit=2)
+        self.assertEqual([n["id"] for n in page], [ids[3], ids[2]])
+        self._add("Newer", "x")
+        note_taker.delete_note(ids[1], self.base)
+        page, cursor = note_taker.list_notes_page(self.base, limit=2, cursor=cursor)
+        self.assertEqual(([n["id"] for n in page], cursor), ([ids[0]], None))
+
+    def test_sort_order_persisted_and_maintained_without_sorting(self):
+        ids = [self._add(f"Note {i}", "x") for i in range(3)]
+        with mock.patch.object(notes_order, "rebuild", side_effect=AssertionError("rebuilt")), \
+                mock.patch.object(note_taker.trigram_index, "rebuild", side_effect=AssertionError("rebuilt")):
+            note_taker.update_note(ids[0], self.base, title="Touched")
+            extra = self._add("Extra", "x")
+            note_taker.delete_note(extra, self.base)
+            page, _ = note_taker.list_notes_page(self.base, limit=1, sort_by="last_modified_date")
+            self.assertEqual([n["title"] for n in page], ["Touched"])
+            self.assertEqual([n["id"] for n in note_taker.list_notes(self.base)], ids[::-1])
+        with notes_order.open_order(note_taker.get_notes_order_path(self.base)) as conn:
+            self.assertEqual(notes_order.note_ids(conn, "last_modified_date")[0], ids[0])
+
+        os.remove(note_taker.get_notes_order_path(self.base)) # Rebuilt when missing
+        self.assertEqual([n["id"] for n in note_taker.list_notes_page(self.base, limit=2)[0]], ids[:0:-1])
+
+    # --- Bulk Import ---
+    def test_import_directory_of_text_files(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        for name, text in (("Crater survey.txt", "Rim heights"), ("Dust.txt", "Storm season"), ("skip.csv", "a,b")):
+            with open(os.path.join(source, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        results = note_taker.import_notes(source, self.base)
+        self.assertEqual([r["success"] for r in results], [True, True])
+        self.assertEqual(sorted(n["title"] for n in note_taker.list_notes(self.base)), ["Crater survey", "Dust"])
+        self.assertEqual(note_taker.get_note_content(results[1]["note_id"], self.base), "Storm season")
+        self.assertEqual([n["title"] for n in note_taker.search_notes("storm", self.base)], ["Dust"])
+
+    def test_import_jsonl_stream_commits_once_per_batch(self):
+        lines = [json.dumps({"title": f"Note {i}", "content": f"sample {i}"}) for i in range(7)]
+        lines.insert(3, "{not json")
+        lines.insert(5, json.dumps({"content": "no title"}))
+        done = []
+        with mock.patch.object(notes_journal, "append_records", wraps=notes_journal.append_records) as append, \
+             mock.patch.object(note_taker, "_mark_synced", wraps=note_taker._mark_synced) as index_commit:
+            results = note_taker.import_notes(io.StringIO("\n".join(lines) + "\n"), self.base, batch_size=3,
+                                              progress_callback=lambda n, r: done.append(n))
+            self.assertEqual(append.call_count, 3) # Batches of 3 + 3 + 1 notes
+            # One commit per batch, plus the initial build, for each of the three derived databases
+            self.assertEqual(index_commit.call_count, (3 + 1) * 3)
+        self.assertEqual(done, list(range(1, 10)))
+        self.assertEqual([r["source"] for r in results if not r["success"]], ["line 4", "line 6"])
+        self.assertEqual(len(note_taker.list_notes(self.base)), 7)
+        self.assertEqual(len(note_taker.search_notes("sample", self.base)), 7)
+
+    def test_import_results_follow_input_order(self):
+        lines = ["{not json", json.dumps({"title": "First", "content": "a"}), json.dumps({"content": "no title"}),
+                 json.dumps({"title": "Second", "content": "b"}), "[]", json.dumps({"title": "Third"})]
+        reported = []
+        results = note_taker.import_notes(io.StringIO("\n".join(lines) + "\n"), self.base, batch_size=2,
+                                          progress_callback=lambda n, r: reported.append((n, r["source"])))
+        sources = [f"line {n}" for n in range(1, 7)]
+        self.assertEqual([r["source"] for r in results], sources)
+        self.assertEqual([r["success"] for r in results], [False, True, False, True, False, True])
+        self.assertEqual([note_taker.get_note_details(r["note_id"], self.base)["title"]
+                          for r in results if r["success"]], ["First", "Second", "Third"])
+        self.assertEqual(reported, list(zip(range(1, 7), sources)))
+
+    def test_import_into_packed_storage(self):
+        stream = io.StringIO("".join(json.dumps({"title": f"N{i}", "content": "c" * i}) + "\n" for i in range(5)))
+        with mock.patch.object(note_taker, "NOTES_STORAGE_MODE", note_taker.STORAGE_PACKED):
+            results = note_taker.import_notes(stream, self.base)
+        self.assertEqual(os.listdir(note_taker.get_notes_content_dir(self.base)), [])
+        self.assertEqual([note_taker.get_note_content(r["note_id"], self.base) for r in results],
+                         ["c" * i for i in range(5)])
+
+    # --- Fuzzy Title Search ---
+    def test_fuzzy_search_matches_fragments_and_typos(self):
+        crater = self._add("Gale Crater stratigraphy", "x")
+        delta = self._add("Jezero delta deposits", "x")
+        self._add("Olympus Mons", "x")
+        self.assertEqual([n["id"] for n in note_taker.fuzzy_search_notes("crat", self.base)][0], crater)
+        found = note_taker.fuzzy_search_notes("jezro delt", self.base)
+        self.assertEqual(found[0]["id"], delta)
+        self.assertTrue(0 < found[0]["similarity"] < 1)
+        self.assertEqual(note_taker.fuzzy_search_notes("zzzz", self.base), [])
+
+    def test_substring_search_finds_fragments_inside_words(self):
+        crater = self._add("Gale Crater", "x")
+        delta = self._add("Jezero delta", "x")
+        self.assertEqual(note_taker.fuzzy_search_notes("rat", self.base), []) # Too short to resemble a title
+        for query, note_id in (("rat", crater), ("zer", delta), ("elt", delta), ("LE CRA", crater)):
+            found = note_taker.fuzzy_search_notes(query, self.base, substring=True)
+            self.assertEqual([(n["id"], n["similarity"]) for n in found], [(note_id, 1.0)], query)
+        # Sharing every trigram is not enough: the text must occur as typed
+        self.assertEqual(note_taker.fuzzy_search_notes("crater gale", self.base, substring=True), [])
+        self.assertEqual(note_taker.fuzzy_search_notes("ra", self.base, substring=True), [])
+
+    def test_trigram_index_follows_edits(self):
+        note_id = self._add("Basalt", "x")
+        note_taker.update_note(note_id, self.base, title="Andesite")
+        self.assertEqual(note_taker.fuzzy_search_notes("basalt", self.base), [])
+        self.assertEqual(note_taker.fuzzy_search_notes("andesit", self.base)[0]["id"], note_id)
+        note_taker.delete_note(note_id, self.base)
+        self.assertEqual(note_taker.fuzzy_search_notes("andesite", self.base), [])
+
+    # --- Multi-process Safety ---
+    @unittest.skipIf(file_lock.fcntl is None, "advisory file locks need fcntl")
+    def test_concurrent_writers_from_several_processes(self):
+        self._add("Seed", "x")
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_add_notes_in_process, args=(self.base, f"P{n}", 15)) for n in range(4)]
+        for worker in workers: worker.start()
+        for worker in workers: worker.join()
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+
+        notes_journal._cache.clear()
+        self.assertEqual(len(note_taker.list_notes(self.base)), 61)
+        self.assertEqual(len(note_taker.search_notes("concurrent", self.base)), 60)
+        self.assertEqual(len(note_taker.search_notes("p3", self.base)), 15)
+        with notes_order.open_order(note_taker.get_notes_order_path(self.base)) as conn:
+            self.assertEqual(len(notes_order.note_ids(conn)), 61) # No update lost to a concurrent writer
+
+    def test_readers_do_not_wait_for_writers(self):
+        note_id = self._add("Basalt", "lava flow")
+        metadata_path = note_taker.get_notes_metadata_path(self.base)
+        holding, release = threading.Event(), threading.Event()
+        def writer():
+            with file_lock.locked(metadata_path):
+                holding.set()
+                release.wait(10)
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            holding.wait(10)
+            self.assertEqual([n["id"] for n in note_taker.search_notes("lava", self.base)], [note_id])
+            self.assertEqual(note_taker.get_note_content(note_id, self.base), "lava flow")
+            self.assertEqual(len(note_taker.list_notes_page(self.base)[0]), 1)
+        finally:
+            release.set()
+            thread.join()
+
+    # --- Metadata Cache ---
+    def test_search_parses_metadata_once(self):
+        for i in range(5):
+            self._add(f"Note {i}", f"content {i}")
+        notes_journal._cache.clear()
+        self.assertEqual(len(note_taker.search_notes("content", self.base)), 5)
+        with mock.patch.object(notes_journal.json, "loads", wraps=json.loads) as loads:
+            self.assertEqual(len(note_taker.search_notes("content", self.base)), 5)
+            self.assertEqual(note_taker.get_note_details(note_taker.list_notes(self.base)[0]["id"], self.base)["id"],
+                             note_taker.list_notes(self.base)[0]["id"])
+            self.assertEqual(loads.call_count, 0) # Served entirely from the shared cached copy
+
+    def test_cache_sees_records_from_other_sessions(self):
+        note_id = self._add("Original", "text")
+        self.assertEqual(note_taker.get_note_details(note_id, self.base)["title"], "Original")
+
+        # Another process appends to the journal behind our back
+        journal_path = notes_journal.get_journal_path(note_taker.get_notes_metadata_path(self.base))
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "modify", "id": note_id, "changes": {"title": "Renamed elsewhere"}}) + "\n")
+        self.assertEqual(note_taker.get_note_details(note_id, self.base)["title"], "Renamed elsewhere")
+
+    # --- Journal ---
+    def test_mutations_append_instead_of_rewriting_snapshot(self):
+        metadata_path = note_taker.get_notes_metadata_path(self.base)
+        first = self._add("First", "one")
+        with open(metadata_path, 'rb') as f:
+            snapshot = f.read()
+        second = self._add("Second", "two")
+        success, msg = note_taker.update_note(second, self.base, title="Second (edited)", content="two!")
+        self.assertTrue(success, msg)
+        note_taker.delete_note(first, self.base)
+
+        with open(metadata_path, 'rb') as f:
+            self.assertEqual(f.read(), snapshot) # Snapshot untouched below the compaction threshold
+        with open(notes_journal.get_journal_path(metadata_path), 'r', encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)["op"] for line in f], ["add", "add", "modify", "delete"])
+
+        notes_journal._cache.clear() # Force a replay from disk
+        self.assertEqual([n["title"] for n in note_taker.list_notes(self.base)], ["Second (edited)"])
+        self.assertEqual(note_taker.get_note_content(second, self.base), "two!")
+
+    def test_background_compaction_folds_journal_into_snapshot(self):
+        metadata_path = note_taker.get_notes_metadata_path(self.base)
+        with mock.patch.object(notes_journal, "COMPACT_THRESHOLD_BYTES", 1):
+            ids = [self._add(f"Note {i}", "x") for i in range(3)]
+            notes_journal.wait_for_compaction(metadata_path)
+        notes_journal.compact(metadata_path) # Fold whatever was appended while the thread ran
+
+        self.assertFalse(os.path.exists(notes_journal.get_journal_path(metadata_path)))
+        self.assertFalse(os.path.exists(notes_journal.get_compacting_path(metadata_path)))
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)), sorted(ids))
+        self.assertEqual(len(note_taker.list_notes(self.base)), 3)
+
+    def test_interrupted_compaction_is_replayed(self):
+        metadata_path = note_taker.get_notes_metadata_path(self.base)
+        keep = self._add("Keep", "k")
+        gone = self._add("Gone", "g")
+        note_taker.delete_note(gone, self.base)
+        # Simulate a crash after the journal was renamed but before the snapshot was written
+        os.replace(notes_journal.get_journal_path(metadata_path), notes_journal.get_compacting_path(metadata_path))
+        notes_journal._cache.clear()
+        self.assertEqual([n["id"] for n in note_taker.list_notes(self.base)], [keep])
+        notes_journal.compact(metadata_path)
+        self.assertEqual([n["id"] for n in note_taker.list_notes(self.base)], [keep])
+
+if __name__ == '__main__':
+    unittest.main()